@@ -0,0 +1,158 @@
+import asyncio
+from typing import Any, Dict, Optional, Union, TYPE_CHECKING
+
+from app.adapters.decomprepository import AbstractDecompRepository
+from app.internal.archive import ArchiveCase
+from app.internal.httpresponse import HTTPResponse
+from app.utils.log import Log
+from app.utils.tracing import traced
+
+if TYPE_CHECKING:  # pragma: no cover
+    from idecomp.decomp.caso import Caso
+    from idecomp.decomp.arquivos import Arquivos
+    from idecomp.decomp.dadger import Dadger
+    from idecomp.decomp.dadgnl import Dadgnl
+    from idecomp.decomp.inviabunic import InviabUnic
+    from idecomp.decomp.relato import Relato
+    from idecomp.decomp.relgnl import Relgnl
+    from idecomp.decomp.hidr import Hidr
+
+
+class ArchiveDecompRepository(AbstractDecompRepository):
+    """
+    Reads the files of a DECOMP case stored inside a zip or tar
+    archive, given as `/path/to/archive.zip/inner/dir`, without
+    extracting it. The archive is read-only.
+    """
+
+    def __init__(self, path: str):
+        from idecomp.decomp.caso import Caso
+
+        self.__case: Optional[ArchiveCase] = None
+        self.__caso: Optional["Caso"] = None
+        try:
+            self.__case = ArchiveCase(path)
+            self.__caso = self.__case.read("caso.dat", Caso)
+        except FileNotFoundError:
+            Log.log().error("Não foi encontrado o arquivo caso.dat")
+        self.__arquivos: Optional["Arquivos"] = None
+        self.__files: Dict[str, Any] = {}
+
+    @property
+    def caso(self) -> Union["Caso", HTTPResponse]:
+        if self.__caso is None:
+            msg = "Não foi encontrado o arquivo caso.dat"
+            return HTTPResponse(code=404, detail=msg)
+        return self.__caso
+
+    @property
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
+        if self.__arquivos is None:
+            from idecomp.decomp.arquivos import Arquivos
+
+            try:
+                name = self.__caso.arquivos if self.__caso else None
+                if self.__case is None or not name:
+                    raise FileNotFoundError()
+                self.__arquivos = self.__case.read(name, Arquivos)
+            except FileNotFoundError:
+                msg = "Não foi encontrado o arquivo arquivos"
+                Log.log().error(msg)
+                return HTTPResponse(code=404, detail=msg)
+        return self.__arquivos
+
+    def __deck(self, field: str) -> str:
+        arq = self.arquivos
+        if isinstance(arq, HTTPResponse):
+            raise FileNotFoundError()
+        name = getattr(arq, field)
+        if not name:
+            raise FileNotFoundError()
+        return name
+
+    def __output(self, prefix: str) -> str:
+        if self.__caso is None or not self.__caso.arquivos:
+            raise FileNotFoundError()
+        return f"{prefix}.{self.__caso.arquivos}"
+
+    def __read(
+        self, kind: str, locate: Any, parser: Any, cached: bool = False
+    ) -> Any:
+        if kind not in self.__files:
+            try:
+                if self.__case is None:
+                    raise FileNotFoundError()
+                name = locate()
+                Log.log().info(f"Lendo arquivo {name}")
+                self.__files[kind] = self.__case.read(name, parser, cached)
+            except FileNotFoundError:
+                msg = f"Não foi encontrado o arquivo {kind}"
+                self.__files[kind] = HTTPResponse(code=404, detail=msg)
+            except Exception as e:
+                Log.log().error(f"Erro na leitura do {kind}: {e}")
+                self.__files[kind] = HTTPResponse(code=500, detail=str(e))
+        return self.__files[kind]
+
+    def release(self, name: str):
+        self.__files.pop(name, None)
+
+    def __read_only(self, kind: str) -> HTTPResponse:
+        msg = f"O arquivo {kind} não pode ser alterado em um caso compactado"
+        Log.log().error(msg)
+        return HTTPResponse(code=405, detail=msg)
+
+    @traced("decomp.get_dadger")
+    async def get_dadger(self) -> Union["Dadger", HTTPResponse]:
+        from idecomp.decomp.dadger import Dadger
+
+        return await asyncio.to_thread(
+            self.__read, "dadger", lambda: self.__deck("dadger"), Dadger
+        )
+
+    @traced("decomp.set_dadger")
+    def set_dadger(self, d: "Dadger") -> HTTPResponse:
+        return self.__read_only("dadger")
+
+    @traced("decomp.get_dadgnl")
+    async def get_dadgnl(self) -> Union["Dadgnl", HTTPResponse]:
+        from idecomp.decomp.dadgnl import Dadgnl
+
+        return await asyncio.to_thread(
+            self.__read, "dadgnl", lambda: self.__deck("dadgnl"), Dadgnl
+        )
+
+    @traced("decomp.set_dadgnl")
+    def set_dadgnl(self, d: "Dadgnl") -> HTTPResponse:
+        return self.__read_only("dadgnl")
+
+    @traced("decomp.get_inviabunic")
+    def get_inviabunic(self) -> Union["InviabUnic", HTTPResponse]:
+        from idecomp.decomp.inviabunic import InviabUnic
+
+        return self.__read(
+            "inviab_unic", lambda: self.__output("inviab_unic"), InviabUnic
+        )
+
+    @traced("decomp.get_relato")
+    def get_relato(self) -> Union["Relato", HTTPResponse]:
+        from idecomp.decomp.relato import Relato
+
+        return self.__read(
+            "relato", lambda: self.__output("relato"), Relato, cached=True
+        )
+
+    @traced("decomp.get_relgnl")
+    def get_relgnl(self) -> Union["Relgnl", HTTPResponse]:
+        from idecomp.decomp.relgnl import Relgnl
+
+        return self.__read(
+            "relgnl", lambda: self.__output("relgnl"), Relgnl, cached=True
+        )
+
+    @traced("decomp.get_hidr")
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
+        from idecomp.decomp.hidr import Hidr
+
+        return self.__read(
+            "hidr", lambda: self.__deck("hidr"), Hidr, cached=True
+        )
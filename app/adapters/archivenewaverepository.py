@@ -0,0 +1,159 @@
+import asyncio
+from typing import Any, Dict, Optional, Union, TYPE_CHECKING
+
+from app.adapters.newaverepository import AbstractNewaveRepository
+from app.internal.archive import ArchiveCase
+from app.internal.httpresponse import HTTPResponse
+from app.utils.log import Log
+from app.utils.tracing import traced
+
+if TYPE_CHECKING:  # pragma: no cover
+    from inewave.newave.arquivos import Arquivos
+    from inewave.newave.dger import Dger
+    from inewave.newave.hidr import Hidr
+    from inewave.newave.confhd import Confhd
+    from inewave.newave.eafpast import Eafpast
+    from inewave.newave.adterm import Adterm
+    from inewave.newave.term import Term
+    from inewave.newave.pmo import Pmo
+
+
+class ArchiveNewaveRepository(AbstractNewaveRepository):
+    """
+    Reads the files of a NEWAVE case stored inside a zip or tar
+    archive, given as `/path/to/archive.zip/inner/dir`, without
+    extracting it. The archive is read-only.
+    """
+
+    def __init__(self, path: str):
+        from inewave.newave.caso import Caso
+
+        self.__case: Optional[ArchiveCase] = None
+        self.__caso: Optional["Caso"] = None
+        try:
+            self.__case = ArchiveCase(path)
+            self.__caso = self.__case.read("caso.dat", Caso)
+        except FileNotFoundError:
+            Log.log().error("Não foi encontrado o arquivo caso.dat")
+        self.__arquivos: Optional["Arquivos"] = None
+        self.__files: Dict[str, Any] = {}
+
+    @property
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
+        if self.__arquivos is None:
+            from inewave.newave.arquivos import Arquivos
+
+            try:
+                name = self.__caso.arquivos if self.__caso else None
+                if self.__case is None or not name:
+                    raise FileNotFoundError()
+                self.__arquivos = self.__case.read(name, Arquivos)
+            except FileNotFoundError:
+                msg = "Não foi encontrado o arquivo arquivos"
+                Log.log().error(msg)
+                return HTTPResponse(code=404, detail=msg)
+        return self.__arquivos
+
+    def __deck(self, field: str) -> str:
+        arq = self.arquivos
+        if isinstance(arq, HTTPResponse):
+            raise FileNotFoundError()
+        name = getattr(arq, field)
+        if not name:
+            raise FileNotFoundError()
+        return name
+
+    def __read(
+        self, kind: str, locate: Any, parser: Any, cached: bool = False
+    ) -> Any:
+        if kind not in self.__files:
+            try:
+                if self.__case is None:
+                    raise FileNotFoundError()
+                name = locate()
+                Log.log().info(f"Lendo arquivo {name}")
+                self.__files[kind] = self.__case.read(name, parser, cached)
+            except FileNotFoundError:
+                msg = f"Não foi encontrado o arquivo {kind}.dat"
+                self.__files[kind] = HTTPResponse(code=404, detail=msg)
+            except Exception as e:
+                Log.log().error(f"Erro na leitura do {kind}.dat: {e}")
+                self.__files[kind] = HTTPResponse(code=500, detail=str(e))
+        return self.__files[kind]
+
+    def release(self, name: str):
+        self.__files.pop(name, None)
+
+    def __read_only(self, kind: str) -> HTTPResponse:
+        msg = (
+            f"O arquivo {kind}.dat não pode ser alterado em um caso"
+            + " compactado"
+        )
+        Log.log().error(msg)
+        return HTTPResponse(code=405, detail=msg)
+
+    @traced("newave.get_dger")
+    async def get_dger(self) -> Union["Dger", HTTPResponse]:
+        from inewave.newave.dger import Dger
+
+        return await asyncio.to_thread(
+            self.__read, "dger", lambda: self.__deck("dger"), Dger
+        )
+
+    @traced("newave.set_dger")
+    def set_dger(self, d: "Dger") -> HTTPResponse:
+        return self.__read_only("dger")
+
+    @traced("newave.get_hidr")
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
+        from inewave.newave.hidr import Hidr
+
+        return self.__read("hidr", lambda: "hidr.dat", Hidr, cached=True)
+
+    @traced("newave.get_confhd")
+    def get_confhd(self) -> Union["Confhd", HTTPResponse]:
+        from inewave.newave.confhd import Confhd
+
+        return self.__read("confhd", lambda: self.__deck("confhd"), Confhd)
+
+    @traced("newave.set_confhd")
+    def set_confhd(self, d: "Confhd") -> HTTPResponse:
+        return self.__read_only("confhd")
+
+    @traced("newave.get_eafpast")
+    def get_eafpast(self) -> Union["Eafpast", HTTPResponse]:
+        from inewave.newave.eafpast import Eafpast
+
+        return self.__read(
+            "eafpast", lambda: self.__deck("vazpast"), Eafpast
+        )
+
+    @traced("newave.set_eafpast")
+    def set_eafpast(self, d: "Eafpast") -> HTTPResponse:
+        return self.__read_only("eafpast")
+
+    @traced("newave.get_adterm")
+    def get_adterm(self) -> Union["Adterm", HTTPResponse]:
+        from inewave.newave.adterm import Adterm
+
+        return self.__read("adterm", lambda: self.__deck("adterm"), Adterm)
+
+    @traced("newave.set_adterm")
+    def set_adterm(self, d: "Adterm") -> HTTPResponse:
+        return self.__read_only("adterm")
+
+    @traced("newave.get_term")
+    def get_term(self) -> Union["Term", HTTPResponse]:
+        from inewave.newave.term import Term
+
+        return self.__read("term", lambda: self.__deck("term"), Term)
+
+    @traced("newave.set_term")
+    def set_term(self, d: "Term") -> HTTPResponse:
+        return self.__read_only("term")
+
+    @traced("newave.get_pmo")
+    def get_pmo(self) -> Union["Pmo", HTTPResponse]:
+        from inewave.newave.pmo import Pmo
+
+        return self.__read("pmo", lambda: self.__deck("pmo"), Pmo, cached=True)
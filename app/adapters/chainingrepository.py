@@ -1,9 +1,19 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, List, Union, Callable
-import pandas as pd  # type: ignore
-from idecomp.decomp.dadger import Dadger
-from idecomp.decomp.modelos.dadger import VI, UH
+from datetime import date
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    Callable,
+    TYPE_CHECKING,
+)
 
+from app.internal.plantmapping import PlantMapping, month_ordinal
+from app.internal.settings import Settings
 from app.models.program import Program
 from app.models.chainingresult import ChainingResult
 from app.internal.httpresponse import HTTPResponse
@@ -14,11 +24,193 @@ from app.services.unitofwork import (
     DecompUnitOfWork,
 )
 from app.utils.log import Log
+from app.utils.memory import compact
+from app.utils.tracing import span
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+    import pandas as pd  # type: ignore
+    from idecomp.decomp.dadger import Dadger
+
+# Plants whose travel times are chained
+TVIAGEM_PLANTS = [156, 162]
+
+
+# Dispatch columns of the relgnl, one for each load block, in the
+# order of the GL register
+GNL_BLOCKS = [f"geracao_patamar_{i}" for i in [1, 2, 3]]
+
+
+def study_month(dadger: "Dadger") -> Optional[int]:
+    """
+    Returns the start month of a DECOMP case, as in `month_ordinal`,
+    from the DT register of its dadger.
+    """
+    dt = dadger.dt
+    if dt is None or dt.ano is None or dt.mes is None:
+        return None
+    return month_ordinal(dt.ano, dt.mes)
+
+
+def decomp_storage(
+    codes: "np.ndarray", volumes: "pd.DataFrame", month: Optional[int]
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Returns the initial storage of the plants of a DECOMP case, taken
+    from the storage at the end of the first stage of the previous
+    case, following the plant mapping rules.
+
+    :param codes: The plant codes of the case
+    :param volumes: The `volume_util_reservatorios` of the previous
+        case relato
+    :param month: The start month of the case
+    :return: The plants that have a storage and their storages
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    codigos, _, vols = PlantMapping().resolve(
+        Program.DECOMP,
+        codes,
+        volumes["codigo_usina"].to_numpy(),
+        volumes["estagio_1"].to_numpy(),
+        month,
+    )
+    return codigos, vols
+
+
+def gnl_dispatch(
+    operacao: "pd.DataFrame", nome: str, data: str
+) -> "np.ndarray":
+    """
+    Returns the dispatch of a GNL plant in each load block of a week,
+    from the thermal operation report of the relgnl.
+
+    :param operacao: The `relatorio_operacao_termica` of the relgnl
+    :param nome: The plant name
+    :param data: The week start, as in `dd/mm/yyyy`
+    :return: The dispatches, one row for each matching report line
+    :rtype: np.ndarray
+    """
+    filtro = (operacao["nome_usina"] == nome) & (
+        operacao["data_inicio_semana"] == data
+    )
+    return operacao.loc[filtro, GNL_BLOCKS].to_numpy()
 
 
 class AbstractChainingRepository(ABC):
     """ """
 
+    # Files read by each rule from the last DECOMP source and from the
+    # destination case, which are all fetched concurrently
+    READS: Dict[ChainingVariable, Tuple[List[str], List[str]]] = {}
+    # Tables and columns used by each rule from the files that are
+    # only read, which are all that is kept in the low memory mode
+    TABLES: Dict[ChainingVariable, Dict[str, Dict[str, List[str]]]] = {}
+    # Deck files of the destination case that each rule may rewrite,
+    # including the encoding conversion of the files that it reads
+    WRITES: Dict[ChainingVariable, List[str]] = {}
+
+    def __init__(self):
+        # Source files read once for chaining into many destinations
+        self._pinned: Dict[str, Any] = {}
+
+    async def pin_sources(
+        self,
+        variable: ChainingVariable,
+        sources_uow: List[AbstractUnitOfWork],
+    ):
+        """
+        Reads the files of the last DECOMP source used by a rule once,
+        so they are reused by every following `chain` call of this
+        repository instead of being read again for each destination.
+
+        :param variable: The chained variable
+        :param sources_uow: The units of work of the sources
+        """
+        decomps_uow = [s for s in sources_uow if s.program == Program.DECOMP]
+        if variable not in self.READS or len(decomps_uow) == 0:
+            return
+        names = self.READS[variable][0]
+        tables = self.TABLES.get(variable, {}) if Settings.low_memory else {}
+        with span("chain.pin", variable=variable.value, files=len(names)):
+            files = await asyncio.gather(
+                *[
+                    self.read_file(decomps_uow[-1], n, tables.get(n))
+                    for n in names
+                ]
+            )
+        self._pinned = {
+            n: f
+            for n, f in zip(names, files)
+            if not isinstance(f, HTTPResponse)
+        }
+
+    def unpin_sources(self):
+        self._pinned = {}
+
+    @staticmethod
+    async def read_file(
+        uow: AbstractUnitOfWork,
+        name: str,
+        tables: Optional[Dict[str, List[str]]] = None,
+    ) -> Any:
+        async with uow:
+            getter = getattr(uow.files, f"get_{name}")
+            if asyncio.iscoroutinefunction(getter):
+                obj = await getter()
+            else:
+                obj = await asyncio.to_thread(getter)
+            if tables is None or isinstance(obj, HTTPResponse):
+                return obj
+            # Only the used tables are kept, and the parsed file is
+            # freed as soon as they are extracted
+            compacted = await asyncio.to_thread(compact, obj, tables)
+            uow.files.release(name)
+            return compacted
+
+    @staticmethod
+    def release_files(uows: List[AbstractUnitOfWork], names: List[str]):
+        for uow in uows:
+            try:
+                files = uow.files
+            except RuntimeError:
+                continue
+            for name in names:
+                files.release(name)
+
+    async def read_files(
+        self,
+        variable: ChainingVariable,
+        source_uow: AbstractUnitOfWork,
+        destination_uow: AbstractUnitOfWork,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Reads the files declared by a rule in `READS`, all at the same
+        time, so the time spent is close to that of the slowest file.
+        The pinned source files are not read again.
+
+        :param variable: The chained variable
+        :param source_uow: The unit of work of the source case
+        :param destination_uow: The unit of work of the destination case
+        :return: The files of the source and of the destination, by name
+        :rtype: Tuple[Dict[str, Any], Dict[str, Any]]
+        """
+        source_names, destination_names = self.READS[variable]
+        tables = self.TABLES.get(variable, {}) if Settings.low_memory else {}
+        pending = [n for n in source_names if n not in self._pinned]
+        files = await asyncio.gather(
+            *[self.read_file(source_uow, n, tables.get(n)) for n in pending],
+            *[
+                self.read_file(destination_uow, n, tables.get(n))
+                for n in destination_names
+            ],
+        )
+        source = {
+            n: self._pinned[n] for n in source_names if n in self._pinned
+        }
+        n = len(pending)
+        source.update(zip(pending, files[:n]))
+        return source, dict(zip(destination_names, files[n:]))
+
     async def chain(
         self,
         variable: ChainingVariable,
@@ -34,7 +226,37 @@ class AbstractChainingRepository(ABC):
         f = RULES.get(variable)
         if f is None:
             return HTTPResponse(code=404, detail=f"{variable} not supported")
-        return await f(sources_uow, destination_uow)
+        with span(
+            f"chain.{variable.value}",
+            sources=len(sources_uow),
+            destination=destination_uow.program.value,
+        ) as s:
+            # The destination files written by the rule are kept only
+            # if the whole rule succeeds
+            try:
+                result = await f(sources_uow, destination_uow)
+                if not isinstance(result, HTTPResponse):
+                    published = await asyncio.to_thread(
+                        destination_uow.publish
+                    )
+                    if published.code != 200:
+                        result = published
+            except Exception:
+                destination_uow.rollback()
+                raise
+            if isinstance(result, HTTPResponse):
+                destination_uow.rollback()
+            else:
+                destination_uow.commit()
+            if Settings.low_memory and variable in self.READS:
+                source_names, destination_names = self.READS[variable]
+                self.release_files(sources_uow, source_names)
+                self.release_files([destination_uow], destination_names)
+            if isinstance(result, HTTPResponse):
+                s.set(code=result.code)
+            else:
+                s.set(results=len(result))
+            return result
 
     @abstractmethod
     async def chain_varm(
@@ -72,82 +294,80 @@ class AbstractChainingRepository(ABC):
 class NEWAVEChainingRepository(AbstractChainingRepository):
     """ """
 
+    READS = {
+        ChainingVariable.VARM: (
+            ["relato", "dt"],
+            ["hidr", "confhd", "dger"],
+        ),
+    }
+    WRITES = {
+        ChainingVariable.VARM: ["confhd", "dger"],
+    }
+    TABLES = {
+        ChainingVariable.VARM: {
+            "relato": {
+                "volume_util_reservatorios": ["codigo_usina", "inicial"]
+                + [f"estagio_{i}" for i in range(1, 13)],
+            },
+            "hidr": {"cadastro": ["nome_usina"]},
+        },
+    }
+
     async def chain_varm(
         self,
         sources_uow: List[AbstractUnitOfWork],
         destination_uow: AbstractUnitOfWork,
     ) -> Union[List[ChainingResult], HTTPResponse]:
-        def __numero_uhe_decomp(numero_newave: int) -> int:
-            mapa_ficticias_NW_DC = {
-                318: 122,
-                319: 57,
-                294: 162,
-                295: 156,
-                308: 155,
-                298: 148,
-                292: 252,
-                302: 261,
-                303: 257,
-                306: 253,
-            }
-            if numero_newave in mapa_ficticias_NW_DC.keys():
-                return mapa_ficticias_NW_DC[numero_newave]
-            else:
-                return numero_newave
-
         def __coluna_para_encadear() -> str:
-            # TODO - voltar a suportar caso de NW semanal
-            # if self._caso_atual.revisao == 0:
-            if True:
-                return "estagio_1"
-            else:
-                return list(volumes.columns)[-2]
-
-        def __encadeia_ilha_solteira_equiv(
-            volumes: pd.DataFrame, usinas: pd.DataFrame
-        ) -> pd.DataFrame:
-            vol = volumes.loc[
-                volumes["codigo_usina"] == 44, __coluna_para_encadear()
-            ].iloc[0]
-
-            Log.log().info(f"Caso especial de I. Solteira Equiv: {vol} %")
-            usinas.loc[usinas["codigo_usina"] == 34, "inicial"] = vol
-            usinas.loc[usinas["codigo_usina"] == 43, "inicial"] = vol
-            results.append(
-                ChainingResult(id=hidr.at[34, "nome_usina"], value=vol)
-            )
-            results.append(
-                ChainingResult(id=hidr.at[43, "nome_usina"], value=vol)
-            )
-            return usinas
-
-        def __correcao_serra_mesa_ficticia(vol: float) -> float:
-            return min([100.0, vol / 0.55])
-
-        def __separou_ilha_solteira_equiv(
-            volumes: pd.DataFrame, usinas: pd.DataFrame
-        ) -> bool:
-            # Saber se tem I. Solteira Equiv. no DECOMP mas tem as
-            # usinas separadas no NEWAVE
-            usinas_newave = usinas["codigo_usina"].tolist()
-            usinas_decomp = volumes["codigo_usina"].tolist()
-            return all(
-                [
-                    44 not in usinas_newave,
-                    43 in usinas_newave,
-                    34 in usinas_newave,
-                    44 in usinas_decomp,
-                    43 not in usinas_decomp,
-                    34 not in usinas_decomp,
-                ]
+            if COLUNA_INTERPOLADA in volumes.columns:
+                return COLUNA_INTERPOLADA
+            return "estagio_1"
+
+        def __mes_inicio(dger: Any) -> Optional[int]:
+            if isinstance(dger, HTTPResponse):
+                return None
+            ano, mes = dger.ano_inicio_estudo, dger.mes_inicio_estudo
+            if ano is None or mes is None:
+                return None
+            return month_ordinal(ano, mes)
+
+        def __interpola_volume(
+            volumes: "pd.DataFrame", dadger: Any, dger: Any
+        ) -> Optional["pd.DataFrame"]:
+            from app.utils.interpolation import (
+                decomp_stage_dates,
+                interpolate_storage,
             )
 
-        def __interpola_volume() -> float:
-            # TODO - implementar para maior precisão
-            raise NotImplementedError
+            # Volumes de todas as usinas na data de início do NEWAVE,
+            # entre os volumes dos estágios do relato
+            if isinstance(dadger, HTTPResponse) or isinstance(
+                dger, HTTPResponse
+            ):
+                return None
+            dt = dadger.dt
+            if dt is None or dger.mes_inicio_estudo is None:
+                return None
+            colunas = ["inicial"] + [
+                c for c in volumes.columns if c.startswith("estagio_")
+            ]
+            try:
+                datas = decomp_stage_dates(
+                    date(dt.ano, dt.mes, dt.dia), len(colunas) - 1
+                )
+                inicio = date(
+                    dger.ano_inicio_estudo, dger.mes_inicio_estudo, 1
+                )
+                vols = interpolate_storage(
+                    volumes[colunas].to_numpy(), datas, inicio
+                )
+            except (TypeError, ValueError) as e:
+                Log.log().warning(f"Volumes não interpolados: {e}")
+                return None
+            Log.log().info(f"Volumes interpolados para {inicio}")
+            return volumes.assign(**{COLUNA_INTERPOLADA: vols.round(2)})
 
-        SERRA_MESA_FICT_DC = 251
-        SERRA_MESA_FICT_NW = 291
+        COLUNA_INTERPOLADA = "volume_interpolado"
 
         decomps_uow = [s for s in sources_uow if s.program == Program.DECOMP]
         if len(decomps_uow) == 0:
@@ -158,8 +378,11 @@ class NEWAVEChainingRepository(AbstractChainingRepository):
         assert isinstance(last_decomp_uow, DecompUnitOfWork)
 
         Log.log().info("Encadeando VARM - DECOMP -> NEWAVE")
-        with last_decomp_uow:
-            relato = last_decomp_uow.files.get_relato()
+        assert isinstance(destination_uow, NewaveUnitOfWork)
+        source, destination = await self.read_files(
+            ChainingVariable.VARM, last_decomp_uow, destination_uow
+        )
+        relato = source["relato"]
         if isinstance(relato, HTTPResponse):
             return relato
 
@@ -169,10 +392,8 @@ class NEWAVEChainingRepository(AbstractChainingRepository):
                 code=500, detail="erro na leitura dos volumes do relato"
             )
 
-        assert isinstance(destination_uow, NewaveUnitOfWork)
-        with destination_uow:
-            arq_hidr = destination_uow.files.get_hidr()
-            arq_confhd = destination_uow.files.get_confhd()
+        arq_hidr = destination["hidr"]
+        arq_confhd = destination["confhd"]
         if isinstance(arq_confhd, HTTPResponse):
             return arq_confhd
         if isinstance(arq_hidr, HTTPResponse):
@@ -184,43 +405,35 @@ class NEWAVEChainingRepository(AbstractChainingRepository):
             return HTTPResponse(
                 code=500, detail="erro na leitura das usinas do confhd"
             )
-
-        results: List[ChainingResult] = []
-        # Atualiza cada armazenamento
-        for _, linha in usinas.iterrows():
-            num = linha["codigo_usina"]
-            num_dc = __numero_uhe_decomp(num)
-            # Confere se tem o reservatório
-            if num_dc not in set(volumes["codigo_usina"]):
-                continue
-            vol = volumes.loc[
-                volumes["codigo_usina"] == num_dc, __coluna_para_encadear()
-            ].iloc[0]
-
-            if num_dc == SERRA_MESA_FICT_DC:
-                vf = __correcao_serra_mesa_ficticia(vol)
-                num_nw = SERRA_MESA_FICT_NW
-                usinas.loc[
-                    usinas["codigo_usina"] == num_nw,
-                    "volume_inicial_percentual",
-                ] = vf
-                results.append(
-                    ChainingResult(id=hidr.at[num_nw, "nome_usina"], value=vf)
-                )
-
-            usinas.loc[
-                usinas["codigo_usina"] == num, "volume_inicial_percentual"
-            ] = vol
-            results.append(
-                ChainingResult(id=hidr.at[num, "nome_usina"], value=vol)
+        interpolados = __interpola_volume(
+            volumes, source["dt"], destination["dger"]
+        )
+        if interpolados is not None:
+            volumes = interpolados
+
+        # Atualiza os armazenamentos de todas as usinas de uma vez,
+        # seguindo as regras de mapeamento entre NEWAVE e DECOMP
+        codigos, _, vols = PlantMapping().resolve(
+            Program.NEWAVE,
+            usinas["codigo_usina"].to_numpy(),
+            volumes["codigo_usina"].to_numpy(),
+            volumes[__coluna_para_encadear()].to_numpy(),
+            __mes_inicio(destination["dger"]),
+        )
+        novos = dict(zip(codigos, vols))
+        filtro = usinas["codigo_usina"].isin(codigos)
+        usinas.loc[filtro, "volume_inicial_percentual"] = usinas.loc[
+            filtro, "codigo_usina"
+        ].map(novos)
+        results = [
+            ChainingResult(id=hidr.at[c, "nome_usina"], value=float(v))
+            for c, v in zip(codigos, vols)
+        ]
+
+        async with destination_uow:
+            res = await asyncio.to_thread(
+                destination_uow.files.set_confhd, arq_confhd
             )
-
-        # Trata o caso de I. Solteira Equiv.
-        if __separou_ilha_solteira_equiv(volumes, usinas):
-            usinas = __encadeia_ilha_solteira_equiv(volumes, usinas)
-
-        with destination_uow:
-            res = destination_uow.files.set_confhd(arq_confhd)
             if res.code != 200:
                 return res
 
@@ -251,11 +464,54 @@ class NEWAVEChainingRepository(AbstractChainingRepository):
 class DECOMPChainingRepository(AbstractChainingRepository):
     """ """
 
+    READS = {
+        ChainingVariable.VARM: (["relato"], ["dadger", "hidr"]),
+        ChainingVariable.TVIAGEM: (["dadger", "relato"], ["dadger", "hidr"]),
+        ChainingVariable.GNL: (["dadgnl", "relgnl"], ["dadgnl"]),
+    }
+    WRITES = {
+        ChainingVariable.VARM: ["dadger"],
+        ChainingVariable.TVIAGEM: ["dadger"],
+        ChainingVariable.GNL: ["dadgnl"],
+    }
+    TABLES = {
+        ChainingVariable.VARM: {
+            "relato": {
+                "volume_util_reservatorios": ["codigo_usina", "estagio_1"],
+            },
+            "hidr": {"cadastro": ["nome_usina"]},
+        },
+        ChainingVariable.TVIAGEM: {
+            "relato": {
+                "relatorio_operacao_uhe": [
+                    "estagio",
+                    "codigo_usina",
+                    "vazao_defluente_m3s",
+                ],
+            },
+            "hidr": {"cadastro": ["nome_usina"]},
+        },
+        ChainingVariable.GNL: {
+            "relgnl": {
+                "usinas_termicas": ["codigo_usina", "nome_usina"],
+                "relatorio_operacao_termica": [
+                    "nome_usina",
+                    "data_inicio_semana",
+                    "geracao_patamar_1",
+                    "geracao_patamar_2",
+                    "geracao_patamar_3",
+                ],
+            },
+        },
+    }
+
     async def chain_varm(
         self,
         sources_uow: List[AbstractUnitOfWork],
         destination_uow: AbstractUnitOfWork,
     ) -> Union[List[ChainingResult], HTTPResponse]:
+        from idecomp.decomp.modelos.dadger import UH
+
         decomps_uow = [s for s in sources_uow if s.program == Program.DECOMP]
         if len(decomps_uow) == 0:
             return HTTPResponse(
@@ -266,55 +522,16 @@ class DECOMPChainingRepository(AbstractChainingRepository):
 
         Log.log().info("Encadeando VARM - DECOMP -> DECOMP")
 
-        def __separou_ilha_solteira_equiv(
-            volumes: pd.DataFrame, dadger: Dadger
-        ) -> bool:
-            # Saber se tem I. Solteira Equiv. no DECOMP mas tem as
-            # usinas separadas no próximo DECOMP
-            vols_relato = volumes["codigo_usina"].tolist()
-
-            existe_equiv_relato = 44 in vols_relato
-            existem_separadas_relato = all(
-                [34 in vols_relato, 43 in vols_relato]
-            )
-            existe_equiv_dadger = dadger.uh(44) is not None
-            existem_separadas_dadger = (dadger.uh(34) is not None) and (
-                dadger.uh(43) is not None
-            )
-            return all(
-                [
-                    existe_equiv_relato,
-                    not existem_separadas_relato,
-                    not existe_equiv_dadger,
-                    existem_separadas_dadger,
-                ]
-            )
-
-        def __encadeia_ilha_solteira_equiv(
-            volumes: pd.DataFrame, dadger: Dadger
-        ):
-            vol = volumes.loc[volumes["codigo_usina"] == 44, "estagio_1"].iloc[
-                0
-            ]
-
-            Log.log().info(f"Caso especial de I. Solteira Equiv: {vol} %")
-            for codigo_uh in [34, 43]:
-                uh = dadger.uh(codigo_uh)
-                assert isinstance(uh, UH)
-                uh.volume_inicial = vol
-                nome_usina: str = hidr.at[codigo_uh, "nome_usina"]
-                results.append(ChainingResult(id=nome_usina, value=vol))
-
-        with last_decomp_uow:
-            relato = last_decomp_uow.files.get_relato()
+        assert isinstance(destination_uow, DecompUnitOfWork)
+        source, destination = await self.read_files(
+            ChainingVariable.VARM, last_decomp_uow, destination_uow
+        )
+        relato = source["relato"]
         if isinstance(relato, HTTPResponse):
             return relato
 
-        assert isinstance(destination_uow, DecompUnitOfWork)
-
-        with destination_uow:
-            dadger = await destination_uow.files.get_dadger()
-            arq_hidr = destination_uow.files.get_hidr()
+        dadger = destination["dadger"]
+        arq_hidr = destination["hidr"]
         if isinstance(dadger, HTTPResponse):
             return dadger
         if isinstance(arq_hidr, HTTPResponse):
@@ -327,29 +544,36 @@ class DECOMPChainingRepository(AbstractChainingRepository):
                 code=500, detail="erro na leitura dos volumes do relato"
             )
 
+        import numpy as np
+
+        uhs = dadger.uh()
+        if not isinstance(uhs, list):
+            uhs = [] if uhs is None else [uhs]
+        # Encadeia os armazenamentos de todas as usinas de uma vez,
+        # seguindo as regras de mapeamento entre os DECOMP
+        codigos, vols = decomp_storage(
+            np.array([uh.codigo_usina for uh in uhs], dtype=np.int64),
+            volumes,
+            study_month(dadger),
+        )
+        novos = dict(zip(codigos, vols))
         results: List[ChainingResult] = []
-        # Encadeia cada armazenamento
-        for _, linha in volumes.iterrows():
-            num = linha["codigo_usina"]
-
-            # Caso especial de I. Solteira Equiv.
-            if num == 44 and __separou_ilha_solteira_equiv(volumes, dadger):
-                __encadeia_ilha_solteira_equiv(volumes, dadger)
-                continue
-
-            vol = volumes.loc[
-                volumes["codigo_usina"] == num, "estagio_1"
-            ].iloc[0]
-
-            uh = dadger.uh(num)
+        for uh in uhs:
             assert isinstance(uh, UH)
+            if uh.codigo_usina not in novos:
+                continue
+            vol = float(novos[uh.codigo_usina])
             uh.volume_inicial = vol
             results.append(
-                ChainingResult(id=hidr.at[num, "nome_usina"], value=vol)
+                ChainingResult(
+                    id=hidr.at[uh.codigo_usina, "nome_usina"], value=vol
+                )
             )
 
-        with destination_uow:
-            res = destination_uow.files.set_dadger(dadger)
+        async with destination_uow:
+            res = await asyncio.to_thread(
+                destination_uow.files.set_dadger, dadger
+            )
             if res.code != 200:
                 return res
 
@@ -360,8 +584,7 @@ class DECOMPChainingRepository(AbstractChainingRepository):
         sources_uow: List[AbstractUnitOfWork],
         destination_uow: AbstractUnitOfWork,
     ) -> Union[List[ChainingResult], HTTPResponse]:
-        def __codigos_usinas_tviagem() -> List[int]:
-            return [156, 162]
+        from idecomp.decomp.modelos.dadger import VI
 
         decomps_uow = [s for s in sources_uow if s.program == Program.DECOMP]
         if len(decomps_uow) == 0:
@@ -372,19 +595,19 @@ class DECOMPChainingRepository(AbstractChainingRepository):
         assert isinstance(last_decomp_uow, DecompUnitOfWork)
 
         Log.log().info("Encadeando TVIAGEM - DECOMP -> DECOMP")
-        with last_decomp_uow:
-            dadger_ant = await last_decomp_uow.files.get_dadger()
-            relato = last_decomp_uow.files.get_relato()
+        assert isinstance(destination_uow, DecompUnitOfWork)
+        source, destination = await self.read_files(
+            ChainingVariable.TVIAGEM, last_decomp_uow, destination_uow
+        )
+        dadger_ant = source["dadger"]
+        relato = source["relato"]
         if isinstance(dadger_ant, HTTPResponse):
             return dadger_ant
         if isinstance(relato, HTTPResponse):
             return relato
 
-        assert isinstance(destination_uow, DecompUnitOfWork)
-
-        with destination_uow:
-            dadger = await destination_uow.files.get_dadger()
-            arq_hidr = destination_uow.files.get_hidr()
+        dadger = destination["dadger"]
+        arq_hidr = destination["hidr"]
         if isinstance(dadger, HTTPResponse):
             return dadger
         if isinstance(arq_hidr, HTTPResponse):
@@ -401,7 +624,7 @@ class DECOMPChainingRepository(AbstractChainingRepository):
 
         results: List[ChainingResult] = []
         # Encadeia cada tempo de viagem
-        for codigo in __codigos_usinas_tviagem():
+        for codigo in TVIAGEM_PLANTS:
             # Extrai o Qdef do relato
             qdef = relatorio.loc[
                 (relatorio["estagio"] == 1)
@@ -421,8 +644,10 @@ class DECOMPChainingRepository(AbstractChainingRepository):
                 ChainingResult(id=hidr.at[codigo, "nome_usina"], value=qdef)
             )
 
-        with destination_uow:
-            res = destination_uow.files.set_dadger(dadger)
+        async with destination_uow:
+            res = await asyncio.to_thread(
+                destination_uow.files.set_dadger, dadger
+            )
             if res.code != 200:
                 return res
 
@@ -442,19 +667,18 @@ class DECOMPChainingRepository(AbstractChainingRepository):
         assert isinstance(last_decomp_uow, DecompUnitOfWork)
 
         Log.log().info("Encadeando GNL - DECOMP -> DECOMP")
-
-        with last_decomp_uow:
-            dad_anterior = await last_decomp_uow.files.get_dadgnl()
-            rel = last_decomp_uow.files.get_relgnl()
+        assert isinstance(destination_uow, DecompUnitOfWork)
+        source, destination = await self.read_files(
+            ChainingVariable.GNL, last_decomp_uow, destination_uow
+        )
+        dad_anterior = source["dadgnl"]
+        rel = source["relgnl"]
         if isinstance(dad_anterior, HTTPResponse):
             return dad_anterior
         if isinstance(rel, HTTPResponse):
             return rel
 
-        assert isinstance(destination_uow, DecompUnitOfWork)
-
-        with destination_uow:
-            dad = await destination_uow.files.get_dadgnl()
+        dad = destination["dadgnl"]
         if isinstance(dad, HTTPResponse):
             return dad
 
@@ -489,7 +713,6 @@ class DECOMPChainingRepository(AbstractChainingRepository):
             # Se a usina não existia no deck anterior, ignora
             if len(registros_usina_anterior) == 0:
                 continue
-            cols_despacho = [f"geracao_patamar_{i}" for i in [1, 2, 3]]
             for r in registros_usina:
                 # Para a última semana, o registro GL do DadGNL atual deve vir
                 # do RelGNL do caso anterior, onde a semana de início tenha o
@@ -519,10 +742,7 @@ class DECOMPChainingRepository(AbstractChainingRepository):
                     # Procura pela linha em op filtrando por nome, data
                     # e pegando as colunas dos despachos
                     nome = mapa_codigo_usina[c]
-                    filtro = (op["nome_usina"] == nome) & (
-                        op["data_inicio_semana"] == data
-                    )
-                    geracoes = op.loc[filtro, cols_despacho].to_numpy()
+                    geracoes = gnl_dispatch(op, nome, data)
                     r.geracao = [g for g in geracoes[0]]
                     results.append(ChainingResult(id=nome, value=geracoes[-1]))
                 else:
@@ -534,8 +754,10 @@ class DECOMPChainingRepository(AbstractChainingRepository):
                     ][0]
                     r.geracao = reg_ant.geracao
 
-        with destination_uow:
-            res = destination_uow.files.set_dadgnl(dad)
+        async with destination_uow:
+            res = await asyncio.to_thread(
+                destination_uow.files.set_dadgnl, dad
+            )
             if res.code != 200:
                 return res
 
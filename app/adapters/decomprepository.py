@@ -1,115 +1,174 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Type, Optional, Union
+from typing import Dict, Type, Optional, Union, TYPE_CHECKING
 import pathlib
-from os import curdir
 from os.path import join
-from io import StringIO
-
-from idecomp.decomp.caso import Caso
-from idecomp.decomp.arquivos import Arquivos
-from idecomp.decomp.dadger import Dadger
-from idecomp.decomp.dadgnl import Dadgnl
-from idecomp.decomp.inviabunic import InviabUnic
-from idecomp.decomp.relato import Relato
-from idecomp.decomp.relgnl import Relgnl
-from idecomp.decomp.hidr import Hidr
 
 from app.internal.settings import Settings
-from app.utils.encoding import converte_codificacao
+from app.utils.encoding import converte_codificacao, le_registros
 from app.utils.log import Log
+from app.utils.plugin import load_plugin
 from app.internal.httpresponse import HTTPResponse
+from app.internal.catalog import CaseCatalog
+from app.models.program import Program
+from app.internal.parsecache import ParseCache, parse
+from app.internal.snapshot import FileSnapshot
+from app.utils.tracing import current_span, traced
+
+if TYPE_CHECKING:  # pragma: no cover
+    from idecomp.decomp.caso import Caso
+    from idecomp.decomp.arquivos import Arquivos
+    from idecomp.decomp.dadger import Dadger
+    from idecomp.decomp.dadgnl import Dadgnl
+    from idecomp.decomp.inviabunic import InviabUnic
+    from idecomp.decomp.relato import Relato
+    from idecomp.decomp.relgnl import Relgnl
+    from idecomp.decomp.hidr import Hidr
+
 
-from tests.mocks.arquivos.decomp.dadger import MockDadger
-from tests.mocks.arquivos.decomp.relato import MockRelato
+DECK_FIELDS = ["dadger", "dadgnl", "hidr"]
 
 
 class AbstractDecompRepository(ABC):
     @property
     @abstractmethod
-    def caso(self) -> Union[Caso, HTTPResponse]:
+    def caso(self) -> Union["Caso", HTTPResponse]:
         raise NotImplementedError
 
     @property
     @abstractmethod
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    async def get_dadger(self) -> Union[Dadger, HTTPResponse]:
+    async def get_dadger(self) -> Union["Dadger", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_dadger(self, d: Dadger) -> HTTPResponse:
+    def set_dadger(self, d: "Dadger") -> HTTPResponse:
         raise NotImplementedError
 
+    async def get_dt(self) -> Union["Dadger", HTTPResponse]:
+        """
+        Returns the dadger with only the study start date (register
+        DT), for the cases that are only read. Unlike `get_dadger`,
+        it must never change the file.
+        """
+        return await self.get_dadger()
+
     @abstractmethod
-    async def get_dadgnl(self) -> Union[Dadgnl, HTTPResponse]:
+    async def get_dadgnl(self) -> Union["Dadgnl", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_dadgnl(self, d: Dadgnl) -> HTTPResponse:
+    def set_dadgnl(self, d: "Dadgnl") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_inviabunic(self) -> Union[InviabUnic, HTTPResponse]:
+    def get_inviabunic(self) -> Union["InviabUnic", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_relato(self) -> Union[Relato, HTTPResponse]:
+    def get_relato(self) -> Union["Relato", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_relgnl(self) -> Union[Relgnl, HTTPResponse]:
+    def get_relgnl(self) -> Union["Relgnl", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
         raise NotImplementedError
 
+    def release(self, name: str):
+        """
+        Drops the reference kept to a parsed file, so that it can be
+        freed, being read again if asked for.
+
+        :param name: The file name, as in the `get_` methods
+        """
+        pass
+
+    # Set by the unit of work, for restoring the written files
+    snapshot: Optional[FileSnapshot] = None
+
+    def protect(self, path: str):
+        """
+        Called just before a file of the case is written, so that it
+        can be restored if the chaining fails.
+
+        :param path: The path to the file
+        """
+        if self.snapshot is not None:
+            self.snapshot.protect(path)
+
+    def publish(self) -> HTTPResponse:
+        """
+        Called when the chaining succeeds, before the written files
+        are kept, by the repositories that must send them elsewhere.
+        """
+        return HTTPResponse(code=200, detail="")
+
 
 class RawDecompRepository(AbstractDecompRepository):
     def __init__(self, path: str):
+        from idecomp.decomp.caso import Caso
+
         self.__path = path
         try:
-            self.__caso = Caso.read(join(str(self.__path), "caso.dat"))
+            self.__caso = parse(Caso, join(str(self.__path), "caso.dat"))
         except FileNotFoundError:
             Log.log().error("Não foi encontrado o arquivo caso.dat")
-        self.__arquivos: Optional[Arquivos] = None
-        self.__dadger: Union[Dadger, HTTPResponse] = HTTPResponse(
+        self.__arquivos: Optional["Arquivos"] = None
+        self.__dadger: Union["Dadger", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_dadger = False
-        self.__dadgnl: Union[Dadgnl, HTTPResponse] = HTTPResponse(
+        self.__dadgnl: Union["Dadgnl", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_dadgnl = False
-        self.__relato: Union[Relato, HTTPResponse] = HTTPResponse(
+        self.__relato: Union["Relato", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_relato = False
-        self.__relgnl: Union[Relgnl, HTTPResponse] = HTTPResponse(
+        self.__relgnl: Union["Relgnl", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_relgnl = False
-        self.__inviabunic: Union[InviabUnic, HTTPResponse] = HTTPResponse(
+        self.__inviabunic: Union["InviabUnic", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_inviabunic = False
-        self.__hidr: Union[Hidr, HTTPResponse] = HTTPResponse(
+        self.__hidr: Union["Hidr", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_hidr = False
 
+    def release(self, name: str):
+        # The parsed files are kept in `__<name>`, being read only
+        # while `__read_<name>` is not set
+        flag = f"_RawDecompRepository__read_{name}"
+        if getattr(self, flag, False):
+            setattr(self, flag, False)
+            setattr(
+                self,
+                f"_RawDecompRepository__{name}",
+                HTTPResponse(code=404, detail=""),
+            )
+
     @property
-    def caso(self) -> Caso:
+    def caso(self) -> "Caso":
         return self.__caso
 
     @property
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
         if self.__arquivos is None:
+            from idecomp.decomp.arquivos import Arquivos
+
             try:
-                self.__arquivos = Arquivos.read(
-                    join(self.__path, self.__caso.arquivos)
+                self.__arquivos = parse(
+                    Arquivos, join(self.__path, self.__caso.arquivos)
                 )
             except FileNotFoundError:
                 msg = f"Não foi encontrado o arquivo {self.__caso.arquivos}"
@@ -117,25 +176,57 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=404, detail=msg)
         return self.__arquivos
 
-    async def get_dadger(self) -> Union[Dadger, HTTPResponse]:
+    def __deck_file(self, field: str) -> str:
+        # The deck file names come from the catalog while caso.dat and
+        # arquivos are unchanged, instead of parsing them again
+        deck = CaseCatalog().deck(self.__path)
+        if deck is None:
+            arq = self.arquivos
+            if isinstance(arq, HTTPResponse):
+                raise FileNotFoundError()
+            deck = {f: getattr(arq, f) for f in DECK_FIELDS}
+            arquivos = self.__caso.arquivos
+            if arquivos:
+                CaseCatalog().record_case(
+                    self.__path,
+                    Program.DECOMP.value,
+                    arquivos,
+                    deck,
+                    revision=arquivos,
+                )
+        name = deck.get(field)
+        if not name:
+            raise FileNotFoundError()
+        return name
+
+    @traced("decomp.get_dadger")
+    async def get_dadger(self) -> Union["Dadger", HTTPResponse]:
         if self.__read_dadger is False:
+            from idecomp.decomp.dadger import Dadger
+
             self.__read_dadger = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_dadger = arq.dadger
-                if not arq_dadger:
-                    raise FileNotFoundError()
+                arq_dadger = self.__deck_file("dadger")
                 caminho = str(pathlib.Path(self.__path).joinpath(arq_dadger))
-                script = str(
-                    pathlib.Path(Settings.installdir).joinpath(
-                        Settings.encoding_script
+                current_span().set_file(join(self.__path, arq_dadger))
+                # A dadger written in this process is not read again
+                written = ParseCache().get_written(caminho)
+                if written is None:
+                    script = str(
+                        pathlib.Path(Settings.installdir).joinpath(
+                            Settings.encoding_script
+                        )
                     )
+                    await converte_codificacao(caminho, script)
+                    Log.log().info(f"Lendo arquivo {arq_dadger}")
+                    self.__dadger = await asyncio.to_thread(
+                        parse, Dadger, join(self.__path, arq_dadger)
+                    )
+                else:
+                    self.__dadger = written
+                await asyncio.to_thread(
+                    CaseCatalog().record_file, self.__path, "dadger", arq_dadger
                 )
-                await converte_codificacao(caminho, script)
-                Log.log().info(f"Lendo arquivo {arq_dadger}")
-                self.__dadger = Dadger.read(join(self.__path, arq_dadger))
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo dadger"
                 return HTTPResponse(code=404, detail=msg)
@@ -144,38 +235,76 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=500, detail=str(e))
         return self.__dadger
 
-    def set_dadger(self, d: Dadger) -> HTTPResponse:
+    @traced("decomp.get_dt")
+    async def get_dt(self) -> Union["Dadger", HTTPResponse]:
+        from idecomp.decomp.dadger import Dadger
+
+        # The file encoding is not converted, since the DT register
+        # has only numbers
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_dadger = arq.dadger
-            if not arq_dadger:
-                raise FileNotFoundError()
+            arq_dadger = self.__deck_file("dadger")
+            caminho = join(self.__path, arq_dadger)
+            dt = await asyncio.to_thread(
+                lambda: parse(Dadger, le_registros(caminho, ("DT",)))
+            )
+            await asyncio.to_thread(
+                CaseCatalog().record_file,
+                self.__path,
+                "dadger",
+                arq_dadger,
+                parsed=False,
+            )
+            return dt
+        except FileNotFoundError:
+            msg = "Não foi encontrado o arquivo dadger"
+            return HTTPResponse(code=404, detail=msg)
+        except Exception as e:
+            Log.log().error(f"Erro na leitura do DT do dadger: {e}")
+            return HTTPResponse(code=500, detail=str(e))
+
+    @traced("decomp.set_dadger")
+    def set_dadger(self, d: "Dadger") -> HTTPResponse:
+        try:
+            arq_dadger = self.__deck_file("dadger")
+            self.protect(join(self.__path, arq_dadger))
             d.write(join(self.__path, arq_dadger))
+            ParseCache().write_through(join(self.__path, arq_dadger), d)
+            current_span().set_file(join(self.__path, arq_dadger))
+            CaseCatalog().record_file(
+                self.__path, "dadger", arq_dadger, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    async def get_dadgnl(self) -> Union[Dadgnl, HTTPResponse]:
+    @traced("decomp.get_dadgnl")
+    async def get_dadgnl(self) -> Union["Dadgnl", HTTPResponse]:
         if self.__read_dadgnl is False:
+            from idecomp.decomp.dadgnl import Dadgnl
+
             self.__read_dadgnl = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_dadgnl = arq.dadgnl
-                if not arq_dadgnl:
-                    raise FileNotFoundError()
+                arq_dadgnl = self.__deck_file("dadgnl")
                 caminho = str(pathlib.Path(self.__path).joinpath(arq_dadgnl))
-                script = str(
-                    pathlib.Path(Settings.installdir).joinpath(
-                        Settings.encoding_script
+                current_span().set_file(join(self.__path, arq_dadgnl))
+                # A dadgnl written in this process is not read again
+                written = ParseCache().get_written(caminho)
+                if written is None:
+                    script = str(
+                        pathlib.Path(Settings.installdir).joinpath(
+                            Settings.encoding_script
+                        )
                     )
+                    await converte_codificacao(caminho, script)
+                    Log.log().info(f"Lendo arquivo {arq_dadgnl}")
+                    self.__dadgnl = await asyncio.to_thread(
+                        parse, Dadgnl, join(self.__path, arq_dadgnl)
+                    )
+                else:
+                    self.__dadgnl = written
+                await asyncio.to_thread(
+                    CaseCatalog().record_file, self.__path, "dadgnl", arq_dadgnl
                 )
-                await converte_codificacao(caminho, script)
-                Log.log().info(f"Lendo arquivo {arq_dadgnl}")
-                self.__dadgnl = Dadgnl.read(join(self.__path, arq_dadgnl))
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo dadgnl"
                 return HTTPResponse(code=404, detail=msg)
@@ -184,28 +313,39 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=500, detail=str(e))
         return self.__dadgnl
 
-    def set_dadgnl(self, d: Dadgnl) -> HTTPResponse:
+    @traced("decomp.set_dadgnl")
+    def set_dadgnl(self, d: "Dadgnl") -> HTTPResponse:
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_dadgnl = arq.dadgnl
-            if not arq_dadgnl:
-                raise FileNotFoundError()
+            arq_dadgnl = self.__deck_file("dadgnl")
+            self.protect(join(self.__path, arq_dadgnl))
             d.write(join(self.__path, arq_dadgnl))
+            ParseCache().write_through(join(self.__path, arq_dadgnl), d)
+            current_span().set_file(join(self.__path, arq_dadgnl))
+            CaseCatalog().record_file(
+                self.__path, "dadgnl", arq_dadgnl, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_relato(self) -> Union[Relato, HTTPResponse]:
+    @traced("decomp.get_relato")
+    def get_relato(self) -> Union["Relato", HTTPResponse]:
         if self.__read_relato is False:
+            from idecomp.decomp.relato import Relato
+
             self.__read_relato = True
             try:
                 arq = self.caso.arquivos
                 if not arq:
                     raise FileNotFoundError()
                 Log.log().info(f"Lendo arquivo relato.{arq}")
-                self.__relato = Relato.read(join(self.__path, f"relato.{arq}"))
+                current_span().set_file(join(self.__path, f"relato.{arq}"))
+                self.__relato = ParseCache().get_or_read(
+                    join(self.__path, f"relato.{arq}"), Relato.read
+                )
+                CaseCatalog().record_file(
+                    self.__path, "relato", f"relato.{arq}"
+                )
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo relato"
                 return HTTPResponse(code=404, detail=msg)
@@ -214,15 +354,24 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=500, detail=str(e))
         return self.__relato
 
-    def get_relgnl(self) -> Union[Relgnl, HTTPResponse]:
+    @traced("decomp.get_relgnl")
+    def get_relgnl(self) -> Union["Relgnl", HTTPResponse]:
         if self.__read_relgnl is False:
+            from idecomp.decomp.relgnl import Relgnl
+
             self.__read_relgnl = True
             try:
                 arq = self.caso.arquivos
                 if not arq:
                     raise FileNotFoundError()
                 Log.log().info(f"Lendo arquivo relgnl.{arq}")
-                self.__relgnl = Relgnl.read(join(self.__path, f"relgnl.{arq}"))
+                current_span().set_file(join(self.__path, f"relgnl.{arq}"))
+                self.__relgnl = ParseCache().get_or_read(
+                    join(self.__path, f"relgnl.{arq}"), Relgnl.read
+                )
+                CaseCatalog().record_file(
+                    self.__path, "relgnl", f"relgnl.{arq}"
+                )
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo relgnl"
                 return HTTPResponse(code=404, detail=msg)
@@ -231,16 +380,22 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=500, detail=str(e))
         return self.__relgnl
 
-    def get_inviabunic(self) -> Union[InviabUnic, HTTPResponse]:
+    @traced("decomp.get_inviabunic")
+    def get_inviabunic(self) -> Union["InviabUnic", HTTPResponse]:
         if self.__read_inviabunic is False:
+            from idecomp.decomp.inviabunic import InviabUnic
+
             self.__read_inviabunic = True
             try:
                 arq = self.caso.arquivos
                 if not arq:
                     raise FileNotFoundError()
                 Log.log().info(f"Lendo arquivo inviab_unic.{arq}")
-                self.__inviabunic = InviabUnic.read(
-                    join(self.__path, f"inviab_unic.{arq}")
+                caminho = join(self.__path, f"inviab_unic.{arq}")
+                current_span().set_file(caminho)
+                self.__inviabunic = parse(InviabUnic, caminho)
+                CaseCatalog().record_file(
+                    self.__path, "inviabunic", f"inviab_unic.{arq}"
                 )
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo inviab_unic"
@@ -250,18 +405,20 @@ class RawDecompRepository(AbstractDecompRepository):
                 return HTTPResponse(code=500, detail=str(e))
         return self.__inviabunic
 
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+    @traced("decomp.get_hidr")
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
         if self.__read_hidr is False:
+            from idecomp.decomp.hidr import Hidr
+
             self.__read_hidr = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_hidr = arq.hidr
-                if not arq_hidr:
-                    raise FileNotFoundError()
+                arq_hidr = self.__deck_file("hidr")
                 Log.log().info(f"Lendo arquivo {arq_hidr}")
-                self.__hidr = Hidr.read(join(self.__path, arq_hidr))
+                current_span().set_file(join(self.__path, arq_hidr))
+                self.__hidr = ParseCache().get_or_read(
+                    join(self.__path, arq_hidr), Hidr.read
+                )
+                CaseCatalog().record_file(self.__path, "hidr", arq_hidr)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo hidr"
                 return HTTPResponse(code=404, detail=msg)
@@ -271,52 +428,20 @@ class RawDecompRepository(AbstractDecompRepository):
         return self.__hidr
 
 
-class TestDecompRepository(AbstractDecompRepository):
-    def __init__(self, path: str) -> None:
-        super().__init__()
-
-    @property
-    def caso(self) -> Caso:
-        return Caso.read("rv0")
-
-    @property
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
-        return Arquivos.read("")
-
-    async def get_dadger(self) -> Union[Dadger, HTTPResponse]:
-        return Dadger.read("".join(MockDadger))
-
-    def set_dadger(self, d: Dadger) -> HTTPResponse:
-        sio = StringIO()
-        d.write(sio)
-        return HTTPResponse(code=200, detail=sio.getvalue())
+BACKENDS: Dict[str, str] = {
+    "FS": "app.adapters.decomprepository:RawDecompRepository",
+    "TEST": "app.adapters.testdecomprepository:TestDecompRepository",
+    "S3": "app.adapters.s3decomprepository:S3DecompRepository",
+    "ARCHIVE": "app.adapters.archivedecomprepository:ArchiveDecompRepository",
+}
+DEFAULT = "FS"
 
-    async def get_dadgnl(self) -> Union[Dadgnl, HTTPResponse]:
-        raise NotImplementedError
-
-    def set_dadgnl(self, d: Dadgnl) -> HTTPResponse:
-        raise NotImplementedError
-
-    def get_relato(self) -> Union[Relato, HTTPResponse]:
-        return Relato.read("".join(MockRelato))
-
-    def get_relgnl(self) -> Union[Relgnl, HTTPResponse]:
-        raise NotImplementedError
-
-    def get_inviabunic(self) -> Union[InviabUnic, HTTPResponse]:
-        raise NotImplementedError
 
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
-        with open(
-            join(curdir, "tests", "mocks", "arquivos", "decomp", "hidr.dat"),
-            "rb",
-        ) as f:
-            return Hidr.read(f.read())
+def register(kind: str, spec: str):
+    BACKENDS[kind] = spec
 
 
 def factory(kind: str, *args, **kwargs) -> AbstractDecompRepository:
-    mapping: Dict[str, Type[AbstractDecompRepository]] = {
-        "FS": RawDecompRepository,
-        "TEST": TestDecompRepository,
-    }
-    return mapping.get(kind, RawDecompRepository)(*args, **kwargs)
+    spec = BACKENDS.get(kind, BACKENDS[DEFAULT])
+    backend: Type[AbstractDecompRepository] = load_plugin(spec)
+    return backend(*args, **kwargs)
@@ -1,127 +1,178 @@
+import asyncio
 from abc import ABC, abstractmethod
 import pathlib
 from os.path import join
-from os import curdir
-from typing import Dict, Optional, Union, Type
-from inewave.newave.caso import Caso
-from inewave.newave.arquivos import Arquivos
-from inewave.newave.dger import Dger
-from inewave.newave.hidr import Hidr
-from inewave.newave.confhd import Confhd
-from inewave.newave.eafpast import Eafpast
-from inewave.newave.adterm import Adterm
-from inewave.newave.term import Term
-from inewave.newave.pmo import Pmo
+from typing import Dict, Optional, Union, Type, TYPE_CHECKING
 
 from app.internal.settings import Settings
+from app.utils.confhd import VOLUME_DECIMALS, patch_confhd
 from app.utils.encoding import converte_codificacao
 from app.utils.log import Log
+from app.utils.plugin import load_plugin
 from app.internal.httpresponse import HTTPResponse
+from app.internal.catalog import CaseCatalog
+from app.models.program import Program
+from app.internal.parsecache import ParseCache, parse
+from app.internal.snapshot import FileSnapshot
+from app.utils.tracing import current_span, traced
 
-from tests.mocks.arquivos.newave.arquivos import MockArquivos
-from tests.mocks.arquivos.newave.dger import MockDger
-from tests.mocks.arquivos.newave.confhd import MockConfhd
-from io import StringIO
+if TYPE_CHECKING:  # pragma: no cover
+    from inewave.newave.arquivos import Arquivos
+    from inewave.newave.dger import Dger
+    from inewave.newave.hidr import Hidr
+    from inewave.newave.confhd import Confhd
+    from inewave.newave.eafpast import Eafpast
+    from inewave.newave.adterm import Adterm
+    from inewave.newave.term import Term
+    from inewave.newave.pmo import Pmo
+
+
+DECK_FIELDS = ["dger", "confhd", "vazpast", "adterm", "term", "pmo"]
 
 
 class AbstractNewaveRepository(ABC):
     @property
     @abstractmethod
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    async def get_dger(self) -> Union[Dger, HTTPResponse]:
+    async def get_dger(self) -> Union["Dger", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_dger(self, d: Dger) -> HTTPResponse:
+    def set_dger(self, d: "Dger") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_confhd(self) -> Union[Confhd, HTTPResponse]:
+    def get_confhd(self) -> Union["Confhd", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_confhd(self, d: Confhd) -> HTTPResponse:
+    def set_confhd(self, d: "Confhd") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_eafpast(self) -> Union[Eafpast, HTTPResponse]:
+    def get_eafpast(self) -> Union["Eafpast", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_eafpast(self, d: Eafpast) -> HTTPResponse:
+    def set_eafpast(self, d: "Eafpast") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_adterm(self) -> Union[Adterm, HTTPResponse]:
+    def get_adterm(self) -> Union["Adterm", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_adterm(self, d: Adterm) -> HTTPResponse:
+    def set_adterm(self, d: "Adterm") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_term(self) -> Union[Term, HTTPResponse]:
+    def get_term(self) -> Union["Term", HTTPResponse]:
         raise NotImplementedError
 
     @abstractmethod
-    def set_term(self, d: Term) -> HTTPResponse:
+    def set_term(self, d: "Term") -> HTTPResponse:
         raise NotImplementedError
 
     @abstractmethod
-    def get_pmo(self) -> Union[Pmo, HTTPResponse]:
+    def get_pmo(self) -> Union["Pmo", HTTPResponse]:
         raise NotImplementedError
 
+    def release(self, name: str):
+        """
+        Drops the reference kept to a parsed file, so that it can be
+        freed, being read again if asked for.
+
+        :param name: The file name, as in the `get_` methods
+        """
+        pass
+
+    # Set by the unit of work, for restoring the written files
+    snapshot: Optional[FileSnapshot] = None
+
+    def protect(self, path: str):
+        """
+        Called just before a file of the case is written, so that it
+        can be restored if the chaining fails.
+
+        :param path: The path to the file
+        """
+        if self.snapshot is not None:
+            self.snapshot.protect(path)
+
+    def publish(self) -> HTTPResponse:
+        """
+        Called when the chaining succeeds, before the written files
+        are kept, by the repositories that must send them elsewhere.
+        """
+        return HTTPResponse(code=200, detail="")
+
 
 class RawNewaveRepository(AbstractNewaveRepository):
     def __init__(self, path: str):
+        from inewave.newave.caso import Caso
+
         self.__path = path
         try:
-            self.__caso = Caso.read(join(self.__path, "caso.dat"))
+            self.__caso = parse(Caso, join(self.__path, "caso.dat"))
         except FileNotFoundError:
             Log.log().error("Não foi encontrado o arquivo caso.dat")
-        self.__arquivos: Optional[Arquivos] = None
-        self.__dger: Union[Dger, HTTPResponse] = HTTPResponse(
+        self.__arquivos: Optional["Arquivos"] = None
+        self.__dger: Union["Dger", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_dger = False
-        self.__hidr: Union[Hidr, HTTPResponse] = HTTPResponse(
+        self.__hidr: Union["Hidr", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_hidr = False
-        self.__confhd: Union[Confhd, HTTPResponse] = HTTPResponse(
+        self.__confhd: Union["Confhd", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_confhd = False
-        self.__eafpast: Union[Eafpast, HTTPResponse] = HTTPResponse(
+        self.__eafpast: Union["Eafpast", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_eafpast = False
-        self.__adterm: Union[Adterm, HTTPResponse] = HTTPResponse(
+        self.__adterm: Union["Adterm", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_adterm = False
-        self.__term: Union[Term, HTTPResponse] = HTTPResponse(
+        self.__term: Union["Term", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_term = False
-        self.__pmo: Union[Pmo, HTTPResponse] = HTTPResponse(
+        self.__pmo: Union["Pmo", HTTPResponse] = HTTPResponse(
             code=404, detail=""
         )
         self.__read_pmo = False
 
+    def release(self, name: str):
+        # The parsed files are kept in `__<name>`, being read only
+        # while `__read_<name>` is not set
+        flag = f"_RawNewaveRepository__read_{name}"
+        if getattr(self, flag, False):
+            setattr(self, flag, False)
+            setattr(
+                self,
+                f"_RawNewaveRepository__{name}",
+                HTTPResponse(code=404, detail=""),
+            )
+
     @property
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
         if self.__arquivos is None:
+            from inewave.newave.arquivos import Arquivos
+
             try:
-                self.__arquivos = Arquivos.read(
-                    join(self.__path, self.__caso.arquivos)
+                self.__arquivos = parse(
+                    Arquivos, join(self.__path, self.__caso.arquivos)
                 )
             except FileNotFoundError:
                 msg = f"Não foi encontrado o arquivo {self.__caso.arquivos}"
@@ -129,16 +180,37 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 return HTTPResponse(code=404, detail=msg)
         return self.__arquivos
 
-    async def get_dger(self) -> Union[Dger, HTTPResponse]:
+    def __deck_file(self, field: str) -> str:
+        # The deck file names come from the catalog while caso.dat and
+        # arquivos are unchanged, instead of parsing them again
+        deck = CaseCatalog().deck(self.__path)
+        if deck is None:
+            arq = self.arquivos
+            if isinstance(arq, HTTPResponse):
+                raise FileNotFoundError()
+            deck = {f: getattr(arq, f) for f in DECK_FIELDS}
+            arquivos = self.__caso.arquivos
+            if arquivos:
+                CaseCatalog().record_case(
+                    self.__path,
+                    Program.NEWAVE.value,
+                    arquivos,
+                    deck,
+                    revision=None,
+                )
+        name = deck.get(field)
+        if not name:
+            raise FileNotFoundError()
+        return name
+
+    @traced("newave.get_dger")
+    async def get_dger(self) -> Union["Dger", HTTPResponse]:
         if self.__read_dger is False:
+            from inewave.newave.dger import Dger
+
             self.__read_dger = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_dger = arq.dger
-                if not arq_dger:
-                    raise FileNotFoundError()
+                arq_dger = self.__deck_file("dger")
                 caminho = str(pathlib.Path(self.__path).joinpath(arq_dger))
                 script = str(
                     pathlib.Path(Settings.installdir).joinpath(
@@ -147,7 +219,13 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 )
                 await converte_codificacao(caminho, script)
                 Log.log().info(f"Lendo arquivo {arq_dger}")
-                self.__dger = Dger.read(join(self.__path, arq_dger))
+                current_span().set_file(join(self.__path, arq_dger))
+                self.__dger = await asyncio.to_thread(
+                    parse, Dger, join(self.__path, arq_dger)
+                )
+                await asyncio.to_thread(
+                    CaseCatalog().record_file, self.__path, "dger", arq_dger
+                )
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo dger.dat"
                 self.__dger = HTTPResponse(code=404, detail=msg)
@@ -156,25 +234,33 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__dger = HTTPResponse(code=500, detail=str(e))
         return self.__dger
 
-    def set_dger(self, d: Dger) -> HTTPResponse:
+    @traced("newave.set_dger")
+    def set_dger(self, d: "Dger") -> HTTPResponse:
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_dger = arq.dger
-            if not arq_dger:
-                raise FileNotFoundError()
+            arq_dger = self.__deck_file("dger")
+            self.protect(join(self.__path, arq_dger))
             d.write(join(self.__path, arq_dger))
+            current_span().set_file(join(self.__path, arq_dger))
+            CaseCatalog().record_file(
+                self.__path, "dger", arq_dger, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+    @traced("newave.get_hidr")
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
         if self.__read_hidr is False:
+            from inewave.newave.hidr import Hidr
+
             self.__read_hidr = True
             try:
                 Log.log().info("Lendo arquivo hidr.dat")
-                self.__hidr = Hidr.read(join(self.__path, "hidr.dat"))
+                current_span().set_file(join(self.__path, "hidr.dat"))
+                self.__hidr = ParseCache().get_or_read(
+                    join(self.__path, "hidr.dat"), Hidr.read
+                )
+                CaseCatalog().record_file(self.__path, "hidr", "hidr.dat")
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo hidr.dat"
                 self.__hidr = HTTPResponse(code=404, detail=msg)
@@ -183,18 +269,23 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__hidr = HTTPResponse(code=500, detail=str(e))
         return self.__hidr
 
-    def get_confhd(self) -> Union[Confhd, HTTPResponse]:
+    @traced("newave.get_confhd")
+    def get_confhd(self) -> Union["Confhd", HTTPResponse]:
         if self.__read_confhd is False:
+            from inewave.newave.confhd import Confhd
+
             self.__read_confhd = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_confhd = arq.confhd
-                if not arq_confhd:
-                    raise FileNotFoundError()
-                Log.log().info(f"Lendo arquivo {arq_confhd}")
-                self.__confhd = Confhd.read(join(self.__path, arq_confhd))
+                arq_confhd = self.__deck_file("confhd")
+                caminho = join(self.__path, arq_confhd)
+                current_span().set_file(caminho)
+                # A confhd written in this process is not read again
+                written = ParseCache().get_written(caminho)
+                if written is None:
+                    Log.log().info(f"Lendo arquivo {arq_confhd}")
+                    written = parse(Confhd, caminho)
+                self.__confhd = written
+                CaseCatalog().record_file(self.__path, "confhd", arq_confhd)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo confhd.dat"
                 self.__confhd = HTTPResponse(code=404, detail=msg)
@@ -203,31 +294,51 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__confhd = HTTPResponse(code=500, detail=str(e))
         return self.__confhd
 
-    def set_confhd(self, d: Confhd):
+    @traced("newave.set_confhd")
+    def set_confhd(self, d: "Confhd"):
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_confhd = arq.confhd
-            if not arq_confhd:
-                raise FileNotFoundError()
-            d.write(join(self.__path, arq_confhd))
+            arq_confhd = self.__deck_file("confhd")
+            caminho = join(self.__path, arq_confhd)
+            self.protect(caminho)
+            try:
+                usinas = d.usinas
+                if usinas is None:
+                    raise ValueError("confhd sem usinas")
+                # Only the initial storage of the changed plants is
+                # rewritten, keeping the rest of the file as it is
+                n = patch_confhd(caminho, usinas)
+                Log.log().info(f"{n} usinas alteradas em {arq_confhd}")
+                # The kept object must match the file, which has the
+                # volumes with the precision of their field
+                usinas["volume_inicial_percentual"] = usinas[
+                    "volume_inicial_percentual"
+                ].round(VOLUME_DECIMALS)
+            except (FileNotFoundError, ValueError) as e:
+                Log.log().info(f"Escrevendo {arq_confhd} completo: {e}")
+                d.write(caminho)
+            ParseCache().write_through(caminho, d)
+            current_span().set_file(join(self.__path, arq_confhd))
+            CaseCatalog().record_file(
+                self.__path, "confhd", arq_confhd, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_eafpast(self) -> Union[Eafpast, HTTPResponse]:
+    @traced("newave.get_eafpast")
+    def get_eafpast(self) -> Union["Eafpast", HTTPResponse]:
         if self.__read_eafpast is False:
+            from inewave.newave.eafpast import Eafpast
+
             self.__read_eafpast = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_vazpast = arq.vazpast
-                if not arq_vazpast:
-                    raise FileNotFoundError()
+                arq_vazpast = self.__deck_file("vazpast")
                 Log.log().info(f"Lendo arquivo {arq_vazpast}")
-                self.__eafpast = Eafpast.read(join(self.__path, arq_vazpast))
+                current_span().set_file(join(self.__path, arq_vazpast))
+                self.__eafpast = parse(
+                    Eafpast, join(self.__path, arq_vazpast)
+                )
+                CaseCatalog().record_file(self.__path, "eafpast", arq_vazpast)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo eafpast.dat"
                 self.__eafpast = HTTPResponse(code=404, detail=msg)
@@ -236,31 +347,32 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__eafpast = HTTPResponse(code=500, detail=str(e))
         return self.__eafpast
 
-    def set_eafpast(self, d: Eafpast):
+    @traced("newave.set_eafpast")
+    def set_eafpast(self, d: "Eafpast"):
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_vazpast = arq.vazpast
-            if not arq_vazpast:
-                raise FileNotFoundError()
+            arq_vazpast = self.__deck_file("vazpast")
+            self.protect(join(self.__path, arq_vazpast))
             d.write(join(self.__path, arq_vazpast))
+            current_span().set_file(join(self.__path, arq_vazpast))
+            CaseCatalog().record_file(
+                self.__path, "eafpast", arq_vazpast, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_adterm(self) -> Union[Adterm, HTTPResponse]:
+    @traced("newave.get_adterm")
+    def get_adterm(self) -> Union["Adterm", HTTPResponse]:
         if self.__read_adterm is False:
+            from inewave.newave.adterm import Adterm
+
             self.__read_adterm = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_adterm = arq.adterm
-                if not arq_adterm:
-                    raise FileNotFoundError()
+                arq_adterm = self.__deck_file("adterm")
                 Log.log().info(f"Lendo arquivo {arq_adterm}")
-                self.__adterm = Adterm.read(join(self.__path, arq_adterm))
+                current_span().set_file(join(self.__path, arq_adterm))
+                self.__adterm = parse(Adterm, join(self.__path, arq_adterm))
+                CaseCatalog().record_file(self.__path, "adterm", arq_adterm)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo adterm.dat"
                 self.__adterm = HTTPResponse(code=404, detail=msg)
@@ -269,31 +381,32 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__adterm = HTTPResponse(code=500, detail=str(e))
         return self.__adterm
 
-    def set_adterm(self, d: Adterm):
+    @traced("newave.set_adterm")
+    def set_adterm(self, d: "Adterm"):
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_adterm = arq.adterm
-            if not arq_adterm:
-                raise FileNotFoundError()
+            arq_adterm = self.__deck_file("adterm")
+            self.protect(join(self.__path, arq_adterm))
             d.write(join(self.__path, arq_adterm))
+            current_span().set_file(join(self.__path, arq_adterm))
+            CaseCatalog().record_file(
+                self.__path, "adterm", arq_adterm, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_term(self) -> Union[Term, HTTPResponse]:
+    @traced("newave.get_term")
+    def get_term(self) -> Union["Term", HTTPResponse]:
         if self.__read_term is False:
+            from inewave.newave.term import Term
+
             self.__read_term = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_term = arq.term
-                if not arq_term:
-                    raise FileNotFoundError()
+                arq_term = self.__deck_file("term")
                 Log.log().info(f"Lendo arquivo {arq_term}")
-                self.__term = Term.read(join(self.__path, arq_term))
+                current_span().set_file(join(self.__path, arq_term))
+                self.__term = parse(Term, join(self.__path, arq_term))
+                CaseCatalog().record_file(self.__path, "term", arq_term)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo term.dat"
                 self.__term = HTTPResponse(code=404, detail=msg)
@@ -302,31 +415,34 @@ class RawNewaveRepository(AbstractNewaveRepository):
                 self.__term = HTTPResponse(code=500, detail=str(e))
         return self.__term
 
-    def set_term(self, d: Term):
+    @traced("newave.set_term")
+    def set_term(self, d: "Term"):
         try:
-            arq = self.arquivos
-            if isinstance(arq, HTTPResponse):
-                raise FileNotFoundError()
-            arq_term = arq.term
-            if not arq_term:
-                raise FileNotFoundError()
+            arq_term = self.__deck_file("term")
+            self.protect(join(self.__path, arq_term))
             d.write(join(self.__path, arq_term))
+            current_span().set_file(join(self.__path, arq_term))
+            CaseCatalog().record_file(
+                self.__path, "term", arq_term, parsed=False
+            )
             return HTTPResponse(code=200, detail="")
         except Exception as e:
             return HTTPResponse(code=500, detail=str(e))
 
-    def get_pmo(self) -> Union[Pmo, HTTPResponse]:
+    @traced("newave.get_pmo")
+    def get_pmo(self) -> Union["Pmo", HTTPResponse]:
         if self.__read_pmo is False:
+            from inewave.newave.pmo import Pmo
+
             self.__read_pmo = True
             try:
-                arq = self.arquivos
-                if isinstance(arq, HTTPResponse):
-                    raise FileNotFoundError()
-                arq_pmo = arq.pmo
-                if not arq_pmo:
-                    raise FileNotFoundError()
+                arq_pmo = self.__deck_file("pmo")
                 Log.log().info(f"Lendo arquivo {arq_pmo}")
-                self.__pmo = Pmo.read(join(self.__path, arq_pmo))
+                current_span().set_file(join(self.__path, arq_pmo))
+                self.__pmo = ParseCache().get_or_read(
+                    join(self.__path, arq_pmo), Pmo.read
+                )
+                CaseCatalog().record_file(self.__path, "pmo", arq_pmo)
             except FileNotFoundError:
                 msg = "Não foi encontrado o arquivo pmo.dat"
                 self.__pmo = HTTPResponse(code=404, detail=msg)
@@ -336,60 +452,20 @@ class RawNewaveRepository(AbstractNewaveRepository):
         return self.__pmo
 
 
-class TestNewaveRepository(AbstractNewaveRepository):
-    def __init__(self, path: str) -> None:
-        super().__init__()
-
-    @property
-    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
-        return Arquivos.read("".join(MockArquivos))
-
-    async def get_dger(self) -> Union[Dger, HTTPResponse]:
-        return Dger.read("".join(MockDger))
-
-    def set_dger(self, d: Dger) -> HTTPResponse:
-        raise NotImplementedError
-
-    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
-        with open(
-            join(curdir, "tests", "mocks", "arquivos", "newave", "hidr.dat"),
-            "rb",
-        ) as f:
-            return Hidr.read(f.read())
+BACKENDS: Dict[str, str] = {
+    "FS": "app.adapters.newaverepository:RawNewaveRepository",
+    "TEST": "app.adapters.testnewaverepository:TestNewaveRepository",
+    "S3": "app.adapters.s3newaverepository:S3NewaveRepository",
+    "ARCHIVE": "app.adapters.archivenewaverepository:ArchiveNewaveRepository",
+}
+DEFAULT = "FS"
 
-    def get_confhd(self) -> Union[Confhd, HTTPResponse]:
-        return Confhd.read("".join(MockConfhd))
 
-    def set_confhd(self, d: Confhd) -> HTTPResponse:
-        sio = StringIO()
-        d.write(sio)
-        return HTTPResponse(code=200, detail=sio.getvalue())
-
-    def get_eafpast(self) -> Union[Eafpast, HTTPResponse]:
-        raise NotImplementedError
-
-    def set_eafpast(self, d: Eafpast):
-        raise NotImplementedError
-
-    def get_adterm(self) -> Union[Adterm, HTTPResponse]:
-        raise NotImplementedError
-
-    def set_adterm(self, d: Adterm):
-        raise NotImplementedError
-
-    def get_term(self) -> Union[Term, HTTPResponse]:
-        raise NotImplementedError
-
-    def set_term(self, d: Term):
-        raise NotImplementedError
-
-    def get_pmo(self) -> Union[Pmo, HTTPResponse]:
-        raise NotImplementedError
+def register(kind: str, spec: str):
+    BACKENDS[kind] = spec
 
 
 def factory(kind: str, *args, **kwargs) -> AbstractNewaveRepository:
-    mappings: Dict[str, Type[AbstractNewaveRepository]] = {
-        "FS": RawNewaveRepository,
-        "TEST": TestNewaveRepository,
-    }
-    return mappings.get(kind, RawNewaveRepository)(*args, **kwargs)
+    spec = BACKENDS.get(kind, BACKENDS[DEFAULT])
+    backend: Type[AbstractNewaveRepository] = load_plugin(spec)
+    return backend(*args, **kwargs)
@@ -0,0 +1,149 @@
+import asyncio
+from typing import List, Optional, Union, TYPE_CHECKING
+
+from app.adapters.decomprepository import RawDecompRepository
+from app.internal.httpresponse import HTTPResponse
+from app.internal.objectstore import ObjectStoreMirror, PreconditionFailed
+from app.utils.log import Log
+
+if TYPE_CHECKING:  # pragma: no cover
+    from idecomp.decomp.arquivos import Arquivos
+    from idecomp.decomp.dadger import Dadger
+    from idecomp.decomp.dadgnl import Dadgnl
+    from idecomp.decomp.inviabunic import InviabUnic
+    from idecomp.decomp.relato import Relato
+    from idecomp.decomp.relgnl import Relgnl
+    from idecomp.decomp.hidr import Hidr
+
+
+class S3DecompRepository(RawDecompRepository):
+    """
+    Reads and writes the files of a DECOMP case kept in an object
+    store, through a local disk mirror of the case. The written
+    files are only sent to the store by `publish`.
+    """
+
+    def __init__(self, path: str):
+        self.__mirror = ObjectStoreMirror(path)
+        self.__pending: List[str] = []
+        self.__fetch("caso.dat")
+        super().__init__(self.__mirror.local_dir)
+
+    def __fetch(self, name: Optional[str]):
+        if not name:
+            return
+        try:
+            self.__mirror.fetch(name)
+        except FileNotFoundError:
+            pass
+
+    async def __afetch(self, name: str):
+        try:
+            await self.__mirror.afetch(name)
+        except FileNotFoundError:
+            pass
+
+    def __queue(self, name: Optional[str]) -> HTTPResponse:
+        if not name:
+            msg = "Arquivo do deck não encontrado no arquivos"
+            Log.log().error(msg)
+            return HTTPResponse(code=404, detail=msg)
+        if name not in self.__pending:
+            self.__pending.append(name)
+        return HTTPResponse(code=200, detail="")
+
+    def __push(self, name: str) -> HTTPResponse:
+        try:
+            self.__mirror.push(name)
+            return HTTPResponse(code=200, detail="")
+        except PreconditionFailed:
+            msg = f"O arquivo {name} foi alterado por outro processo"
+            Log.log().error(msg)
+            return HTTPResponse(code=409, detail=msg)
+        except Exception as e:
+            Log.log().error(f"Erro no envio do {name}: {e}")
+            return HTTPResponse(code=500, detail=str(e))
+
+    def publish(self) -> HTTPResponse:
+        """
+        Sends the files written in the local mirror to the object
+        store. The store has no transactions across objects, so the
+        files sent before a failed one are kept there, but their
+        local copies are downloaded again on the next read.
+        """
+        pending, self.__pending = self.__pending, []
+        for name in pending:
+            res = self.__push(name)
+            if res.code != 200:
+                for n in pending:
+                    self.__mirror.forget(n)
+                return res
+        return HTTPResponse(code=200, detail="")
+
+    def __extensao(self) -> Optional[str]:
+        try:
+            return self.caso.arquivos
+        except AttributeError:
+            return None
+
+    def __output(self, prefix: str) -> Optional[str]:
+        extensao = self.__extensao()
+        return f"{prefix}.{extensao}" if extensao else None
+
+    @property
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
+        self.__fetch(self.__extensao())
+        return super().arquivos
+
+    async def __aarquivos(self) -> Union["Arquivos", HTTPResponse]:
+        return await asyncio.to_thread(getattr, self, "arquivos")
+
+    async def get_dadger(self) -> Union["Dadger", HTTPResponse]:
+        arq = await self.__aarquivos()
+        if not isinstance(arq, HTTPResponse) and arq.dadger:
+            await self.__afetch(arq.dadger)
+        return await super().get_dadger()
+
+    async def get_dt(self) -> Union["Dadger", HTTPResponse]:
+        arq = await self.__aarquivos()
+        if not isinstance(arq, HTTPResponse) and arq.dadger:
+            await self.__afetch(arq.dadger)
+        return await super().get_dt()
+
+    def set_dadger(self, d: "Dadger") -> HTTPResponse:
+        res = super().set_dadger(d)
+        arq = self.arquivos
+        if res.code != 200 or isinstance(arq, HTTPResponse):
+            return res
+        return self.__queue(arq.dadger)
+
+    async def get_dadgnl(self) -> Union["Dadgnl", HTTPResponse]:
+        arq = await self.__aarquivos()
+        if not isinstance(arq, HTTPResponse) and arq.dadgnl:
+            await self.__afetch(arq.dadgnl)
+        return await super().get_dadgnl()
+
+    def set_dadgnl(self, d: "Dadgnl") -> HTTPResponse:
+        res = super().set_dadgnl(d)
+        arq = self.arquivos
+        if res.code != 200 or isinstance(arq, HTTPResponse):
+            return res
+        return self.__queue(arq.dadgnl)
+
+    def get_inviabunic(self) -> Union["InviabUnic", HTTPResponse]:
+        self.__fetch(self.__output("inviab_unic"))
+        return super().get_inviabunic()
+
+    def get_relato(self) -> Union["Relato", HTTPResponse]:
+        self.__fetch(self.__output("relato"))
+        return super().get_relato()
+
+    def get_relgnl(self) -> Union["Relgnl", HTTPResponse]:
+        self.__fetch(self.__output("relgnl"))
+        return super().get_relgnl()
+
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
+        arq = self.arquivos
+        if not isinstance(arq, HTTPResponse) and arq.hidr:
+            self.__fetch(arq.hidr)
+        return super().get_hidr()
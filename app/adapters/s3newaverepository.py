@@ -0,0 +1,152 @@
+import asyncio
+from os.path import isfile
+from typing import List, Optional, Union, TYPE_CHECKING
+
+from app.adapters.newaverepository import RawNewaveRepository
+from app.internal.httpresponse import HTTPResponse
+from app.internal.objectstore import ObjectStoreMirror, PreconditionFailed
+from app.internal.parsecache import parse
+from app.utils.log import Log
+
+if TYPE_CHECKING:  # pragma: no cover
+    from inewave.newave.arquivos import Arquivos
+    from inewave.newave.dger import Dger
+    from inewave.newave.hidr import Hidr
+    from inewave.newave.confhd import Confhd
+    from inewave.newave.eafpast import Eafpast
+    from inewave.newave.adterm import Adterm
+    from inewave.newave.term import Term
+    from inewave.newave.pmo import Pmo
+
+
+class S3NewaveRepository(RawNewaveRepository):
+    """
+    Reads and writes the files of a NEWAVE case kept in an object
+    store, through a local disk mirror of the case. The written
+    files are only sent to the store by `publish`.
+    """
+
+    def __init__(self, path: str):
+        from inewave.newave.caso import Caso
+
+        self.__mirror = ObjectStoreMirror(path)
+        self.__pending: List[str] = []
+        self.__fetch("caso.dat")
+        super().__init__(self.__mirror.local_dir)
+        caso = self.__mirror.local_path("caso.dat")
+        self.__arquivos_name: Optional[str] = (
+            parse(Caso, caso).arquivos if isfile(caso) else None
+        )
+
+    def __fetch(self, name: Optional[str]):
+        if not name:
+            return
+        try:
+            self.__mirror.fetch(name)
+        except FileNotFoundError:
+            pass
+
+    async def __afetch(self, name: Optional[str]):
+        if not name:
+            return
+        try:
+            await self.__mirror.afetch(name)
+        except FileNotFoundError:
+            pass
+
+    def __queue(self, name: Optional[str]) -> HTTPResponse:
+        if not name:
+            msg = "Arquivo do deck não encontrado no arquivos"
+            Log.log().error(msg)
+            return HTTPResponse(code=404, detail=msg)
+        if name not in self.__pending:
+            self.__pending.append(name)
+        return HTTPResponse(code=200, detail="")
+
+    def __push(self, name: str) -> HTTPResponse:
+        try:
+            self.__mirror.push(name)
+            return HTTPResponse(code=200, detail="")
+        except PreconditionFailed:
+            msg = f"O arquivo {name} foi alterado por outro processo"
+            Log.log().error(msg)
+            return HTTPResponse(code=409, detail=msg)
+        except Exception as e:
+            Log.log().error(f"Erro no envio do {name}: {e}")
+            return HTTPResponse(code=500, detail=str(e))
+
+    def publish(self) -> HTTPResponse:
+        """
+        Sends the files written in the local mirror to the object
+        store. The store has no transactions across objects, so the
+        files sent before a failed one are kept there, but their
+        local copies are downloaded again on the next read.
+        """
+        pending, self.__pending = self.__pending, []
+        for name in pending:
+            res = self.__push(name)
+            if res.code != 200:
+                for n in pending:
+                    self.__mirror.forget(n)
+                return res
+        return HTTPResponse(code=200, detail="")
+
+    def __name(self, attribute: str) -> Optional[str]:
+        arq = self.arquivos
+        if isinstance(arq, HTTPResponse):
+            return None
+        return getattr(arq, attribute)
+
+    def __sync(self, res: HTTPResponse, attribute: str) -> HTTPResponse:
+        if res.code != 200:
+            return res
+        return self.__queue(self.__name(attribute))
+
+    @property
+    def arquivos(self) -> Union["Arquivos", HTTPResponse]:
+        self.__fetch(self.__arquivos_name)
+        return super().arquivos
+
+    async def get_dger(self) -> Union["Dger", HTTPResponse]:
+        name = await asyncio.to_thread(self.__name, "dger")
+        await self.__afetch(name)
+        return await super().get_dger()
+
+    def set_dger(self, d: "Dger") -> HTTPResponse:
+        return self.__sync(super().set_dger(d), "dger")
+
+    def get_hidr(self) -> Union["Hidr", HTTPResponse]:
+        self.__fetch("hidr.dat")
+        return super().get_hidr()
+
+    def get_confhd(self) -> Union["Confhd", HTTPResponse]:
+        self.__fetch(self.__name("confhd"))
+        return super().get_confhd()
+
+    def set_confhd(self, d: "Confhd") -> HTTPResponse:
+        return self.__sync(super().set_confhd(d), "confhd")
+
+    def get_eafpast(self) -> Union["Eafpast", HTTPResponse]:
+        self.__fetch(self.__name("vazpast"))
+        return super().get_eafpast()
+
+    def set_eafpast(self, d: "Eafpast") -> HTTPResponse:
+        return self.__sync(super().set_eafpast(d), "vazpast")
+
+    def get_adterm(self) -> Union["Adterm", HTTPResponse]:
+        self.__fetch(self.__name("adterm"))
+        return super().get_adterm()
+
+    def set_adterm(self, d: "Adterm") -> HTTPResponse:
+        return self.__sync(super().set_adterm(d), "adterm")
+
+    def get_term(self) -> Union["Term", HTTPResponse]:
+        self.__fetch(self.__name("term"))
+        return super().get_term()
+
+    def set_term(self, d: "Term") -> HTTPResponse:
+        return self.__sync(super().set_term(d), "term")
+
+    def get_pmo(self) -> Union["Pmo", HTTPResponse]:
+        self.__fetch(self.__name("pmo"))
+        return super().get_pmo()
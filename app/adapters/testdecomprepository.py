@@ -0,0 +1,63 @@
+from os import curdir
+from os.path import join
+from io import StringIO
+from typing import Union
+
+from idecomp.decomp.caso import Caso
+from idecomp.decomp.arquivos import Arquivos
+from idecomp.decomp.dadger import Dadger
+from idecomp.decomp.dadgnl import Dadgnl
+from idecomp.decomp.inviabunic import InviabUnic
+from idecomp.decomp.relato import Relato
+from idecomp.decomp.relgnl import Relgnl
+from idecomp.decomp.hidr import Hidr
+
+from app.adapters.decomprepository import AbstractDecompRepository
+from app.internal.httpresponse import HTTPResponse
+from app.internal.parsecache import parse
+
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.decomp.relato import MockRelato
+
+
+class TestDecompRepository(AbstractDecompRepository):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+
+    @property
+    def caso(self) -> Caso:
+        return parse(Caso, "rv0")
+
+    @property
+    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+        return parse(Arquivos, "")
+
+    async def get_dadger(self) -> Union[Dadger, HTTPResponse]:
+        return parse(Dadger, "".join(MockDadger))
+
+    def set_dadger(self, d: Dadger) -> HTTPResponse:
+        sio = StringIO()
+        d.write(sio)
+        return HTTPResponse(code=200, detail=sio.getvalue())
+
+    async def get_dadgnl(self) -> Union[Dadgnl, HTTPResponse]:
+        raise NotImplementedError
+
+    def set_dadgnl(self, d: Dadgnl) -> HTTPResponse:
+        raise NotImplementedError
+
+    def get_relato(self) -> Union[Relato, HTTPResponse]:
+        return parse(Relato, "".join(MockRelato))
+
+    def get_relgnl(self) -> Union[Relgnl, HTTPResponse]:
+        raise NotImplementedError
+
+    def get_inviabunic(self) -> Union[InviabUnic, HTTPResponse]:
+        raise NotImplementedError
+
+    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+        with open(
+            join(curdir, "tests", "mocks", "arquivos", "decomp", "hidr.dat"),
+            "rb",
+        ) as f:
+            return parse(Hidr, f.read())
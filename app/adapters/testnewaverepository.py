@@ -0,0 +1,71 @@
+from os import curdir
+from os.path import join
+from io import StringIO
+from typing import Union
+from inewave.newave.arquivos import Arquivos
+from inewave.newave.dger import Dger
+from inewave.newave.hidr import Hidr
+from inewave.newave.confhd import Confhd
+from inewave.newave.eafpast import Eafpast
+from inewave.newave.adterm import Adterm
+from inewave.newave.term import Term
+from inewave.newave.pmo import Pmo
+
+from app.adapters.newaverepository import AbstractNewaveRepository
+from app.internal.httpresponse import HTTPResponse
+from app.internal.parsecache import parse
+
+from tests.mocks.arquivos.newave.arquivos import MockArquivos
+from tests.mocks.arquivos.newave.dger import MockDger
+from tests.mocks.arquivos.newave.confhd import MockConfhd
+
+
+class TestNewaveRepository(AbstractNewaveRepository):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+
+    @property
+    def arquivos(self) -> Union[Arquivos, HTTPResponse]:
+        return parse(Arquivos, "".join(MockArquivos))
+
+    async def get_dger(self) -> Union[Dger, HTTPResponse]:
+        return parse(Dger, "".join(MockDger))
+
+    def set_dger(self, d: Dger) -> HTTPResponse:
+        raise NotImplementedError
+
+    def get_hidr(self) -> Union[Hidr, HTTPResponse]:
+        with open(
+            join(curdir, "tests", "mocks", "arquivos", "newave", "hidr.dat"),
+            "rb",
+        ) as f:
+            return parse(Hidr, f.read())
+
+    def get_confhd(self) -> Union[Confhd, HTTPResponse]:
+        return parse(Confhd, "".join(MockConfhd))
+
+    def set_confhd(self, d: Confhd) -> HTTPResponse:
+        sio = StringIO()
+        d.write(sio)
+        return HTTPResponse(code=200, detail=sio.getvalue())
+
+    def get_eafpast(self) -> Union[Eafpast, HTTPResponse]:
+        raise NotImplementedError
+
+    def set_eafpast(self, d: Eafpast):
+        raise NotImplementedError
+
+    def get_adterm(self) -> Union[Adterm, HTTPResponse]:
+        raise NotImplementedError
+
+    def set_adterm(self, d: Adterm):
+        raise NotImplementedError
+
+    def get_term(self) -> Union[Term, HTTPResponse]:
+        raise NotImplementedError
+
+    def set_term(self, d: Term):
+        raise NotImplementedError
+
+    def get_pmo(self) -> Union[Pmo, HTTPResponse]:
+        raise NotImplementedError
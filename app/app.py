@@ -1,8 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import chain
+from app.internal.federation import Federation
+from app.internal.plantmapping import PlantMapping
+from app.routers import chain, cache, extract, history, metrics
+from app.services.caseindex import CaseIndex
+from app.services.extraction import ExtractionService
+from app.services.history import ChainHistory
+from app.services.warmup import WarmupService
+from app.services.watcher import CaseWatcher
+from app.utils.tracing import Tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    PlantMapping().load()
+    Federation().load()
+    CaseIndex().start()
+    CaseWatcher().start()
+    yield
+    CaseWatcher().stop()
+    WarmupService().shutdown()
+    ExtractionService().shutdown()
+    ChainHistory().shutdown()
+    Federation().close()
+    Tracer().shutdown()
 
 
 def make_app(root_path: str = "/") -> FastAPI:
-    app = FastAPI(root_path=root_path)
+    app = FastAPI(root_path=root_path, lifespan=lifespan)
     app.include_router(chain.router)
+    app.include_router(cache.router)
+    app.include_router(extract.router)
+    app.include_router(history.router)
+    app.include_router(metrics.router)
     return app
@@ -0,0 +1,265 @@
+import bz2
+import gzip
+import lzma
+import os
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+from app.internal.parsecache import FileKey, ParseCache, parse
+from app.utils.tracing import current_span
+
+
+TAR_COMPRESSIONS: Dict[str, str] = {
+    ".tar": "",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.bz2": "bz2",
+    ".tar.xz": "xz",
+    ".tar.zst": "zst",
+    ".tzst": "zst",
+}
+SUFFIXES = (".zip",) + tuple(TAR_COMPRESSIONS.keys())
+
+READ_CHUNK = 1024 * 1024
+MAX_OPEN_ARCHIVES = 16
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(SUFFIXES)
+
+
+def split_archive_path(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Splits a path that points inside an archive, such as
+    `/estudos/backtest.zip/2023_01/rv0`, into the archive path and the
+    directory inside it.
+
+    :param path: The path to be split
+    :return: The archive path and the inner directory, if the path
+        is inside a supported archive
+    :rtype: Optional[Tuple[str, str]]
+    """
+    archive = os.path.normpath(path)
+    inner: List[str] = []
+    while True:
+        if is_archive(archive) and os.path.isfile(archive):
+            return archive, "/".join(reversed(inner))
+        parent, name = os.path.split(archive)
+        if not name or parent == archive:
+            return None
+        inner.append(name)
+        archive = parent
+
+
+def _normalize(name: str) -> str:
+    name = name[2:] if name.startswith("./") else name
+    return name.rstrip("/")
+
+
+def _decompressor(compression: str) -> Callable[[IO[bytes]], IO[bytes]]:
+    if compression == "gz":
+        return lambda f: gzip.GzipFile(fileobj=f)  # type: ignore
+    if compression == "bz2":
+        return lambda f: bz2.BZ2File(f)  # type: ignore
+    if compression == "xz":
+        return lambda f: lzma.LZMAFile(f)  # type: ignore
+    if compression == "zst":
+        try:
+            import zstandard  # type: ignore
+        except ImportError:
+            raise RuntimeError("zstandard is required for .tar.zst archives")
+        return lambda f: zstandard.ZstdDecompressor().stream_reader(f)
+    return lambda f: f
+
+
+class ArchiveIndex:
+    """
+    Index of the regular file members of an archive, built once when
+    the archive is opened, allowing to read single members without
+    extracting the archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.key: FileKey = ParseCache.key(path)
+
+    def names(self) -> List[str]:
+        raise NotImplementedError
+
+    def read(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def __contains__(self, name: str) -> bool:
+        raise NotImplementedError
+
+
+class ZipIndex(ArchiveIndex):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.__zip = zipfile.ZipFile(path)
+        self.__members: Dict[str, zipfile.ZipInfo] = {
+            _normalize(i.filename): i
+            for i in self.__zip.infolist()
+            if not i.is_dir()
+        }
+
+    def names(self) -> List[str]:
+        return list(self.__members.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__members
+
+    def read(self, name: str) -> bytes:
+        with self.__zip.open(self.__members[name]) as f:
+            return f.read()
+
+
+class TarIndex(ArchiveIndex):
+    """
+    Tar archives store the members contiguously, so the index keeps
+    the offset and size of each member in the uncompressed stream.
+    Plain tar members are read by seeking; compressed ones by
+    streaming the decompression up to the member.
+    """
+
+    def __init__(self, path: str, compression: str):
+        super().__init__(path)
+        self.__open = _decompressor(compression)
+        self.__seekable = compression == ""
+        self.__members: Dict[str, Tuple[int, int]] = {}
+        with open(path, "rb") as raw:
+            stream = self.__open(raw)
+            with tarfile.open(fileobj=stream, mode="r|") as tar:
+                for m in tar:
+                    if m.isfile():
+                        self.__members[_normalize(m.name)] = (
+                            m.offset_data,
+                            m.size,
+                        )
+
+    def names(self) -> List[str]:
+        return list(self.__members.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__members
+
+    def read(self, name: str) -> bytes:
+        offset, size = self.__members[name]
+        with open(self.path, "rb") as raw:
+            if self.__seekable:
+                raw.seek(offset)
+                return raw.read(size)
+            stream = self.__open(raw)
+            while offset > 0:
+                skip = min(READ_CHUNK, offset)
+                offset -= len(self.__read_exact(stream, skip))
+            return self.__read_exact(stream, size)
+
+    def __read_exact(self, stream: IO[bytes], size: int) -> bytes:
+        # Decompressing streams may return less than asked for
+        parts: List[bytes] = []
+        while size > 0:
+            part = stream.read(size)
+            if len(part) == 0:
+                raise EOFError(f"{self.path} is truncated")
+            parts.append(part)
+            size -= len(part)
+        return b"".join(parts)
+
+
+_INDEXES: "OrderedDict[str, ArchiveIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def open_archive(path: str) -> ArchiveIndex:
+    """
+    Returns the index of an archive, reusing the one built before
+    while the archive file is not changed.
+
+    :param path: The archive path
+    :return: The archive index
+    :rtype: ArchiveIndex
+    """
+    path = os.path.abspath(path)
+    key = ParseCache.key(path)
+    with _LOCK:
+        index = _INDEXES.get(path)
+        if index is not None and index.key == key:
+            _INDEXES.move_to_end(path)
+            return index
+    lower = path.lower()
+    if lower.endswith(".zip"):
+        index = ZipIndex(path)
+    else:
+        suffix = [s for s in TAR_COMPRESSIONS if lower.endswith(s)]
+        if len(suffix) == 0:
+            raise ValueError(f"Unsupported archive: {path}")
+        index = TarIndex(path, TAR_COMPRESSIONS[max(suffix, key=len)])
+    with _LOCK:
+        _INDEXES[path] = index
+        _INDEXES.move_to_end(path)
+        while len(_INDEXES) > MAX_OPEN_ARCHIVES:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def decode(content: bytes) -> str:
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content.decode("ISO-8859-1")
+
+
+class ArchiveCase:
+    """
+    A case directory inside an archive, whose files are parsed
+    straight from the archive members.
+    """
+
+    def __init__(self, path: str):
+        split = split_archive_path(path)
+        if split is None:
+            raise FileNotFoundError(path)
+        self.archive, self.prefix = split
+
+    def member(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def exists(self, name: str) -> bool:
+        return self.member(name) in open_archive(self.archive)
+
+    def read(self, name: str, parser: Any, cached: bool = False) -> Any:
+        """
+        Parses a file of the case with the `read()` of a parser,
+        which is given the contents of the member instead of a path.
+
+        :param name: The file name, relative to the case directory
+        :param parser: The parser class
+        :param cached: If the result is kept in the parse cache
+        :return: The parsed object
+        """
+        index = open_archive(self.archive)
+        member = self.member(name)
+        if member not in index:
+            raise FileNotFoundError(f"{self.archive}:{member}")
+
+        def reader(_: str) -> Any:
+            content = index.read(member)
+            current_span().set(
+                **{
+                    "file.path": os.path.join(self.archive, member),
+                    "file.size": len(content),
+                }
+            )
+            if parser.STORAGE == "BINARY":
+                return parse(parser, content)
+            return parse(parser, decode(content))
+
+        if not cached:
+            return reader(member)
+        return ParseCache().get_or_read(
+            os.path.join(self.archive, member), reader, source=self.archive
+        )
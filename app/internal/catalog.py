@@ -0,0 +1,439 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from app.internal.parsecache import FileKey, ParseCache
+from app.internal.settings import Settings
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+HASH_BLOCK = 1024 * 1024
+# Seconds waiting for a lock held by another process on the database
+BUSY_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    path TEXT PRIMARY KEY,
+    program TEXT NOT NULL,
+    revision TEXT,
+    arquivos TEXT NOT NULL,
+    caso_mtime_ns INTEGER NOT NULL,
+    caso_size INTEGER NOT NULL,
+    arquivos_mtime_ns INTEGER NOT NULL,
+    arquivos_size INTEGER NOT NULL,
+    chained_at REAL,
+    chained_variable TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deck (
+    case_path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (case_path, kind)
+);
+CREATE TABLE IF NOT EXISTS files (
+    case_path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    parsed_at REAL,
+    PRIMARY KEY (case_path, kind)
+);
+CREATE TABLE IF NOT EXISTS studies (
+    path TEXT PRIMARY KEY,
+    program TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    revision INTEGER NOT NULL,
+    caso_mtime_ns INTEGER NOT NULL,
+    caso_size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS studies_month
+    ON studies (program, year, month, revision);
+"""
+
+
+def file_hash(path: str) -> str:
+    """
+    Fast content hash of a file, for detecting changes that keep
+    the same size and modification time.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CaseCatalog(metaclass=Singleton):
+    """
+    Local SQLite index of the known cases, with the deck file names
+    resolved from `caso.dat` and `arquivos`, the program and revision
+    of each case, the fingerprints and parse state of its files and
+    when it was last chained. It is filled in as the cases are read.
+
+    The database is kept in `CATALOG_PATH`, or in memory if it is
+    `:memory:`.
+    """
+
+    def __init__(self):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db = ""
+        self._lock = threading.RLock()
+
+    def __connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._db != Settings.catalog_path:
+            if self._conn is not None:
+                self._conn.close()
+            db = Settings.catalog_path
+            if db != ":memory:":
+                directory = os.path.dirname(os.path.abspath(db))
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(
+                db, timeout=BUSY_TIMEOUT, check_same_thread=False
+            )
+            if db != ":memory:":
+                # Readers in other processes do not block the writes
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._db = db
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        return os.path.abspath(str(path))
+
+    def __execute(self, sql: str, *params: Any) -> List[Tuple]:
+        # The catalog must never make a read fail, so an error is taken
+        # as an unknown entry
+        try:
+            with self._lock:
+                conn = self.__connection()
+                with conn:
+                    return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            Log.log().warning(f"Erro no acesso ao catálogo: {e}")
+            return []
+
+    def record_case(
+        self,
+        path: str,
+        program: str,
+        arquivos: str,
+        deck: Mapping[str, Optional[str]],
+        revision: Optional[str] = None,
+    ):
+        """
+        Stores the deck file names of a case, valid while its
+        `caso.dat` and `arquivos` files are not changed.
+
+        :param path: The case directory
+        :param program: The program of the case
+        :param arquivos: The name of the `arquivos` file
+        :param deck: The deck file names, by kind
+        :param revision: The revision of the case, if any
+        """
+        path = self.normalize(path)
+        try:
+            caso_key = ParseCache.key(os.path.join(path, "caso.dat"))
+            arquivos_key = ParseCache.key(os.path.join(path, arquivos))
+            with self._lock:
+                conn = self.__connection()
+                with conn:
+                    self.__upsert_case(
+                        conn,
+                        (path, program, revision, arquivos)
+                        + caso_key
+                        + arquivos_key
+                        + (time.time(),),
+                        [(path, k, n) for k, n in deck.items() if n],
+                    )
+        except (OSError, sqlite3.Error) as e:
+            Log.log().warning(f"Erro no registro do caso {path}: {e}")
+
+    @staticmethod
+    def __upsert_case(
+        conn: sqlite3.Connection, case: Tuple, deck: List[Tuple]
+    ):
+        conn.execute(
+            "INSERT INTO cases (path, program, revision, arquivos,"
+            + " caso_mtime_ns, caso_size, arquivos_mtime_ns,"
+            + " arquivos_size, updated_at)"
+            + " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            + " ON CONFLICT(path) DO UPDATE SET"
+            + " program=excluded.program,"
+            + " revision=excluded.revision,"
+            + " arquivos=excluded.arquivos,"
+            + " caso_mtime_ns=excluded.caso_mtime_ns,"
+            + " caso_size=excluded.caso_size,"
+            + " arquivos_mtime_ns=excluded.arquivos_mtime_ns,"
+            + " arquivos_size=excluded.arquivos_size,"
+            + " updated_at=excluded.updated_at",
+            case,
+        )
+        conn.execute("DELETE FROM deck WHERE case_path = ?", (case[0],))
+        conn.executemany(
+            "INSERT INTO deck (case_path, kind, name) VALUES (?, ?, ?)",
+            deck,
+        )
+
+    def deck(self, path: str) -> Optional[Dict[str, str]]:
+        """
+        Returns the deck file names of a case, if they are known and
+        the files they were resolved from were not changed.
+
+        :param path: The case directory
+        :return: The deck file names, by kind
+        :rtype: Optional[Dict[str, str]]
+        """
+        path = self.normalize(path)
+        rows = self.__execute(
+            "SELECT c.arquivos, c.caso_mtime_ns, c.caso_size,"
+            + " c.arquivos_mtime_ns, c.arquivos_size, d.kind, d.name"
+            + " FROM cases c LEFT JOIN deck d ON d.case_path = c.path"
+            + " WHERE c.path = ?",
+            path,
+        )
+        if len(rows) == 0:
+            return None
+        arquivos = rows[0][0]
+        try:
+            caso_key = ParseCache.key(os.path.join(path, "caso.dat"))
+            arquivos_key = ParseCache.key(os.path.join(path, arquivos))
+        except FileNotFoundError:
+            return None
+        if caso_key != rows[0][1:3] or arquivos_key != rows[0][3:5]:
+            return None
+        return {r[5]: r[6] for r in rows if r[5] is not None}
+
+    def record_file(
+        self, path: str, kind: str, name: str, parsed: bool = True
+    ) -> Optional[str]:
+        """
+        Stores the fingerprint of a file of a case, hashing the file
+        only if its size or modification time changed.
+
+        :param path: The case directory
+        :param kind: The kind of the file (dadger, relato, ...)
+        :param name: The file name
+        :param parsed: If the file was just parsed
+        :return: The content hash, if the file exists
+        :rtype: Optional[str]
+        """
+        path = self.normalize(path)
+        try:
+            key: FileKey = ParseCache.key(os.path.join(path, name))
+        except FileNotFoundError:
+            return None
+        rows = self.__execute(
+            "SELECT name, mtime_ns, size, hash FROM files"
+            + " WHERE case_path = ? AND kind = ?",
+            path,
+            kind,
+        )
+        if len(rows) > 0 and rows[0][0] == name and rows[0][1:3] == key:
+            digest = rows[0][3]
+        else:
+            try:
+                digest = file_hash(os.path.join(path, name))
+            except Exception as e:
+                # The catalog must never make a read fail
+                Log.log().warning(f"Erro no cálculo do hash de {name}: {e}")
+                return None
+        parsed_at = time.time() if parsed else None
+        self.__execute(
+            "INSERT INTO files"
+            + " (case_path, kind, name, mtime_ns, size, hash, parsed_at)"
+            + " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            + " ON CONFLICT(case_path, kind) DO UPDATE SET"
+            + " name=excluded.name, mtime_ns=excluded.mtime_ns,"
+            + " size=excluded.size, hash=excluded.hash,"
+            + " parsed_at=COALESCE(excluded.parsed_at, files.parsed_at)",
+            path,
+            kind,
+            name,
+            key[0],
+            key[1],
+            digest,
+            parsed_at,
+        )
+        return digest
+
+    def fingerprint(self, path: str, kind: str) -> Optional[str]:
+        """
+        Returns the content hash of a file of a case, if the file was
+        recorded and was not changed since then.
+        """
+        path = self.normalize(path)
+        rows = self.__execute(
+            "SELECT name, mtime_ns, size, hash FROM files"
+            + " WHERE case_path = ? AND kind = ?",
+            path,
+            kind,
+        )
+        if len(rows) == 0:
+            return None
+        name, mtime_ns, size, digest = rows[0]
+        try:
+            if ParseCache.key(os.path.join(path, name)) != (mtime_ns, size):
+                return None
+        except FileNotFoundError:
+            return None
+        return digest
+
+    def cache_key(self, path: str) -> Optional[str]:
+        """
+        Returns a key for the contents of a case, made from the
+        hashes of all its recorded files.
+        """
+        rows = self.__execute(
+            "SELECT kind, hash FROM files WHERE case_path = ? ORDER BY kind",
+            self.normalize(path),
+        )
+        if len(rows) == 0:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        for kind, digest in rows:
+            h.update(f"{kind}:{digest};".encode("utf-8"))
+        return h.hexdigest()
+
+    def mark_chained(self, path: str, variable: str):
+        self.__execute(
+            "UPDATE cases SET chained_at = ?, chained_variable = ?"
+            + " WHERE path = ?",
+            time.time(),
+            variable,
+            self.normalize(path),
+        )
+
+    def record_study(
+        self, path: str, program: str, year: int, month: int, revision: int
+    ):
+        """
+        Stores the study month and revision of a case, valid while its
+        `caso.dat` file is not changed.
+
+        :param path: The case directory
+        :param program: The program of the case
+        :param year: The year of the study
+        :param month: The month of the study
+        :param revision: The revision of the case in the month
+        """
+        path = self.normalize(path)
+        try:
+            key = ParseCache.key(os.path.join(path, "caso.dat"))
+        except FileNotFoundError:
+            return
+        self.__execute(
+            "INSERT OR REPLACE INTO studies (path, program, year, month,"
+            + " revision, caso_mtime_ns, caso_size)"
+            + " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            path,
+            program,
+            year,
+            month,
+            revision,
+            *key,
+        )
+
+    def study(self, path: str) -> Optional[Tuple[str, int, int, int]]:
+        """
+        Returns the program, year, month and revision of a case, if
+        they are known and its `caso.dat` was not changed.
+        """
+        path = self.normalize(path)
+        rows = self.__execute(
+            "SELECT program, year, month, revision, caso_mtime_ns,"
+            + " caso_size FROM studies WHERE path = ?",
+            path,
+        )
+        if len(rows) == 0:
+            return None
+        try:
+            key = ParseCache.key(os.path.join(path, "caso.dat"))
+        except FileNotFoundError:
+            self.forget_study(path)
+            return None
+        if key != rows[0][4:6]:
+            return None
+        return rows[0][:4]
+
+    def forget_study(self, path: str):
+        self.__execute(
+            "DELETE FROM studies WHERE path = ?", self.normalize(path)
+        )
+
+    def studies(
+        self, program: str, year: int, month: int
+    ) -> List[Tuple[str, int]]:
+        """
+        Returns the known cases of a program in a study month, with
+        their revisions, from the last revision to the first.
+
+        :return: The case directories and revisions
+        :rtype: List[Tuple[str, int]]
+        """
+        rows = self.__execute(
+            "SELECT path, revision FROM studies"
+            + " WHERE program = ? AND year = ? AND month = ?"
+            + " ORDER BY revision DESC, path",
+            program,
+            year,
+            month,
+        )
+        return [(r[0], r[1]) for r in rows]
+
+    def case(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the catalog entry of a case, with its files.
+        """
+        path = self.normalize(path)
+        rows = self.__execute(
+            "SELECT program, revision, arquivos, chained_at,"
+            + " chained_variable FROM cases WHERE path = ?",
+            path,
+        )
+        if len(rows) == 0:
+            return None
+        program, revision, arquivos, chained_at, chained_variable = rows[0]
+        files = self.__execute(
+            "SELECT kind, name, size, mtime_ns, hash, parsed_at FROM files"
+            + " WHERE case_path = ?",
+            path,
+        )
+        return {
+            "path": path,
+            "program": program,
+            "revision": revision,
+            "arquivos": arquivos,
+            "chained_at": chained_at,
+            "chained_variable": chained_variable,
+            "deck": self.__deck_names(path),
+            "files": {
+                f[0]: {
+                    "name": f[1],
+                    "size": f[2],
+                    "mtime_ns": f[3],
+                    "hash": f[4],
+                    "parsed_at": f[5],
+                }
+                for f in files
+            },
+        }
+
+    def __deck_names(self, path: str) -> Dict[str, str]:
+        rows = self.__execute(
+            "SELECT kind, name FROM deck WHERE case_path = ?", path
+        )
+        return {k: n for k, n in rows}
@@ -1,6 +1,7 @@
-from typing import Type
+from typing import AsyncIterator, Type
 from fastapi import HTTPException
 from app.internal.settings import Settings
+from app.services.admission import AdmissionController, AdmissionRejected
 from app.adapters.uriparserrepository import AbstractURIParsingRepository
 from app.adapters.uriparserrepository import factory as parser_factory
 
@@ -12,3 +13,15 @@ async def uriParser() -> Type[AbstractURIParsingRepository]:
             500, f"URI pattern {Settings.uri_pattern} not supported"
         )
     return s
+
+
+async def admission() -> AsyncIterator[None]:
+    try:
+        async with AdmissionController().admit():
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(
+            503,
+            f"Service overloaded ({e.reason})",
+            headers={"Retry-After": str(Settings.chain_retry_after)},
+        )
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.internal.settings import Settings
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+# Set on forwarded requests, which are always served by the receiver
+HOP_HEADER = "X-Federation-Hop"
+SERVED_BY_HEADER = "X-Served-By"
+
+FORWARDED_HEADERS = ["X-Request-ID", "Idempotency-Key"]
+
+
+class Federation(metaclass=Singleton):
+    """
+    Ownership of the case directories by the clusters of a federation
+    of services, read from `FEDERATION_FILE`. Each root directory
+    prefix belongs to a cluster, and the requests for the cases of the
+    other clusters are forwarded to their services by a pooled HTTP
+    session, that lives in its own event loop thread. Without the file,
+    every case is served locally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clusters: Dict[str, str] = {}
+        # (prefix, cluster), longest prefixes first
+        self._roots: Optional[List[Tuple[str, str]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Any = None
+        self.local = 0
+        self.forwarded = 0
+        self.failed = 0
+        self.routing_seconds = 0.0
+        self.forward_seconds = 0.0
+
+    @staticmethod
+    def path() -> Optional[pathlib.Path]:
+        if not Settings.federation_file:
+            return None
+        return pathlib.Path(Settings.installdir).joinpath(
+            Settings.federation_file
+        )
+
+    def load(self, path: Optional[str] = None):
+        """
+        Reads the ownership map, with the service URL of each cluster
+        in `clusters` and the cluster of each root directory prefix
+        in `raizes`.
+
+        :param path: The map file, if not the configured one
+        """
+        file = pathlib.Path(path) if path is not None else self.path()
+        if file is None:
+            self.configure({}, {})
+            return
+        with open(file, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        self.configure(
+            content.get("clusters", {}), content.get("raizes", {})
+        )
+
+    def configure(self, clusters: Dict[str, str], roots: Dict[str, str]):
+        for prefix, cluster in roots.items():
+            if str(cluster) not in clusters:
+                raise ValueError(f"Cluster {cluster} de {prefix} sem URL")
+        compiled = sorted(
+            [
+                (os.path.join(os.path.abspath(p), ""), str(c))
+                for p, c in roots.items()
+            ],
+            key=lambda r: len(r[0]),
+            reverse=True,
+        )
+        with self._lock:
+            self._clusters = {str(k): v for k, v in clusters.items()}
+            self._roots = compiled
+        if len(compiled) > 0:
+            Log.log().info(
+                f"Federação com {len(clusters)} clusters e "
+                + f"{len(compiled)} raízes"
+            )
+
+    def owner(self, path: str) -> Optional[str]:
+        """
+        Returns the cluster that owns a case directory, if any.
+        """
+        case = os.path.join(os.path.abspath(str(path)), "")
+        with self._lock:
+            roots = self._roots
+        if roots is None:
+            self.load()
+            return self.owner(path)
+        for prefix, cluster in roots:
+            if case.startswith(prefix):
+                return cluster
+        return None
+
+    def remote(self, path: str) -> Optional[str]:
+        """
+        Returns the service URL of the cluster that owns a case
+        directory, if it is not this cluster.
+        """
+        t0 = time.perf_counter()
+        cluster = self.owner(path)
+        url = None
+        if cluster is not None and cluster != str(Settings.clusterId):
+            url = self._clusters[cluster]
+        self.routing_seconds += time.perf_counter() - t0
+        if url is None:
+            self.local += 1
+        return url
+
+    def __ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="federation",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    async def __session(self):
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=Settings.federation_connections
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=Settings.federation_timeout
+                ),
+            )
+        return self._session
+
+    async def __post(
+        self, url: str, body: bytes, headers: Dict[str, str]
+    ) -> Tuple[int, bytes, Dict[str, str]]:
+        session = await self.__session()
+        async with session.post(url, data=body, headers=headers) as r:
+            headers = {k.lower(): v for k, v in r.headers.items()}
+            return r.status, await r.read(), headers
+
+    async def forward(
+        self,
+        base_url: str,
+        route: str,
+        body: bytes,
+        headers: Dict[str, str],
+    ) -> Tuple[int, bytes, Dict[str, str]]:
+        """
+        Sends a request to the service of another cluster.
+
+        :param base_url: The service URL of the cluster
+        :param route: The route, as in `/chain/`
+        :param body: The JSON body
+        :param headers: The headers to be forwarded
+        :return: The status, body and headers (in lower case) of the
+            response
+        :rtype: Tuple[int, bytes, Dict[str, str]]
+        """
+        loop = self.__ensure_loop()
+        headers = {
+            **headers,
+            "Content-Type": "application/json",
+            HOP_HEADER: str(Settings.clusterId),
+        }
+        t0 = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(
+                    self.__post(
+                        base_url.rstrip("/") + route, body, headers
+                    ),
+                    loop,
+                )
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.forwarded += 1
+            self.forward_seconds += time.perf_counter() - t0
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._session.close(), loop
+            ).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+        loop.close()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "local": self.local,
+            "forwarded": self.forwarded,
+            "failed": self.failed,
+            "routing_seconds": round(self.routing_seconds, 6),
+            "forward_seconds": round(self.forward_seconds, 6),
+        }
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import quote, urlparse
+
+from app.internal.settings import Settings
+from app.utils.singleton import Singleton
+
+T = TypeVar("T")
+
+META_DIR = ".objectstore"
+
+
+class PreconditionFailed(Exception):
+    """
+    Raised when a conditional write is rejected because the object
+    was changed by someone else.
+    """
+
+    pass
+
+
+class ObjectStoreClient(metaclass=Singleton):
+    """
+    Client for an S3-style object store, with a pooled HTTP session
+    that lives in its own event loop thread, so it can be used
+    from both sync and async code.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Any = None
+        self._lock = threading.Lock()
+
+    def __ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="objectstore",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def call(self, coro: Coroutine[Any, Any, T]) -> T:
+        loop = self.__ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def acall(self, coro: Coroutine[Any, Any, T]) -> T:
+        loop = self.__ensure_loop()
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, loop)
+        )
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._session.close(), loop
+            ).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+        loop.close()
+
+    async def __session(self):
+        import aiohttp
+
+        if self._session is None:
+            headers = {}
+            if Settings.object_store_token:
+                headers["Authorization"] = (
+                    f"Bearer {Settings.object_store_token}"
+                )
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=Settings.object_store_connections
+                ),
+                headers=headers,
+            )
+        return self._session
+
+    @staticmethod
+    def url(bucket: str, key: str) -> str:
+        return f"{Settings.object_store_url.rstrip('/')}/{bucket}/" + quote(
+            key
+        )
+
+    async def head(self, bucket: str, key: str) -> Optional[Tuple[int, str]]:
+        """
+        Returns the size and the ETag of an object, if it exists.
+        """
+        session = await self.__session()
+        async with session.head(self.url(bucket, key)) as r:
+            if r.status == 404:
+                return None
+            r.raise_for_status()
+            return int(r.headers["Content-Length"]), r.headers["ETag"]
+
+    async def get_range(
+        self, bucket: str, key: str, start: int, end: int
+    ) -> bytes:
+        """
+        Reads the bytes in the interval [start, end] of an object.
+        """
+        session = await self.__session()
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with session.get(self.url(bucket, key), headers=headers) as r:
+            r.raise_for_status()
+            return await r.read()
+
+    async def get(self, bucket: str, key: str) -> Tuple[bytes, str]:
+        """
+        Reads a whole object, returning its contents and ETag.
+        Large objects are read as parallel ranged requests.
+        """
+        info = await self.head(bucket, key)
+        if info is None:
+            raise FileNotFoundError(f"{bucket}/{key}")
+        size, etag = info
+        chunk = Settings.object_store_chunk_size
+        if size <= chunk:
+            session = await self.__session()
+            async with session.get(self.url(bucket, key)) as r:
+                r.raise_for_status()
+                return await r.read(), r.headers.get("ETag", etag)
+        parts: List[bytes] = await asyncio.gather(
+            *[
+                self.get_range(bucket, key, s, min(s + chunk, size) - 1)
+                for s in range(0, size, chunk)
+            ]
+        )
+        return b"".join(parts), etag
+
+    async def put(
+        self,
+        bucket: str,
+        key: str,
+        data: bytes,
+        if_match: Optional[str] = None,
+    ) -> str:
+        """
+        Writes an object, returning its new ETag. The write only
+        succeeds if the object still has the ETag `if_match` or,
+        when it is not given, if the object does not exist.
+        """
+        session = await self.__session()
+        headers = (
+            {"If-None-Match": "*"}
+            if if_match is None
+            else {"If-Match": if_match}
+        )
+        async with session.put(
+            self.url(bucket, key), data=data, headers=headers
+        ) as r:
+            if r.status == 412:
+                raise PreconditionFailed(f"{bucket}/{key}")
+            r.raise_for_status()
+            return r.headers["ETag"]
+
+
+class ObjectStoreMirror:
+    """
+    Local disk mirror of a case stored in the object store. Each
+    object is downloaded once and kept while its ETag is unchanged.
+
+    A case path is given either as `s3://bucket/prefix` or as a
+    prefix inside the default bucket.
+    """
+
+    def __init__(self, path: str):
+        parsed = urlparse(path)
+        if parsed.scheme == "s3":
+            self.bucket = parsed.netloc
+            self.prefix = parsed.path.strip("/")
+        else:
+            self.bucket = Settings.object_store_bucket
+            self.prefix = path.strip("/")
+        self.local_dir = os.path.join(
+            Settings.object_cache_dir, self.bucket, self.prefix
+        )
+        self.__etags: Dict[str, str] = {}
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def local_path(self, name: str) -> str:
+        return os.path.join(self.local_dir, name)
+
+    def __etag_path(self, name: str) -> str:
+        return os.path.join(self.local_dir, META_DIR, f"{name}.etag")
+
+    def __cached_etag(self, name: str) -> Optional[str]:
+        if not os.path.isfile(self.local_path(name)):
+            return None
+        try:
+            with open(self.__etag_path(name)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def __store(self, name: str, data: bytes, etag: str):
+        os.makedirs(os.path.join(self.local_dir, META_DIR), exist_ok=True)
+        tmp = self.local_path(name) + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.local_path(name))
+        with open(self.__etag_path(name), "w") as f:
+            f.write(etag)
+        self.__etags[name] = etag
+
+    async def __refresh(self, name: str) -> str:
+        client = ObjectStoreClient()
+        info = await client.head(self.bucket, self.key(name))
+        if info is None:
+            raise FileNotFoundError(self.key(name))
+        cached = self.__cached_etag(name)
+        if cached == info[1]:
+            self.__etags[name] = cached
+        else:
+            data, etag = await client.get(self.bucket, self.key(name))
+            self.__store(name, data, etag)
+        return self.local_path(name)
+
+    def fetch(self, name: str) -> str:
+        """
+        Makes sure the local copy of an object is up to date and
+        returns its path. Raises `FileNotFoundError` if the object
+        does not exist.
+        """
+        if name in self.__etags:
+            return self.local_path(name)
+        return ObjectStoreClient().call(self.__refresh(name))
+
+    async def afetch(self, name: str) -> str:
+        if name in self.__etags:
+            return self.local_path(name)
+        return await ObjectStoreClient().acall(self.__refresh(name))
+
+    def forget(self, name: str):
+        """
+        Drops the ETag kept for the local copy of an object, so that
+        it is downloaded again by the next fetch.
+        """
+        self.__etags.pop(name, None)
+        if os.path.isfile(self.__etag_path(name)):
+            os.remove(self.__etag_path(name))
+
+    def push(self, name: str):
+        """
+        Uploads the local copy of an object, only if the remote
+        object was not changed since it was downloaded.
+        """
+        client = ObjectStoreClient()
+        with open(self.local_path(name), "rb") as f:
+            data = f.read()
+        try:
+            etag = client.call(
+                client.put(
+                    self.bucket, self.key(name), data, self.__etags.get(name)
+                )
+            )
+        except PreconditionFailed:
+            # The local copy is not valid anymore
+            self.forget(name)
+            raise
+        with open(self.__etag_path(name), "w") as f:
+            f.write(etag)
+        self.__etags[name] = etag
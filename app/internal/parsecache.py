@@ -0,0 +1,244 @@
+import copy
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.internal.settings import Settings
+from app.utils.singleton import Singleton
+
+T = TypeVar("T")
+
+FileKey = Tuple[int, int]
+Entry = Tuple[str, FileKey, Any]
+
+# The parsers of the register files (hidr, dadger, ...) keep the
+# fields being read in their classes, which are shared between reads
+# of the same file type, so each file type is parsed by one thread at
+# a time
+_PARSE_LOCKS: Dict[Any, threading.Lock] = defaultdict(threading.Lock)
+_PARSE_LOCKS_GUARD = threading.Lock()
+
+
+def parse_lock(parser: Any) -> threading.Lock:
+    """
+    Returns the lock held while parsing a file with a parser class.
+    """
+    with _PARSE_LOCKS_GUARD:
+        return _PARSE_LOCKS[parser]
+
+
+def parse(parser: Any, content: Any) -> Any:
+    """
+    Parses a file with the `read()` of a parser class, while holding
+    the lock of the class.
+
+    :param parser: The parser class
+    :param content: The path to the file, or its contents
+    :return: The parsed object
+    """
+    with parse_lock(parser):
+        return parser.read(content)
+
+
+class ParseCache(metaclass=Singleton):
+    """
+    Process-wide LRU cache of parsed files, keyed by their absolute
+    path and validated by the (mtime, size) pair of the file. Files
+    that are not in disk by themselves (i.e. archive members) are
+    validated by the file that contains them, given as `source`.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._trusted: Tuple[str, ...] = ()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: str) -> FileKey:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @property
+    def capacity(self) -> int:
+        # In the low memory mode the parsed files are not kept
+        # between requests
+        if Settings.low_memory:
+            return 0
+        return Settings.parse_cache_size
+
+    def trust(self, roots: List[str]):
+        """
+        Marks the entries under some directories as kept up to date
+        by someone else (i.e. a filesystem watcher), so that lookups
+        of them are not validated against the file metadata.
+
+        :param roots: The directories, or an empty list for none
+        """
+        self._trusted = tuple(
+            os.path.join(os.path.abspath(r), "") for r in roots
+        )
+
+    def is_trusted(self, path: str) -> bool:
+        return path.startswith(self._trusted) if self._trusted else False
+
+    def get(self, path: str, validate: bool = False) -> Optional[Any]:
+        """
+        Returns the cached object for a file, if the file was not
+        changed since it was parsed.
+
+        :param path: The path to the file
+        :param validate: If the file metadata is checked even for
+            trusted directories
+        :return: The parsed object, if cached
+        :rtype: Optional[Any]
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return None
+        source, key, obj = entry
+        if validate or not self.is_trusted(source):
+            try:
+                current = self.key(source)
+            except FileNotFoundError:
+                self.invalidate(path)
+                return None
+            if key != current:
+                self.invalidate(path)
+                return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        return obj
+
+    def put(
+        self,
+        path: str,
+        obj: Any,
+        key: Optional[FileKey] = None,
+        source: Optional[str] = None,
+    ):
+        if self.capacity <= 0:
+            return
+        path = os.path.abspath(path)
+        source = path if source is None else os.path.abspath(source)
+        if key is None:
+            key = self.key(source)
+        with self._lock:
+            self._entries[path] = (source, key, obj)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def write_through(self, path: str, obj: Any):
+        """
+        Keeps an object that was just written to a file, validated by
+        the file metadata after the write, so that the next read of
+        the file in the process does not parse it again.
+
+        :param path: The path to the written file
+        :param obj: The written object
+        """
+        try:
+            self.put(path, obj)
+        except OSError:
+            self.invalidate(path)
+
+    def get_written(self, path: str) -> Optional[Any]:
+        """
+        Returns a copy of the object kept by `write_through` for a
+        file, if the file was not changed since it was written. The
+        written files are decks, which are changed by whoever reads
+        them, so the kept object is never given away, and the watchers
+        do not track them, so they are always checked.
+
+        :param path: The path to the file
+        :return: A copy of the written object, if cached
+        :rtype: Optional[Any]
+        """
+        cached = self.get(path, validate=True)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(cached)
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def revalidate(self, roots: List[str]):
+        """
+        Drops the entries under some directories whose files were
+        changed or removed since they were parsed.
+
+        :param roots: The directories to be checked
+        """
+        prefixes = tuple(os.path.join(os.path.abspath(r), "") for r in roots)
+        with self._lock:
+            entries = [
+                (p, e[0], e[1])
+                for p, e in self._entries.items()
+                if e[0].startswith(prefixes)
+            ]
+        for path, source, key in entries:
+            try:
+                if self.key(source) == key:
+                    continue
+            except FileNotFoundError:
+                pass
+            self.invalidate(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_read(
+        self,
+        path: str,
+        reader: Callable[[str], T],
+        source: Optional[str] = None,
+    ) -> T:
+        """
+        Returns the cached object for a file or parses it with
+        the given reader, storing the result. A reader that is the
+        `read()` of a parser class is called holding the lock of the
+        class, and any other reader must take it by itself.
+
+        :param path: The path to the file
+        :param reader: The parser to be called with the file path
+        :param source: The file that validates the entry, if it is
+            not the file itself
+        :return: The parsed object
+        """
+        cached = self.get(path)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        validator = path if source is None else source
+        key = self.key(validator)
+        parser = getattr(reader, "__self__", None)
+        if isinstance(parser, type):
+            with parse_lock(parser):
+                obj = reader(path)
+        else:
+            obj = reader(path)
+        # A file changed while it was parsed is not stored, since the
+        # lookups of trusted paths would not see the change and the
+        # watcher may have already dropped the entry
+        try:
+            if self.key(validator) == key:
+                self.put(path, obj, key, source)
+        except FileNotFoundError:
+            pass
+        return obj
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,219 @@
+import json
+import pathlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from app.internal.settings import Settings
+from app.models.program import Program
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+# Months are compared as ordinals (12 * year + month)
+ALWAYS = (0, 12 * 9999 + 12)
+
+RULE_TYPES = ["remapeamento", "escala", "divisao"]
+
+
+def month_ordinal(year: int, month: int) -> int:
+    return 12 * year + month
+
+
+def _parse_month(value: Optional[str], default: int) -> int:
+    if value is None:
+        return default
+    year, month = value.split("-")
+    return month_ordinal(int(year), int(month))
+
+
+class CompiledRules:
+    """
+    The mapping rules of one destination program, as lookup arrays
+    sorted by the destination plant code.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        import numpy as np
+
+        pairs = [r for r in rules if r["tipo"] in ["remapeamento", "escala"]]
+        pairs.sort(key=lambda r: r["destino"])
+        self.destination = np.array(
+            [r["destino"] for r in pairs], dtype=np.int64
+        )
+        self.source = np.array([r["origem"] for r in pairs], dtype=np.int64)
+        self.divisor = np.array(
+            [r.get("divisor", 1.0) for r in pairs], dtype=np.float64
+        )
+        self.minimum = np.array(
+            [r.get("minimo", -np.inf) for r in pairs], dtype=np.float64
+        )
+        self.maximum = np.array(
+            [r.get("maximo", np.inf) for r in pairs], dtype=np.float64
+        )
+        self.start, self.end = self.__validity(pairs)
+        self.splits = [r for r in rules if r["tipo"] == "divisao"]
+        self.split_start, self.split_end = self.__validity(self.splits)
+
+    @staticmethod
+    def __validity(
+        rules: List[Dict[str, Any]]
+    ) -> Tuple["np.ndarray", ...]:
+        import numpy as np
+
+        start = [_parse_month(r.get("inicio"), ALWAYS[0]) for r in rules]
+        end = [_parse_month(r.get("fim"), ALWAYS[1]) for r in rules]
+        return (
+            np.array(start, dtype=np.int64),
+            np.array(end, dtype=np.int64),
+        )
+
+
+class PlantMapping(metaclass=Singleton):
+    """
+    Rules for matching the plants of a destination case with those of
+    the source DECOMP, read from the versioned `PLANT_MAPPING_FILE`.
+
+    Each rule applies to some destination programs and, optionally,
+    only to cases starting between the months `inicio` and `fim`
+    (`AAAA-MM`). The rules are:
+
+    - `remapeamento`: the `destino` plant takes the value of the
+      `origem` plant;
+    - `escala`: as above, divided by `divisor` and kept between
+      `minimo` and `maximo`;
+    - `divisao`: the `destinos` plants take the value of the `origem`
+      plant, when the source has only the `origem` plant and the
+      destination only the `destinos`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled: Optional[Dict[Program, CompiledRules]] = None
+        self.version: Optional[Any] = None
+
+    @staticmethod
+    def path() -> pathlib.Path:
+        return pathlib.Path(Settings.installdir).joinpath(
+            Settings.plant_mapping_file
+        )
+
+    def load(self, path: Optional[str] = None):
+        """
+        Reads and compiles the mapping rules.
+
+        :param path: The rules file, if not the configured one
+        """
+        file = pathlib.Path(path) if path is not None else self.path()
+        with open(file, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        rules = content["regras"]
+        for r in rules:
+            if r.get("tipo") not in RULE_TYPES:
+                raise ValueError(f"Regra de mapeamento inválida: {r}")
+        compiled = {
+            p: CompiledRules(
+                [r for r in rules if p.value in r.get("programas", [])]
+            )
+            for p in Program
+        }
+        with self._lock:
+            self._compiled = compiled
+            self.version = content.get("versao")
+        Log.log().info(
+            "Regras de mapeamento de usinas carregadas (versão "
+            + f"{self.version}, {len(rules)} regras)"
+        )
+
+    def rules(self, program: Program) -> CompiledRules:
+        with self._lock:
+            compiled = self._compiled
+        if compiled is None:
+            self.load()
+            return self.rules(program)
+        return compiled[program]
+
+    def resolve(
+        self,
+        program: Program,
+        destination: "np.ndarray",
+        source: "np.ndarray",
+        values: "np.ndarray",
+        month: Optional[int] = None,
+    ) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        Finds the value of each destination plant from the values of
+        the source plants.
+
+        :param program: The program of the destination case
+        :param destination: The destination plant codes
+        :param source: The source plant codes
+        :param values: The values of the source plants
+        :param month: The start month of the destination case, as
+            in `month_ordinal`, or None for applying all the rules
+        :return: The destination plants that have a value, the source
+            plant of each one and the values
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        import numpy as np
+
+        rules = self.rules(program)
+        destination = np.asarray(destination, dtype=np.int64)
+        source = np.asarray(source, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        n = len(destination)
+        origin = destination.copy()
+        divisor = np.ones(n)
+        minimum = np.full(n, -np.inf)
+        maximum = np.full(n, np.inf)
+
+        # Code remaps and scale transforms
+        active = np.ones(len(rules.destination), dtype=bool)
+        if month is not None:
+            active = (rules.start <= month) & (month <= rules.end)
+        codes = rules.destination[active]
+        if len(codes) > 0:
+            pos = np.searchsorted(codes, destination)
+            pos = np.minimum(pos, len(codes) - 1)
+            hit = codes[pos] == destination
+            idx = np.flatnonzero(active)[pos[hit]]
+            origin[hit] = rules.source[idx]
+            divisor[hit] = rules.divisor[idx]
+            minimum[hit] = rules.minimum[idx]
+            maximum[hit] = rules.maximum[idx]
+
+        # One-to-many splits
+        for i, split in enumerate(rules.splits):
+            if month is not None and not (
+                rules.split_start[i] <= month <= rules.split_end[i]
+            ):
+                continue
+            parts = np.array(split["destinos"], dtype=np.int64)
+            whole = split["origem"]
+            if all(
+                [
+                    whole in source,
+                    whole not in destination,
+                    not np.isin(parts, source).any(),
+                    np.isin(parts, destination).all(),
+                ]
+            ):
+                Log.log().info(
+                    f"Usina {whole} dividida nas usinas {split['destinos']}"
+                )
+                origin[np.isin(destination, parts)] = whole
+
+        # Values of the source plants
+        order = np.argsort(source, kind="stable")
+        sorted_source = source[order]
+        pos = np.searchsorted(sorted_source, origin)
+        pos = np.minimum(pos, max(len(sorted_source) - 1, 0))
+        found = (
+            sorted_source[pos] == origin
+            if len(sorted_source) > 0
+            else np.zeros(n, dtype=bool)
+        )
+        result = values[order[pos[found]]] / divisor[found]
+        result = np.clip(result, minimum[found], maximum[found])
+        return destination[found], origin[found], result
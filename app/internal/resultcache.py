@@ -0,0 +1,150 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.internal.catalog import CaseCatalog
+from app.internal.httpresponse import HTTPResponse
+from app.internal.settings import Settings
+from app.models.chainingresult import ChainingResult
+from app.utils.singleton import Singleton
+
+# Files read by the rules that are recorded in the catalog under the
+# kind of the file they are read from
+CATALOG_KINDS = {"dt": "dadger"}
+
+
+class ResultCache(metaclass=Singleton):
+    """
+    Process-wide LRU cache of chaining results, for answering repeated
+    requests without reading or writing the cases again. The results
+    are keyed by a fingerprint of the request, made from the variable,
+    the case directories and the content hashes in the case catalog of
+    the files read by the rule, including the current destination
+    files. Results of requests with an `Idempotency-Key` are also kept
+    by the key, with a digest of the request that sent it.
+    """
+
+    def __init__(self):
+        self._results: "OrderedDict[str, List[ChainingResult]]" = (
+            OrderedDict()
+        )
+        self._keys: "OrderedDict[str, Tuple[str, List[ChainingResult]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def capacity(self) -> int:
+        return Settings.result_cache_size
+
+    @staticmethod
+    def fingerprint(
+        variable: str,
+        sources: List[str],
+        destination: str,
+        reads: Tuple[List[str], List[str]],
+    ) -> Optional[str]:
+        """
+        Builds the fingerprint of a chaining request from the hashes
+        of the files of the last source and of the destination that
+        are read by the rule. Only the file metadata is checked, so
+        no file is read.
+
+        :param variable: The chained variable
+        :param sources: The source case directories
+        :param destination: The destination case directory
+        :param reads: The names of the files read from the last
+            source and from the destination, as in `READS`
+        :return: The fingerprint, or None if some file was not
+            recorded or changed since it was recorded
+        :rtype: Optional[str]
+        """
+        if len(sources) == 0:
+            return None
+        catalog = CaseCatalog()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{variable};".encode("utf-8"))
+        for path in sources:
+            h.update(f"{catalog.normalize(path)};".encode("utf-8"))
+        h.update(f"{catalog.normalize(destination)};".encode("utf-8"))
+        source_names, destination_names = reads
+        for path, names in [
+            (sources[-1], source_names),
+            (destination, destination_names),
+        ]:
+            for name in names:
+                digest = catalog.fingerprint(
+                    path, CATALOG_KINDS.get(name, name)
+                )
+                if digest is None:
+                    return None
+                h.update(f"{name}:{digest};".encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def request_digest(body: str) -> str:
+        return hashlib.blake2b(
+            body.encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def get(self, fingerprint: str) -> Optional[List[ChainingResult]]:
+        with self._lock:
+            result = self._results.get(fingerprint)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(fingerprint)
+            self.hits += 1
+            return result
+
+    def put(self, fingerprint: str, result: List[ChainingResult]):
+        self.__store(self._results, fingerprint, result)
+
+    def replay(
+        self, key: str, digest: str
+    ) -> Union[List[ChainingResult], HTTPResponse, None]:
+        """
+        Returns the result of the request that was sent with an
+        `Idempotency-Key`, if it is known.
+
+        :param key: The idempotency key
+        :param digest: The digest of the current request
+        :return: The stored result, an error if the key was used by
+            a different request, or None
+        """
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None:
+                return None
+            self._keys.move_to_end(key)
+            if entry[0] == digest:
+                self.hits += 1
+                return entry[1]
+        return HTTPResponse(
+            code=422, detail="Idempotency-Key reused with a different request"
+        )
+
+    def remember(self, key: str, digest: str, result: List[ChainingResult]):
+        self.__store(self._keys, key, (digest, result))
+
+    def __store(self, entries: OrderedDict, key: str, value):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.capacity:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._keys.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = len(self._results) + len(self._keys)
+        return {"size": size, "hits": self.hits, "misses": self.misses}
@@ -12,6 +12,46 @@ class Settings:
     decomp_source = os.getenv("DECOMP_SOURCE", "FS")
     encoding_script = "app/static/converte_utf8.sh"
     uri_pattern = os.getenv("URI_PATTERN", "BASE62")
+    parse_cache_size = int(os.getenv("PARSE_CACHE_SIZE", "64"))
+    result_cache_size = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+    warmup_workers = int(os.getenv("WARMUP_WORKERS", "1"))
+    watch_mode = os.getenv("WATCH_MODE", "OFF")
+    watch_roots = os.getenv("WATCH_ROOTS", "")
+    watch_interval = float(os.getenv("WATCH_INTERVAL", "5"))
+    watch_preparse = os.getenv("WATCH_PREPARSE", "0") == "1"
+    subprocess_concurrency = int(os.getenv("SUBPROCESS_CONCURRENCY", "8"))
+    object_store_url = os.getenv("OBJECT_STORE_URL", "http://localhost:9000")
+    object_store_bucket = os.getenv("OBJECT_STORE_BUCKET", "casos")
+    object_store_token = os.getenv("OBJECT_STORE_TOKEN", "")
+    object_store_connections = int(os.getenv("OBJECT_STORE_CONNECTIONS", "16"))
+    object_store_chunk_size = int(
+        os.getenv("OBJECT_STORE_CHUNK_SIZE", str(8 * 1024 * 1024))
+    )
+    object_cache_dir = os.getenv("OBJECT_CACHE_DIR", "/tmp/encadeador")
+    trace_exporter = os.getenv("TRACE_EXPORTER", "OFF")
+    trace_file = os.getenv("TRACE_FILE", "traces.jsonl")
+    trace_endpoint = os.getenv(
+        "TRACE_ENDPOINT", "http://localhost:4318/v1/traces"
+    )
+    catalog_path = os.getenv("CATALOG_PATH", ":memory:")
+    chain_concurrency = int(os.getenv("CHAIN_CONCURRENCY", "4"))
+    fanout_concurrency = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+    chain_queue_size = int(os.getenv("CHAIN_QUEUE_SIZE", "16"))
+    chain_queue_timeout = float(os.getenv("CHAIN_QUEUE_TIMEOUT", "30"))
+    chain_rss_watermark = int(os.getenv("CHAIN_RSS_WATERMARK", "0"))
+    chain_retry_after = int(os.getenv("CHAIN_RETRY_AFTER", "5"))
+    low_memory = os.getenv("LOW_MEMORY", "0") == "1"
+    plant_mapping_file = os.getenv(
+        "PLANT_MAPPING_FILE", "app/static/mapeamento_usinas.json"
+    )
+    index_roots = os.getenv("INDEX_ROOTS", "")
+    extract_workers = int(os.getenv("EXTRACT_WORKERS", "4"))
+    history_dir = os.getenv("HISTORY_DIR", "")
+    history_flush_interval = float(os.getenv("HISTORY_FLUSH_INTERVAL", "5"))
+    history_batch_size = int(os.getenv("HISTORY_BATCH_SIZE", "10000"))
+    federation_file = os.getenv("FEDERATION_FILE", "")
+    federation_timeout = float(os.getenv("FEDERATION_TIMEOUT", "300"))
+    federation_connections = int(os.getenv("FEDERATION_CONNECTIONS", "16"))
 
     @classmethod
     def read_environments(cls):
@@ -25,3 +65,57 @@ class Settings:
         cls.decomp_source = os.getenv("DECOMP_SOURCE", "FS")
         cls.encoding_script = "app/static/converte_utf8.sh"
         cls.uri_pattern = os.getenv("URI_PATTERN", "BASE62")
+        cls.parse_cache_size = int(os.getenv("PARSE_CACHE_SIZE", "64"))
+        cls.result_cache_size = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+        cls.warmup_workers = int(os.getenv("WARMUP_WORKERS", "1"))
+        cls.watch_mode = os.getenv("WATCH_MODE", "OFF")
+        cls.watch_roots = os.getenv("WATCH_ROOTS", "")
+        cls.watch_interval = float(os.getenv("WATCH_INTERVAL", "5"))
+        cls.watch_preparse = os.getenv("WATCH_PREPARSE", "0") == "1"
+        cls.subprocess_concurrency = int(
+            os.getenv("SUBPROCESS_CONCURRENCY", "8")
+        )
+        cls.object_store_url = os.getenv(
+            "OBJECT_STORE_URL", "http://localhost:9000"
+        )
+        cls.object_store_bucket = os.getenv("OBJECT_STORE_BUCKET", "casos")
+        cls.object_store_token = os.getenv("OBJECT_STORE_TOKEN", "")
+        cls.object_store_connections = int(
+            os.getenv("OBJECT_STORE_CONNECTIONS", "16")
+        )
+        cls.object_store_chunk_size = int(
+            os.getenv("OBJECT_STORE_CHUNK_SIZE", str(8 * 1024 * 1024))
+        )
+        cls.object_cache_dir = os.getenv("OBJECT_CACHE_DIR", "/tmp/encadeador")
+        cls.trace_exporter = os.getenv("TRACE_EXPORTER", "OFF")
+        cls.trace_file = os.getenv("TRACE_FILE", "traces.jsonl")
+        cls.trace_endpoint = os.getenv(
+            "TRACE_ENDPOINT", "http://localhost:4318/v1/traces"
+        )
+        cls.catalog_path = os.getenv("CATALOG_PATH", ":memory:")
+        cls.chain_concurrency = int(os.getenv("CHAIN_CONCURRENCY", "4"))
+        cls.fanout_concurrency = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+        cls.chain_queue_size = int(os.getenv("CHAIN_QUEUE_SIZE", "16"))
+        cls.chain_queue_timeout = float(
+            os.getenv("CHAIN_QUEUE_TIMEOUT", "30")
+        )
+        cls.chain_rss_watermark = int(os.getenv("CHAIN_RSS_WATERMARK", "0"))
+        cls.chain_retry_after = int(os.getenv("CHAIN_RETRY_AFTER", "5"))
+        cls.low_memory = os.getenv("LOW_MEMORY", "0") == "1"
+        cls.plant_mapping_file = os.getenv(
+            "PLANT_MAPPING_FILE", "app/static/mapeamento_usinas.json"
+        )
+        cls.index_roots = os.getenv("INDEX_ROOTS", "")
+        cls.extract_workers = int(os.getenv("EXTRACT_WORKERS", "4"))
+        cls.history_dir = os.getenv("HISTORY_DIR", "")
+        cls.history_flush_interval = float(
+            os.getenv("HISTORY_FLUSH_INTERVAL", "5")
+        )
+        cls.history_batch_size = int(os.getenv("HISTORY_BATCH_SIZE", "10000"))
+        cls.federation_file = os.getenv("FEDERATION_FILE", "")
+        cls.federation_timeout = float(
+            os.getenv("FEDERATION_TIMEOUT", "300")
+        )
+        cls.federation_connections = int(
+            os.getenv("FEDERATION_CONNECTIONS", "16")
+        )
@@ -0,0 +1,78 @@
+import os
+import threading
+from typing import Dict, Optional
+from uuid import uuid4
+
+from app.internal.fs import clone_file
+from app.internal.parsecache import ParseCache
+from app.utils.log import Log
+
+
+class FileSnapshot:
+    """
+    Copies of the files of a case, taken just before each one is
+    written for the first time, so that a failed chaining can put
+    the case back as it was. The copies are reflinks where the
+    filesystem supports them, and are kept beside the files, so that
+    they are restored by an atomic rename.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # File path and its copy, or None if the file did not exist
+        self._copies: Dict[str, Optional[str]] = {}
+        self.reflinks = 0
+
+    @property
+    def files(self):
+        return list(self._copies.keys())
+
+    def protect(self, path: str):
+        """
+        Copies a file that is about to be written, if it was not
+        copied since the last commit.
+
+        :param path: The path to the file
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._copies:
+                return
+            copy = None
+            if os.path.isfile(path):
+                directory, name = os.path.split(path)
+                copy = os.path.join(
+                    directory, f".{name}.{uuid4().hex[:8]}.snapshot"
+                )
+                if clone_file(path, copy):
+                    self.reflinks += 1
+            self._copies[path] = copy
+
+    def commit(self):
+        """
+        Keeps the written files, dropping the copies.
+        """
+        with self._lock:
+            copies, self._copies = self._copies, {}
+        for copy in copies.values():
+            if copy is not None and os.path.isfile(copy):
+                os.remove(copy)
+
+    def restore(self):
+        """
+        Puts back the copied files, removing the ones that did not
+        exist before being written.
+        """
+        with self._lock:
+            copies, self._copies = self._copies, {}
+        for path, copy in copies.items():
+            try:
+                if copy is not None:
+                    os.replace(copy, path)
+                elif os.path.isfile(path):
+                    os.remove(path)
+            except OSError as e:
+                Log.log().error(f"Erro na restauração de {path}: {e}")
+                continue
+            ParseCache().invalidate(path)
+            Log.log().info(f"Arquivo {path} restaurado")
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+from app.models.chainingvariable import ChainingVariable
+
+
+class CacheWarmRequest(BaseModel):
+    """
+    Class for defining a request for pre-parsing the files of cases
+    that will be used as sources for chaining some variables.
+    """
+
+    ids: List[str]
+    variables: List[ChainingVariable]
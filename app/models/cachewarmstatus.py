@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class CacheWarmStatus(BaseModel):
+    """
+    Class for defining the progress of a cache warm-up job.
+    """
+
+    id: str
+    total: int
+    done: int
+    failed: int
+    finished: bool
@@ -7,8 +7,9 @@ from app.models.chainingvariable import ChainingVariable
 class ChainingRequest(BaseModel):
     """
     Class for defining a chaining request that relates two cases.
+    When no sources are given, they are found in the case index.
     """
 
-    sources: List[ChainingCase]
+    sources: List[ChainingCase] = []
     destination: ChainingCase
     variable: ChainingVariable
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List
+from app.models.chainingcase import ChainingCase
+from app.models.chainingvariable import ChainingVariable
+
+
+class CloneRequest(BaseModel):
+    """
+    Class for defining a chaining request into a new case, copied
+    from an existing one. When no sources are given, they are found
+    in the case index for the copied case.
+    """
+
+    sources: List[ChainingCase] = []
+    case: ChainingCase
+    destination: str
+    variable: ChainingVariable
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List
+
+from app.models.chainingresult import ChainingResult
+
+
+class CloneResponse(BaseModel):
+    """
+    Class for defining the response of chaining into a new case, with
+    the number of files linked to and copied from the original case.
+    """
+
+    id: str
+    linked: int
+    copied: int
+    result: List[ChainingResult]
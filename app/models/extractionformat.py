@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class ExtractionFormat(Enum):
+    ARROW = "ARROW"
+    PARQUET = "PARQUET"
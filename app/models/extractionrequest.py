@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+from app.models.chainingvariable import ChainingVariable
+from app.models.extractionformat import ExtractionFormat
+
+
+class ExtractionRequest(BaseModel):
+    """
+    Class for defining a request for the values that are chained
+    from many DECOMP cases, returned as one table.
+    """
+
+    ids: List[str]
+    variables: List[ChainingVariable]
+    format: ExtractionFormat = ExtractionFormat.ARROW
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+from app.models.chainingcase import ChainingCase
+from app.models.chainingvariable import ChainingVariable
+
+
+class FanOutRequest(BaseModel):
+    """
+    Class for defining a chaining request from the same sources into
+    many destination cases of the same program.
+    """
+
+    sources: List[ChainingCase]
+    destinations: List[ChainingCase]
+    variable: ChainingVariable
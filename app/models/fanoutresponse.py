@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+
+from app.models.fanoutresult import FanOutResult
+
+
+class FanOutResponse(BaseModel):
+    """
+    Class for defining a fan-out chaining response, with the outcome
+    of each destination in the order of the request.
+    """
+
+    results: List[FanOutResult]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+from app.models.chainingresult import ChainingResult
+
+
+class FanOutResult(BaseModel):
+    """
+    Class for defining the outcome of chaining into one of the
+    destinations of a fan-out request.
+    """
+
+    id: str
+    code: int
+    result: List[ChainingResult] = []
+    detail: Optional[str] = None
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.internal.httpresponse import HTTPResponse
+from app.models.cachewarmrequest import CacheWarmRequest
+from app.models.cachewarmstatus import CacheWarmStatus
+
+from app.adapters.uriparserrepository import AbstractURIParsingRepository
+from app.services.warmup import WarmupService
+
+from app.internal.dependencies import uriParser
+
+router = APIRouter(
+    prefix="/cache",
+    tags=["cache"],
+)
+
+
+@router.post(
+    "/warm",
+    response_model=CacheWarmStatus,
+    status_code=202,
+)
+async def warm(
+    req: CacheWarmRequest,
+    uriParser: AbstractURIParsingRepository = Depends(uriParser),
+):
+    paths = [uriParser.parse(i) for i in req.ids]
+    for p in paths:
+        if isinstance(p, HTTPResponse):
+            raise HTTPException(status_code=p.code, detail=p.detail)
+    job = WarmupService().submit(
+        [p for p in paths if isinstance(p, str)], req.variables
+    )
+    return job.status()
+
+
+@router.get(
+    "/warm/{job_id}",
+    response_model=CacheWarmStatus,
+)
+async def warm_status(job_id: str):
+    job = WarmupService().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job {job_id} not found")
+    return job.status()
@@ -1,43 +1,447 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from app.internal.httpresponse import HTTPResponse
 from app.models.chainingrequest import ChainingRequest
 from app.models.chainingresponse import ChainingResponse
+from app.models.chainingcase import ChainingCase
+from app.models.chainingresult import ChainingResult
+from app.models.clonerequest import CloneRequest
+from app.models.cloneresponse import CloneResponse
+from app.models.fanoutrequest import FanOutRequest
+from app.models.fanoutresponse import FanOutResponse
+from app.models.fanoutresult import FanOutResult
+from app.models.program import Program
 
 from app.adapters.uriparserrepository import AbstractURIParsingRepository
-from app.services.unitofwork import factory as uow_factory
+from app.services.caseindex import CaseIndex
+from app.services.clone import clone_and_chain
+from app.services.history import ChainHistory
+from app.services.unitofwork import (
+    AbstractUnitOfWork,
+    factory as uow_factory,
+)
 
-from app.internal.dependencies import uriParser
-from app.adapters.chainingrepository import factory as chain_factory
+from app.internal.catalog import CaseCatalog
+from app.internal.federation import (
+    FORWARDED_HEADERS,
+    SERVED_BY_HEADER,
+    Federation,
+)
+from app.internal.resultcache import ResultCache
+from app.internal.dependencies import admission, uriParser
+from app.internal.settings import Settings
+from app.adapters.chainingrepository import (
+    AbstractChainingRepository,
+    factory as chain_factory,
+)
+from app.utils.tracing import (
+    REQUEST_ID_HEADER,
+    current_request_id,
+    current_span,
+    request_span,
+    span,
+)
 
 router = APIRouter(
     prefix="/chain",
     tags=["chain"],
 )
 
+CACHE_HEADER = "X-Chain-Cache"
+
+
+async def _forward(
+    url: str, req: ChainingRequest, headers: Dict[str, Optional[str]]
+) -> Response:
+    with span("federation.forward", url=url) as s:
+        try:
+            code, body, remote_headers = await Federation().forward(
+                url,
+                router.prefix + "/",
+                req.model_dump_json().encode("utf-8"),
+                {k: v for k, v in headers.items() if v},
+            )
+        except Exception as e:
+            s.set(code=502)
+            raise HTTPException(
+                status_code=502, detail=f"federation error: {e}"
+            )
+        s.set(code=code)
+    relayed = {
+        k: remote_headers[k.lower()]
+        for k in [SERVED_BY_HEADER, CACHE_HEADER] + FORWARDED_HEADERS
+        if k.lower() in remote_headers
+    }
+    return Response(
+        content=body,
+        status_code=code,
+        headers=relayed,
+        media_type=remote_headers.get("content-type", "application/json"),
+    )
+
+
+def _parse_or_raise(uriParser: AbstractURIParsingRepository, id: str) -> str:
+    """
+    Returns the path of a case id, raising the parsing error as an
+    HTTPException.
+    """
+    path = uriParser.parse(id)
+    if isinstance(path, HTTPResponse):
+        current_span().set(code=path.code)
+        raise HTTPException(status_code=path.code, detail=path.detail)
+    return path
+
+
+async def _resolve_sources(
+    program: Program, path: str, role: str
+) -> List[Tuple[Program, str]]:
+    """
+    Finds the sources of a case in the case index, raising a 404 if
+    there is none.
+    """
+    with span("sources.resolve") as s:
+        sources = await asyncio.to_thread(
+            CaseIndex().resolve_sources, program, path
+        )
+        s.set(count=len(sources))
+    if len(sources) == 0:
+        detail = f"no indexed source for the {role} case"
+        if CaseIndex().building:
+            detail += ", and the case index is still being built"
+        current_span().set(code=404)
+        raise HTTPException(status_code=404, detail=detail)
+    return sources
+
+
+def _replay(
+    idempotency_key: Optional[str], digest: str
+) -> Optional[List[ChainingResult]]:
+    """
+    Returns the result of a previous request with the same
+    `Idempotency-Key`, raising the conflict of a key that was used by
+    a different request.
+    """
+    if not idempotency_key:
+        return None
+    replayed = ResultCache().replay(idempotency_key, digest)
+    if isinstance(replayed, HTTPResponse):
+        current_span().set(code=replayed.code)
+        raise HTTPException(status_code=replayed.code, detail=replayed.detail)
+    return replayed
+
+
+def _remember(
+    idempotency_key: Optional[str],
+    digest: str,
+    result: List[ChainingResult],
+):
+    if idempotency_key:
+        ResultCache().remember(idempotency_key, digest, result)
+
+
+def _fingerprint(
+    chain_repo: AbstractChainingRepository,
+    req: ChainingRequest,
+    sources: List[Tuple[Program, str]],
+    destination: str,
+) -> Optional[str]:
+    reads = chain_repo.READS.get(req.variable)
+    if reads is None:
+        return None
+    with span("result.fingerprint") as s:
+        fingerprint = ResultCache.fingerprint(
+            req.variable.value,
+            [str(p) for _, p in sources],
+            str(destination),
+            reads,
+        )
+        s.set(found=fingerprint is not None)
+    return fingerprint
+
 
 @router.post(
     "/",
     response_model=ChainingResponse,
+    dependencies=[Depends(admission)],
 )
 async def chain(
     req: ChainingRequest,
+    response: Response,
     uriParser: AbstractURIParsingRepository = Depends(uriParser),
+    x_request_id: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    x_federation_hop: Optional[str] = Header(None),
 ):
-    sources_paths = [uriParser.parse(s.id) for s in req.sources]
-    destination_path = uriParser.parse(req.destination.id)
-    for s in sources_paths:
-        if isinstance(s, HTTPResponse):
-            raise HTTPException(status_code=s.code, detail=s.detail)
-    if isinstance(destination_path, HTTPResponse):
+    """
+    Chains a variable from the source cases into the destination case.
+    Repeated requests whose files were not changed since, or that are
+    sent with the same `Idempotency-Key`, are answered from the result
+    cache, as told by the `X-Chain-Cache` header. Destination cases
+    owned by another cluster of the federation are chained by its
+    service, as told by the `X-Served-By` header.
+    """
+    with request_span(
+        "chain",
+        request_id=x_request_id,
+        variable=req.variable.value,
+        destination=req.destination.program.value,
+    ) as root:
+        request_id = x_request_id or current_request_id()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        response.headers[CACHE_HEADER] = "MISS"
+        response.headers[SERVED_BY_HEADER] = str(Settings.clusterId)
+        digest = ResultCache.request_digest(req.model_dump_json())
+        replayed = _replay(idempotency_key, digest)
+        if replayed is not None:
+            response.headers[CACHE_HEADER] = "HIT"
+            root.set(code=200, cached=True)
+            return ChainingResponse(result=replayed)
+        with span("uri.parse", count=len(req.sources) + 1):
+            sources_paths = [
+                _parse_or_raise(uriParser, s.id) for s in req.sources
+            ]
+            destination_path = _parse_or_raise(uriParser, req.destination.id)
+        # Forwarded requests are always served by the receiver
+        if not x_federation_hop:
+            with span("federation.route") as s:
+                url = Federation().remote(destination_path)
+                s.set(remote=url is not None)
+            if url is not None:
+                forwarded = await _forward(
+                    url,
+                    req,
+                    {
+                        REQUEST_ID_HEADER: request_id,
+                        "Idempotency-Key": idempotency_key,
+                    },
+                )
+                root.set(code=forwarded.status_code, forwarded=True)
+                return forwarded
+        sources = [(c.program, p) for c, p in zip(req.sources, sources_paths)]
+        if len(sources) == 0:
+            sources = await _resolve_sources(
+                req.destination.program, destination_path, "destination"
+            )
+        chain_repo = chain_factory(req.destination.program)
+        fingerprint = _fingerprint(chain_repo, req, sources, destination_path)
+        cached = (
+            ResultCache().get(fingerprint) if fingerprint is not None else None
+        )
+        if cached is not None:
+            _remember(idempotency_key, digest, cached)
+            response.headers[CACHE_HEADER] = "HIT"
+            root.set(code=200, cached=True)
+            return ChainingResponse(result=cached)
+        sources_uow = [uow_factory(c, p) for c, p in sources]
+        destination_uow = uow_factory(
+            req.destination.program, destination_path
+        )
+        t0 = time.perf_counter()
+        result = await chain_repo.chain(
+            req.variable, sources_uow, destination_uow
+        )
+        if isinstance(result, HTTPResponse):
+            root.set(code=result.code)
+            raise HTTPException(status_code=result.code, detail=result.detail)
+        ChainHistory().record(
+            req.variable.value,
+            str(destination_path),
+            req.destination.program.value,
+            [str(p) for _, p in sources],
+            result,
+            time.perf_counter() - t0,
+            request_id,
+        )
+        CaseCatalog().mark_chained(destination_path, req.variable.value)
+        # The destination files were rewritten, so the result is kept
+        # by the fingerprint of the files as they are now
+        fingerprint = _fingerprint(chain_repo, req, sources, destination_path)
+        if fingerprint is not None:
+            ResultCache().put(fingerprint, result)
+        _remember(idempotency_key, digest, result)
+        root.set(code=200)
+        return ChainingResponse(result=result)
+
+
+async def _chain_destination(
+    chain_repo: AbstractChainingRepository,
+    req: FanOutRequest,
+    sources: List[Tuple[Program, str]],
+    sources_uow: List[AbstractUnitOfWork],
+    destination: ChainingCase,
+    uriParser: AbstractURIParsingRepository,
+    request_id: Optional[str],
+) -> FanOutResult:
+    with span("fanout.destination", case=destination.id) as s:
+        path = uriParser.parse(destination.id)
+        if isinstance(path, HTTPResponse):
+            s.set(code=path.code)
+            return FanOutResult(
+                id=destination.id, code=path.code, detail=path.detail
+            )
+        t0 = time.perf_counter()
+        try:
+            destination_uow = uow_factory(destination.program, path)
+            result = await chain_repo.chain(
+                req.variable, sources_uow, destination_uow
+            )
+        except Exception as e:
+            result = HTTPResponse(code=500, detail=str(e))
+        if isinstance(result, HTTPResponse):
+            s.set(code=result.code)
+            return FanOutResult(
+                id=destination.id, code=result.code, detail=result.detail
+            )
+        ChainHistory().record(
+            req.variable.value,
+            str(path),
+            destination.program.value,
+            [str(p) for _, p in sources],
+            result,
+            time.perf_counter() - t0,
+            request_id,
+        )
+        CaseCatalog().mark_chained(path, req.variable.value)
+        s.set(code=200)
+        return FanOutResult(id=destination.id, code=200, result=result)
+
+
+@router.post(
+    "/fanout",
+    response_model=FanOutResponse,
+    dependencies=[Depends(admission)],
+)
+async def fanout(
+    req: FanOutRequest,
+    response: Response,
+    uriParser: AbstractURIParsingRepository = Depends(uriParser),
+    x_request_id: Optional[str] = Header(None),
+):
+    """
+    Chains the same sources into many destination cases of the same
+    program. The source files are read once and the destinations are
+    chained in parallel, at most `FANOUT_CONCURRENCY` at a time, with
+    the outcome of each one in the response.
+
+    Only the parse of the sources is shared: the plant mapping and
+    the values computed from the sources are redone for each
+    destination, since they depend on its plants and start month.
+    The destinations are always chained locally, without looking up
+    or filling the result cache and without federation forwarding.
+    """
+    programs = {d.program for d in req.destinations}
+    if len(programs) != 1 or len(req.sources) == 0:
         raise HTTPException(
-            status_code=destination_path.code, detail=destination_path.detail
-        )
-    sources_uow = [
-        uow_factory(s.program, p) for s, p in zip(req.sources, sources_paths)
-    ]
-    destination_uow = uow_factory(req.destination.program, destination_path)
-    chain_repo = chain_factory(req.destination.program)
-    result = await chain_repo.chain(req.variable, sources_uow, destination_uow)
-    if isinstance(result, HTTPResponse):
-        raise HTTPException(status_code=result.code, detail=result.detail)
-    return ChainingResponse(result=result)
+            status_code=422,
+            detail="must have sources and destinations of one program",
+        )
+    with request_span(
+        "chain.fanout",
+        request_id=x_request_id,
+        variable=req.variable.value,
+        destinations=len(req.destinations),
+    ) as root:
+        request_id = x_request_id or current_request_id()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        with span("uri.parse", count=len(req.sources)):
+            sources_paths = [
+                _parse_or_raise(uriParser, s.id) for s in req.sources
+            ]
+        sources = [(c.program, p) for c, p in zip(req.sources, sources_paths)]
+        sources_uow = [uow_factory(c, p) for c, p in sources]
+        chain_repo = chain_factory(programs.pop())
+        await chain_repo.pin_sources(req.variable, sources_uow)
+        semaphore = asyncio.Semaphore(max(1, Settings.fanout_concurrency))
+
+        async def __bounded(destination: ChainingCase) -> FanOutResult:
+            async with semaphore:
+                return await _chain_destination(
+                    chain_repo,
+                    req,
+                    sources,
+                    sources_uow,
+                    destination,
+                    uriParser,
+                    request_id,
+                )
+
+        try:
+            results = await asyncio.gather(
+                *[__bounded(d) for d in req.destinations]
+            )
+        finally:
+            chain_repo.unpin_sources()
+        root.set(
+            code=200,
+            failures=len([r for r in results if r.code != 200]),
+        )
+        return FanOutResponse(results=list(results))
+
+
+@router.post(
+    "/clone",
+    response_model=CloneResponse,
+    dependencies=[Depends(admission)],
+)
+async def clone(
+    req: CloneRequest,
+    response: Response,
+    uriParser: AbstractURIParsingRepository = Depends(uriParser),
+    x_request_id: Optional[str] = Header(None),
+):
+    """
+    Copies a case into a new directory and chains a variable into the
+    copy. Only the files rewritten by the chaining are copied, and the
+    others are hard links to the files of the original case. The copy
+    is removed if the chaining fails.
+    """
+    with request_span(
+        "chain.clone",
+        request_id=x_request_id,
+        variable=req.variable.value,
+        destination=req.case.program.value,
+    ) as root:
+        request_id = x_request_id or current_request_id()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        with span("uri.parse", count=len(req.sources) + 2):
+            sources_paths = [
+                _parse_or_raise(uriParser, s.id) for s in req.sources
+            ]
+            case_path = _parse_or_raise(uriParser, req.case.id)
+            clone_path = _parse_or_raise(uriParser, req.destination)
+        if not os.path.isdir(case_path):
+            root.set(code=404)
+            raise HTTPException(
+                status_code=404, detail="case directory not found"
+            )
+        if os.path.exists(clone_path):
+            root.set(code=409)
+            raise HTTPException(
+                status_code=409, detail="destination already exists"
+            )
+        sources = [(c.program, p) for c, p in zip(req.sources, sources_paths)]
+        if len(sources) == 0:
+            sources = await _resolve_sources(
+                req.case.program, case_path, "cloned"
+            )
+        cloned = await clone_and_chain(
+            req.case.program,
+            case_path,
+            clone_path,
+            req.variable,
+            sources,
+            request_id,
+        )
+        if isinstance(cloned, HTTPResponse):
+            root.set(code=cloned.code)
+            raise HTTPException(status_code=cloned.code, detail=cloned.detail)
+        result, files = cloned
+        root.set(code=200, **files)
+        return CloneResponse(id=req.destination, result=result, **files)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Depends, Response
+from app.internal.httpresponse import HTTPResponse
+from app.models.extractionrequest import ExtractionRequest
+
+from app.adapters.uriparserrepository import AbstractURIParsingRepository
+from app.services.extraction import EXTRACTORS, MEDIA_TYPES, ExtractionService
+
+from app.internal.dependencies import admission, uriParser
+
+router = APIRouter(
+    prefix="/extract",
+    tags=["extract"],
+)
+
+ERRORS_HEADER = "X-Extract-Errors"
+
+
+@router.post(
+    "/",
+    response_class=Response,
+    dependencies=[Depends(admission)],
+)
+async def extract(
+    req: ExtractionRequest,
+    uriParser: AbstractURIParsingRepository = Depends(uriParser),
+):
+    """
+    Values that are chained from many DECOMP cases, as one table
+    with the columns `case`, `plant`, `variable`, `value` and `block`
+    (the load block of the GNL dispatches), in the Arrow stream or
+    Parquet formats. The number of values that could
+    not be read is given in the `X-Extract-Errors` header.
+    """
+    unsupported = [v for v in req.variables if v not in EXTRACTORS]
+    if len(unsupported) > 0:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{[v.value for v in unsupported]} not supported",
+        )
+    paths = [uriParser.parse(i) for i in req.ids]
+    for p in paths:
+        if isinstance(p, HTTPResponse):
+            raise HTTPException(status_code=p.code, detail=p.detail)
+    variables = list(dict.fromkeys(req.variables))
+    service = ExtractionService()
+    table, errors = await service.extract(
+        [(i, str(p)) for i, p in zip(req.ids, paths)], variables
+    )
+    content = service.serialize(table, req.format)
+    return Response(
+        content=content,
+        media_type=MEDIA_TYPES[req.format],
+        headers={ERRORS_HEADER: str(errors)},
+    )
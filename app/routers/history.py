@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import APIRouter, Response
+
+from app.models.extractionformat import ExtractionFormat
+from app.services.extraction import MEDIA_TYPES, ExtractionService
+from app.services.history import ChainHistory
+
+router = APIRouter(
+    prefix="/history",
+    tags=["history"],
+)
+
+
+@router.get("/", response_class=Response)
+async def history(
+    variable: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    destination: Optional[str] = None,
+    format: ExtractionFormat = ExtractionFormat.PARQUET,
+):
+    """
+    The chained values of the operations recorded in the history,
+    filtered by variable, months (`AAAA-MM`) and destination case.
+    """
+    table = ChainHistory().query(variable, start, end, destination)
+    return Response(
+        content=ExtractionService.serialize(table, format),
+        media_type=MEDIA_TYPES[format],
+    )
@@ -0,0 +1,42 @@
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.internal.federation import Federation
+from app.internal.parsecache import ParseCache
+from app.internal.resultcache import ResultCache
+from app.services.admission import AdmissionController, current_rss
+from app.services.history import ChainHistory
+from app.utils.executor import SubprocessExecutor
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+PREFIX = "encadeador"
+
+
+def _lines(group: str, values: Dict[str, int]) -> str:
+    return "".join(
+        f"{PREFIX}_{group}_{name} {value}\n" for name, value in values.items()
+    )
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Service metrics in the Prometheus text format.
+    """
+    text = (
+        _lines("admission", AdmissionController().stats())
+        + _lines("subprocess", SubprocessExecutor().stats())
+        + _lines("parse_cache", ParseCache().stats())
+        + _lines("result_cache", ResultCache().stats())
+        + _lines("history", ChainHistory().stats())
+        + _lines("federation", Federation().stats())
+    )
+    rss = current_rss()
+    if rss is not None:
+        text += f"{PREFIX}_process_resident_memory_bytes {rss}\n"
+    return text
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from weakref import WeakKeyDictionary
+
+from app.internal.settings import Settings
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted, with the reason (`queue`,
+    `timeout` or `memory`).
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def current_rss() -> Optional[int]:
+    """
+    Returns the resident memory of the process in bytes, when it can
+    be read from `/proc`.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class AdmissionController(metaclass=Singleton):
+    """
+    Limits the number of chaining requests that run at the same time.
+    Requests beyond `CHAIN_CONCURRENCY` wait in a queue of at most
+    `CHAIN_QUEUE_SIZE` requests for up to `CHAIN_QUEUE_TIMEOUT`
+    seconds, and the others are rejected right away. While the
+    resident memory is above `CHAIN_RSS_WATERMARK` (MB), no request
+    is admitted.
+    """
+
+    def __init__(self):
+        self._semaphores: WeakKeyDictionary = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {
+            "queue": 0,
+            "timeout": 0,
+            "memory": 0,
+        }
+
+    def __semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(
+                    max(1, Settings.chain_concurrency)
+                )
+            return self._semaphores[loop]
+
+    def __reject(self, reason: str) -> AdmissionRejected:
+        with self._lock:
+            self.rejected[reason] += 1
+        Log.log().warning(f"Requisição rejeitada ({reason})")
+        return AdmissionRejected(reason)
+
+    def over_watermark(self) -> bool:
+        if Settings.chain_rss_watermark <= 0:
+            return False
+        rss = current_rss()
+        if rss is None:
+            return False
+        return rss > Settings.chain_rss_watermark * 1024 * 1024
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Holds one of the request slots while the context is open,
+        raising `AdmissionRejected` if the request is shed.
+        """
+        if self.over_watermark():
+            raise self.__reject("memory")
+        semaphore = self.__semaphore()
+        if semaphore.locked() and self.queued >= Settings.chain_queue_size:
+            raise self.__reject("queue")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(
+                semaphore.acquire(), timeout=Settings.chain_queue_timeout
+            )
+        except asyncio.TimeoutError:
+            raise self.__reject("timeout")
+        finally:
+            self.queued -= 1
+        self.running += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rejected = dict(self.rejected)
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            **{f"rejected_{k}": v for k, v in rejected.items()},
+        }
@@ -0,0 +1,309 @@
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.adapters.chainingrepository import factory as chain_factory
+from app.adapters.uriparserrepository import factory as parser_factory
+from app.internal.catalog import CaseCatalog
+from app.internal.httpresponse import HTTPResponse
+from app.internal.settings import Settings
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.caseindex import CaseIndex
+from app.services.unitofwork import factory as uow_factory
+from app.utils.log import Log
+
+RESULT_COLUMNS = [
+    "step",
+    "sources",
+    "destination",
+    "variable",
+    "plant",
+    "value",
+    "code",
+    "detail",
+    "elapsed_s",
+]
+
+
+@dataclass
+class ManifestStep:
+    """
+    One chaining of a manifest, with the case ids or directories as
+    they were given.
+    """
+
+    step: int
+    sources: List[str]
+    destination: str
+    program: Program
+    variable: ChainingVariable
+    source_program: Program = Program.DECOMP
+    # The programs and directories of the sources, once resolved
+    source_cases: List[Tuple[Program, str]] = field(default_factory=list)
+    destination_path: str = ""
+
+    @property
+    def source_paths(self) -> List[str]:
+        return [p for _, p in self.source_cases]
+
+
+def _split_sources(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or "").split(";") if v.strip()]
+
+
+def read_manifest(path: str) -> List[ManifestStep]:
+    """
+    Reads a manifest of chaining steps, as a JSON list of objects or a
+    CSV file with the columns `sources` (separated by `;`, and empty
+    for the sources found in the case index), `destination`,
+    `program` (of the destination), `variable` and, optionally,
+    `source_program` (of the given sources, DECOMP by default).
+
+    :param path: The manifest file
+    :return: The steps, in the order of the manifest
+    :rtype: List[ManifestStep]
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    return [
+        ManifestStep(
+            step=i,
+            sources=_split_sources(r.get("sources")),
+            destination=str(r["destination"]).strip(),
+            program=Program(str(r["program"]).strip().upper()),
+            variable=ChainingVariable(str(r["variable"]).strip().upper()),
+            source_program=Program(
+                str(r.get("source_program") or "DECOMP").strip().upper()
+            ),
+        )
+        for i, r in enumerate(rows)
+    ]
+
+
+def resolve_path(value: str) -> str:
+    """
+    Returns the case directory of a manifest value, which is either
+    a directory or an id in the configured URI pattern.
+    """
+    if os.path.isdir(value):
+        return os.path.abspath(value)
+    path = parser_factory(Settings.uri_pattern).parse(value)
+    if isinstance(path, HTTPResponse):
+        raise ValueError(f"{value}: {path.detail}")
+    return os.path.abspath(path)
+
+
+def schedule(steps: List[ManifestStep]) -> List[List[ManifestStep]]:
+    """
+    Groups the steps in waves that can run in parallel. A step runs
+    after every previous step that writes one of its cases or reads
+    its destination, so the manifest order is kept between dependent
+    steps.
+
+    :param steps: The steps with resolved paths
+    :return: The waves of steps, in execution order
+    :rtype: List[List[ManifestStep]]
+    """
+    levels: List[int] = []
+    for i, s in enumerate(steps):
+        level = 0
+        for j in range(i):
+            p = steps[j]
+            if (
+                p.destination_path in s.source_paths
+                or p.destination_path == s.destination_path
+                or s.destination_path in p.source_paths
+            ):
+                level = max(level, levels[j] + 1)
+        levels.append(level)
+    waves: List[List[ManifestStep]] = [[] for _ in set(levels)]
+    for level, s in zip(levels, steps):
+        waves[level].append(s)
+    return waves
+
+
+def _rows(
+    s: ManifestStep,
+    code: int,
+    detail: Optional[str],
+    elapsed: float,
+    results: Optional[List[Tuple[Optional[str], float]]] = None,
+) -> List[Dict[str, Any]]:
+    base = {
+        "step": s.step,
+        "sources": ";".join(s.source_paths),
+        "destination": s.destination_path,
+        "variable": s.variable.value,
+        "code": code,
+        "detail": detail,
+        "elapsed_s": round(elapsed, 6),
+    }
+    if not results:
+        return [{**base, "plant": None, "value": None}]
+    return [{**base, "plant": p, "value": v} for p, v in results]
+
+
+def run_step(s: ManifestStep) -> List[Dict[str, Any]]:
+    """
+    Chains one step with the same repositories of the service.
+
+    :param s: The step with resolved paths
+    :return: The rows of the results table of the step
+    :rtype: List[Dict[str, Any]]
+    """
+    t0 = time.perf_counter()
+    try:
+        sources_uow = [uow_factory(c, p) for c, p in s.source_cases]
+        destination_uow = uow_factory(s.program, s.destination_path)
+        result = asyncio.run(
+            chain_factory(s.program).chain(
+                s.variable, sources_uow, destination_uow
+            )
+        )
+    except Exception as e:
+        result = HTTPResponse(code=500, detail=str(e))
+    elapsed = time.perf_counter() - t0
+    if isinstance(result, HTTPResponse):
+        Log.log().warning(
+            f"Erro no passo {s.step} ({s.destination_path}): {result.detail}"
+        )
+        return _rows(s, result.code, result.detail, elapsed)
+    CaseCatalog().mark_chained(s.destination_path, s.variable.value)
+    return _rows(
+        s, 200, None, elapsed, [(r.id, r.value) for r in result]
+    )
+
+
+def init_worker():
+    Settings.read_environments()
+    if Log.LOGGER is None:
+        Log.configure_logging(os.curdir)
+
+
+class BulkChaining:
+    """
+    Offline chaining of the steps of a manifest, without the HTTP
+    service. Independent steps are chained in parallel by a pool of
+    processes, one per core by default, and dependent steps wait for
+    the steps they depend on. The sources of the steps without them
+    are looked up in an index of the cases under `roots`, or under
+    `INDEX_ROOTS` if none is given.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        roots: Optional[List[str]] = None,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.roots = roots
+
+    def resolve(self, steps: List[ManifestStep]) -> List[Dict[str, Any]]:
+        """
+        Finds the directories of the cases of the steps, returning the
+        rows of the steps that could not be resolved.
+        """
+        rows: List[Dict[str, Any]] = []
+        if any(len(s.sources) == 0 for s in steps):
+            CaseIndex().build(self.roots or None)
+        for s in steps:
+            try:
+                s.destination_path = resolve_path(s.destination)
+                if len(s.sources) > 0:
+                    s.source_cases = [
+                        (s.source_program, resolve_path(p))
+                        for p in s.sources
+                    ]
+                else:
+                    s.source_cases = [
+                        (c, os.path.abspath(p))
+                        for c, p in CaseIndex().resolve_sources(
+                            s.program, s.destination_path
+                        )
+                    ]
+                    if len(s.source_cases) == 0:
+                        raise ValueError("nenhuma origem indexada")
+            except (ValueError, OSError) as e:
+                rows += _rows(s, 404, str(e), 0.0)
+        return rows
+
+    def run(self, steps: List[ManifestStep]) -> List[Dict[str, Any]]:
+        """
+        Chains the steps, returning the rows of the results table.
+
+        :param steps: The steps of the manifest
+        :return: The results, one row per chained value or failed step
+        :rtype: List[Dict[str, Any]]
+        """
+        rows = self.resolve(steps)
+        unresolved = {r["step"] for r in rows}
+        pending = [s for s in steps if s.step not in unresolved]
+        failed = {s.destination_path for s in steps if s.step in unresolved}
+        executor = None
+        if self.processes > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        try:
+            for wave in schedule(pending):
+                # Steps whose sources were not chained are not run
+                ready = []
+                for s in wave:
+                    if failed.intersection(s.source_paths):
+                        rows += _rows(s, 424, "origem não encadeada", 0.0)
+                        failed.add(s.destination_path)
+                    else:
+                        ready.append(s)
+                if executor is None:
+                    results = [run_step(s) for s in ready]
+                else:
+                    results = list(executor.map(run_step, ready))
+                for s, r in zip(ready, results):
+                    if r[0]["code"] != 200:
+                        failed.add(s.destination_path)
+                    rows += r
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return sorted(rows, key=lambda r: r["step"])
+
+
+def write_results(rows: List[Dict[str, Any]], path: str):
+    """
+    Writes the results table, as Parquet if the file name ends with
+    `.parquet` and as CSV otherwise.
+    """
+    import pandas as pd  # type: ignore
+
+    df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    if path.lower().endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def summary(rows: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    codes = {r["step"]: r["code"] for r in rows}
+    chained = len([c for c in codes.values() if c == 200])
+    return {
+        "passos": len(codes),
+        "encadeados": chained,
+        "falhas": len(codes) - chained,
+        "valores": len([r for r in rows if r["plant"] is not None]),
+        "tempo_s": round(elapsed, 3),
+        "passos_por_s": round(len(codes) / elapsed, 3) if elapsed else 0.0,
+    }
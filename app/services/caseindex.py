@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from app.internal.catalog import CaseCatalog
+from app.internal.parsecache import parse
+from app.internal.settings import Settings
+from app.models.program import Program
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+# The `caso.dat` of a DECOMP case names its revision (rv0, rv1, ...)
+DECOMP_CASE_PATTERN = re.compile(r"^rv(\d+)$", re.IGNORECASE)
+
+Study = Tuple[Program, int, int, int]
+
+
+def _read_first_line(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.readline().strip()
+
+
+def _decomp_study(path: str, case: str) -> Optional[Study]:
+    from idecomp.decomp.arquivos import Arquivos
+
+    match = DECOMP_CASE_PATTERN.match(case)
+    if match is None:
+        return None
+    dadger = parse(Arquivos, os.path.join(path, case)).dadger
+    if not dadger:
+        return None
+    # Only the DT register is needed, so the dadger is not parsed
+    with open(
+        os.path.join(path, dadger), "r", encoding="utf-8", errors="replace"
+    ) as f:
+        for line in f:
+            if line.startswith("DT"):
+                day, month, year = [int(v) for v in line.split()[1:4]]
+                break
+        else:
+            return None
+    # The first week belongs to the month where it ends
+    end = date(year, month, day) + timedelta(days=6)
+    return Program.DECOMP, end.year, end.month, int(match.group(1))
+
+
+def _newave_study(path: str, case: str) -> Optional[Study]:
+    from inewave.newave.arquivos import Arquivos
+    from inewave.newave.dger import Dger
+
+    dger = parse(Arquivos, os.path.join(path, case)).dger
+    if not dger:
+        return None
+    d = parse(Dger, os.path.join(path, dger))
+    if d.ano_inicio_estudo is None or d.mes_inicio_estudo is None:
+        return None
+    return Program.NEWAVE, d.ano_inicio_estudo, d.mes_inicio_estudo, 0
+
+
+def identify(path: str) -> Optional[Study]:
+    """
+    Finds the program, study month and revision of a case directory.
+    Cases whose `caso.dat` names a revision (`rvN`) are DECOMP cases,
+    with the month taken from the DT register of the dadger, and the
+    others are NEWAVE cases, with the month taken from the dger.
+
+    :param path: The case directory
+    :return: The program, year, month and revision, if identified
+    :rtype: Optional[Study]
+    """
+    caso = os.path.join(path, "caso.dat")
+    if not os.path.isfile(caso):
+        return None
+    try:
+        case = _read_first_line(caso)
+        if DECOMP_CASE_PATTERN.match(case):
+            return _decomp_study(path, case)
+        return _newave_study(path, case)
+    except Exception as e:
+        Log.log().warning(f"Caso {path} não identificado: {e}")
+        return None
+
+
+def previous_month(year: int, month: int) -> Tuple[int, int]:
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+class CaseIndex(metaclass=Singleton):
+    """
+    Index of the cases under the `INDEX_ROOTS` directories, by
+    program, study month and revision, kept in the case catalog. It
+    is built in the background when the service starts and completed
+    with the cases that are looked up.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self.indexed = 0
+
+    @staticmethod
+    def configured_roots() -> List[str]:
+        return [
+            os.path.join(Settings.basedir, r.strip())
+            for r in Settings.index_roots.split(",")
+            if r.strip()
+        ]
+
+    def start(self):
+        roots = [r for r in self.configured_roots() if os.path.isdir(r)]
+        if len(roots) == 0 or self.building:
+            return
+        self._thread = threading.Thread(
+            target=self.build, args=(roots,), name="case-index", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def building(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def build(self, roots: Optional[List[str]] = None) -> int:
+        """
+        Walks the root directories, indexing the cases that are not
+        indexed yet or whose `caso.dat` changed.
+
+        :param roots: The directories, if not the configured ones
+        :return: The number of indexed cases
+        :rtype: int
+        """
+        roots = self.configured_roots() if roots is None else roots
+        count = 0
+        for root in roots:
+            for dirpath, _, filenames in os.walk(root):
+                if "caso.dat" not in filenames:
+                    continue
+                if self.study(dirpath) is not None:
+                    count += 1
+        self.indexed = count
+        Log.log().info(f"{count} casos indexados em {roots}")
+        return count
+
+    def study(self, path: str) -> Optional[Study]:
+        """
+        Returns the program, study month and revision of a case,
+        indexing it if needed.
+        """
+        known = CaseCatalog().study(path)
+        if known is not None:
+            program_value, year, month, revision = known
+            return Program(program_value), year, month, revision
+        found = identify(path)
+        if found is not None:
+            program, year, month, revision = found
+            CaseCatalog().record_study(
+                path, program.value, year, month, revision
+            )
+        return found
+
+    def __last_decomp(
+        self, year: int, month: int, before: Optional[int] = None
+    ) -> Optional[str]:
+        for path, revision in CaseCatalog().studies(
+            Program.DECOMP.value, year, month
+        ):
+            if before is not None and revision >= before:
+                continue
+            if CaseCatalog().study(path) is None:
+                # Removed or changed since it was indexed
+                CaseCatalog().forget_study(path)
+                continue
+            return path
+        return None
+
+    def resolve_sources(
+        self, program: Program, path: str
+    ) -> List[Tuple[Program, str]]:
+        """
+        Finds the source cases of a destination case: the previous
+        DECOMP revision of the same month or, for the first revision
+        and for NEWAVE cases, the last DECOMP revision of the previous
+        month. A later revision without a previous one in its month
+        has no source.
+
+        :param program: The program of the destination case
+        :param path: The destination case directory
+        :return: The programs and directories of the sources
+        :rtype: List[Tuple[Program, str]]
+        """
+        study = self.study(path)
+        if study is None or study[0] != program:
+            return []
+        _, year, month, revision = study
+        if program == Program.DECOMP and revision > 0:
+            source = self.__last_decomp(year, month, before=revision)
+        else:
+            source = self.__last_decomp(*previous_month(year, month))
+        return [] if source is None else [(Program.DECOMP, source)]
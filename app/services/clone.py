@@ -0,0 +1,169 @@
+import asyncio
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from app.adapters.chainingrepository import factory as chain_factory
+from app.adapters.decomprepository import DECK_FIELDS as DECOMP_FIELDS
+from app.adapters.newaverepository import DECK_FIELDS as NEWAVE_FIELDS
+from app.internal.catalog import CaseCatalog
+from app.internal.fs import clone_file
+from app.internal.httpresponse import HTTPResponse
+from app.internal.parsecache import parse
+from app.models.chainingresult import ChainingResult
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.history import ChainHistory
+from app.services.unitofwork import factory as uow_factory
+from app.utils.tracing import span
+
+
+def deck_files(program: Program, path: str) -> Dict[str, str]:
+    """
+    Returns the deck file names of a case, by kind, from the catalog
+    or, if they are not known, from its `caso.dat` and `arquivos`.
+
+    :param program: The program of the case
+    :param path: The case directory
+    :return: The deck file names, by kind
+    :rtype: Dict[str, str]
+    """
+    deck = CaseCatalog().deck(path)
+    if deck is not None:
+        return deck
+    if program == Program.DECOMP:
+        from idecomp.decomp.caso import Caso
+        from idecomp.decomp.arquivos import Arquivos
+
+        fields = DECOMP_FIELDS
+    else:
+        from inewave.newave.caso import Caso  # type: ignore
+        from inewave.newave.arquivos import Arquivos  # type: ignore
+
+        fields = NEWAVE_FIELDS
+    caso = parse(Caso, os.path.join(path, "caso.dat"))
+    if not caso.arquivos:
+        raise FileNotFoundError(f"{path}: caso.dat sem o arquivo de nomes")
+    arquivos = parse(Arquivos, os.path.join(path, caso.arquivos))
+    return {f: getattr(arquivos, f) for f in fields if getattr(arquivos, f)}
+
+
+def modified_files(
+    program: Program, path: str, variables: List[ChainingVariable]
+) -> Set[str]:
+    """
+    Returns the names of the files of a case that are rewritten by
+    chaining some variables into it, in lower case.
+    """
+    writes = chain_factory(program).WRITES
+    deck = deck_files(program, path)
+    return {
+        deck[kind].lower()
+        for v in variables
+        for kind in writes.get(v, [])
+        if kind in deck
+    }
+
+
+def clone_case(
+    program: Program,
+    source: str,
+    destination: str,
+    variables: List[ChainingVariable],
+) -> Dict[str, int]:
+    """
+    Creates a copy of a case for chaining some variables into it.
+    Only the files that the chaining rewrites are copied, and every
+    other file is a hard link to the file of the source case, so the
+    copy costs little more than the rewritten files. The copied files
+    are reflinks where the filesystem supports them.
+
+    :param program: The program of the case
+    :param source: The case directory
+    :param destination: The new case directory, which must not exist
+    :param variables: The variables to be chained into the copy
+    :return: The number of linked and copied files
+    :rtype: Dict[str, int]
+    """
+    with span("case.clone", program=program.value, case=source) as s:
+        modified = modified_files(program, source, variables)
+        os.makedirs(destination)
+        linked, copied = 0, 0
+        for dirpath, _, filenames in os.walk(source):
+            relative = os.path.relpath(dirpath, source)
+            target = os.path.normpath(os.path.join(destination, relative))
+            os.makedirs(target, exist_ok=True)
+            for name in filenames:
+                src = os.path.join(dirpath, name)
+                dst = os.path.join(target, name)
+                if relative == os.curdir and name.lower() in modified:
+                    clone_file(src, dst)
+                    copied += 1
+                    continue
+                try:
+                    os.link(src, dst)
+                    linked += 1
+                except OSError:
+                    # i.e. the copy is in another filesystem
+                    clone_file(src, dst)
+                    copied += 1
+        s.set(linked=linked, copied=copied)
+    return {"linked": linked, "copied": copied}
+
+
+async def clone_and_chain(
+    program: Program,
+    source: str,
+    destination: str,
+    variable: ChainingVariable,
+    sources: List[Tuple[Program, str]],
+    request_id: Optional[str] = None,
+) -> Union[Tuple[List[ChainingResult], Dict[str, int]], HTTPResponse]:
+    """
+    Clones a case and chains a variable into the copy, which is
+    removed if the clone or the chaining fails.
+
+    :param program: The program of the case
+    :param source: The case directory
+    :param destination: The new case directory, which must not exist
+    :param variable: The variable to be chained into the copy
+    :param sources: The programs and directories of the chained sources
+    :param request_id: The id of the request, kept in the history
+    :return: The chained values and the number of linked and copied
+        files, or the error
+    """
+    try:
+        files = await asyncio.to_thread(
+            clone_case, program, source, destination, [variable]
+        )
+    except FileExistsError:
+        # Created by a concurrent request, so it is not removed
+        return HTTPResponse(code=409, detail="destination already exists")
+    except Exception as e:
+        shutil.rmtree(destination, ignore_errors=True)
+        code = 404 if isinstance(e, FileNotFoundError) else 500
+        return HTTPResponse(code=code, detail=str(e))
+    sources_uow = [uow_factory(c, p) for c, p in sources]
+    destination_uow = uow_factory(program, destination)
+    t0 = time.perf_counter()
+    try:
+        result = await chain_factory(program).chain(
+            variable, sources_uow, destination_uow
+        )
+    except Exception as e:
+        result = HTTPResponse(code=500, detail=str(e))
+    if isinstance(result, HTTPResponse):
+        shutil.rmtree(destination, ignore_errors=True)
+        return result
+    ChainHistory().record(
+        variable.value,
+        str(destination),
+        program.value,
+        [str(p) for _, p in sources],
+        result,
+        time.perf_counter() - t0,
+        request_id,
+    )
+    CaseCatalog().mark_chained(destination, variable.value)
+    return result, files
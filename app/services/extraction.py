@@ -0,0 +1,254 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from app.adapters.chainingrepository import (
+    TVIAGEM_PLANTS,
+    decomp_storage,
+    gnl_dispatch,
+    study_month,
+)
+from app.adapters.decomprepository import factory as decomp_factory
+from app.internal.httpresponse import HTTPResponse
+from app.internal.settings import Settings
+from app.models.chainingvariable import ChainingVariable
+from app.models.extractionformat import ExtractionFormat
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd  # type: ignore
+    import pyarrow as pa  # type: ignore
+
+MEDIA_TYPES = {
+    ExtractionFormat.ARROW: "application/vnd.apache.arrow.stream",
+    ExtractionFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+def _varm(relato: Any, dadger: Any, hidr: Any) -> Optional["pd.DataFrame"]:
+    import pandas as pd  # type: ignore
+
+    volumes = relato.volume_util_reservatorios
+    if volumes is None:
+        return None
+    # The storages chained into the next revision, which has the same
+    # plants and start month, named as in the hidr like the rule does
+    codigos, vols = decomp_storage(
+        volumes["codigo_usina"].to_numpy(), volumes, study_month(dadger)
+    )
+    nomes = hidr.cadastro["nome_usina"].reindex(codigos)
+    return pd.DataFrame({"nome_usina": nomes.to_numpy(), "valor": vols})
+
+
+def _tviagem(relato: Any) -> Optional["pd.DataFrame"]:
+    df = relato.relatorio_operacao_uhe
+    if df is None:
+        return None
+    filtro = (df["estagio"] == 1) & df["codigo_usina"].isin(TVIAGEM_PLANTS)
+    return df.loc[filtro, ["nome_usina", "vazao_defluente_m3s"]]
+
+
+def _gnl(relgnl: Any) -> Optional["pd.DataFrame"]:
+    import numpy as np
+    import pandas as pd  # type: ignore
+
+    op = relgnl.relatorio_operacao_termica
+    if op is None:
+        return None
+    # The dispatches of the last week of each plant, which are chained
+    # into the last GL register of the next revision, one for each
+    # load block
+    semanas = op.loc[op["data_inicio_semana"].str.strip() != ""].assign(
+        semana=lambda d: pd.to_datetime(
+            d["data_inicio_semana"], format="%d/%m/%Y"
+        )
+    )
+    ultimas = semanas.sort_values("semana", kind="stable").drop_duplicates(
+        "nome_usina", keep="last"
+    )
+    partes = []
+    for nome, data in zip(
+        ultimas["nome_usina"], ultimas["data_inicio_semana"]
+    ):
+        geracoes = gnl_dispatch(op, nome, data)[0]
+        partes.append(
+            pd.DataFrame(
+                {
+                    "nome_usina": nome,
+                    "valor": geracoes,
+                    "patamar": np.arange(1, len(geracoes) + 1),
+                }
+            )
+        )
+    if len(partes) == 0:
+        return pd.DataFrame(columns=["nome_usina", "valor", "patamar"])
+    return pd.concat(partes, ignore_index=True)
+
+
+# The files and the values (plant name, value and, for the dispatches,
+# the load block) extracted from them for each variable, as they are
+# chained from the DECOMP sources into their next revisions
+EXTRACTORS: Dict[
+    ChainingVariable,
+    Tuple[List[str], Callable[..., Optional["pd.DataFrame"]]],
+] = {
+    ChainingVariable.VARM: (["relato", "dt", "hidr"], _varm),
+    ChainingVariable.TVIAGEM: (["relato"], _tviagem),
+    ChainingVariable.GNL: (["relgnl"], _gnl),
+}
+
+
+def _read(repo: Any, name: str) -> Any:
+    getter = getattr(repo, f"get_{name}")
+    if asyncio.iscoroutinefunction(getter):
+        # The pool threads have no event loop of their own
+        obj = asyncio.run(getter())
+    else:
+        obj = getter()
+    if isinstance(obj, HTTPResponse):
+        raise ValueError(obj.detail)
+    return obj
+
+
+def _table(
+    case: str, variable: ChainingVariable, df: "pd.DataFrame"
+) -> "pa.Table":
+    import numpy as np
+    import pyarrow as pa  # type: ignore
+
+    n = len(df)
+    indices = pa.array(np.zeros(n, dtype=np.int32))
+    return pa.table(
+        {
+            "case": pa.DictionaryArray.from_arrays(indices, [case]),
+            "plant": pa.array(
+                df.iloc[:, 0].astype(str).str.strip(), type=pa.string()
+            ),
+            "variable": pa.DictionaryArray.from_arrays(
+                indices, [variable.value]
+            ),
+            "value": pa.array(
+                df.iloc[:, 1].to_numpy(dtype=np.float64), type=pa.float64()
+            ),
+            "block": pa.array(
+                df["patamar"] if "patamar" in df.columns else [None] * n,
+                type=pa.int8(),
+            ),
+        }
+    )
+
+
+def empty_table() -> "pa.Table":
+    import pyarrow as pa  # type: ignore
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.table(
+        {
+            "case": pa.array([], type=dictionary),
+            "plant": pa.array([], type=pa.string()),
+            "variable": pa.array([], type=dictionary),
+            "value": pa.array([], type=pa.float64()),
+            "block": pa.array([], type=pa.int8()),
+        }
+    )
+
+
+class ExtractionService(metaclass=Singleton):
+    """
+    Reads the values that are chained from many DECOMP cases in a pool
+    of `EXTRACT_WORKERS` threads, with the same repository getters of
+    the chaining rules, and returns them as one columnar table with
+    the columns `case`, `plant`, `variable`, `value` and `block`.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, Settings.extract_workers),
+                thread_name_prefix="extract",
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def extract_case(
+        case: str, path: str, variables: List[ChainingVariable]
+    ) -> Tuple[List["pa.Table"], int]:
+        """
+        Extracts the values of some variables from a case.
+
+        :return: The tables of the variables and the number of errors
+        :rtype: Tuple[List[pa.Table], int]
+        """
+        tables: List["pa.Table"] = []
+        errors = 0
+        try:
+            repo = decomp_factory(Settings.decomp_source, path)
+        except Exception as e:
+            Log.log().warning(f"Erro na extração de {path}: {e}")
+            return tables, len(variables)
+        for v in variables:
+            names, extractor = EXTRACTORS[v]
+            try:
+                files = [_read(repo, n) for n in names]
+                df = extractor(*files)
+                if df is None:
+                    raise ValueError(f"tabela de {v.value} não encontrada")
+                tables.append(_table(case, v, df))
+            except Exception as e:
+                Log.log().warning(
+                    f"Erro na extração de {v.value} em {path}: {e}"
+                )
+                errors += 1
+        return tables, errors
+
+    async def extract(
+        self, cases: List[Tuple[str, str]], variables: List[ChainingVariable]
+    ) -> Tuple["pa.Table", int]:
+        """
+        Extracts the values of some variables from many cases.
+
+        :param cases: The ids and directories of the cases
+        :param variables: The variables
+        :return: The table and the number of errors
+        :rtype: Tuple[pa.Table, int]
+        """
+        import pyarrow as pa  # type: ignore
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self.executor, self.extract_case, c, p, variables
+                )
+                for c, p in cases
+            ]
+        )
+        tables = [t for r in results for t in r[0]]
+        errors = sum(r[1] for r in results)
+        if len(tables) == 0:
+            return empty_table(), errors
+        return pa.concat_tables(tables).unify_dictionaries(), errors
+
+    @staticmethod
+    def serialize(table: "pa.Table", format: ExtractionFormat) -> bytes:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+
+        sink = io.BytesIO()
+        if format == ExtractionFormat.PARQUET:
+            pq.write_table(table, sink)
+        else:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        return sink.getvalue()
@@ -0,0 +1,287 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from uuid import uuid4
+
+from app.internal.catalog import CaseCatalog
+from app.internal.settings import Settings
+from app.models.chainingresult import ChainingResult
+from app.services.caseindex import CaseIndex
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pyarrow as pa  # type: ignore
+
+MAX_PENDING = 10000
+PARTITIONS = ["month", "variable"]
+
+
+def _schema() -> "pa.Schema":
+    import pyarrow as pa  # type: ignore
+
+    return pa.schema(
+        [
+            ("timestamp", pa.timestamp("ms", tz="UTC")),
+            ("request_id", pa.string()),
+            ("destination", pa.string()),
+            ("destination_program", pa.string()),
+            ("destination_fingerprint", pa.string()),
+            ("sources", pa.list_(pa.string())),
+            ("source_fingerprints", pa.list_(pa.string())),
+            ("plant", pa.string()),
+            ("value", pa.float64()),
+            ("elapsed_ms", pa.float64()),
+            ("month", pa.string()),
+            ("variable", pa.string()),
+        ]
+    )
+
+
+class ChainHistory(metaclass=Singleton):
+    """
+    Append-only history of the chaining operations, kept as a Parquet
+    dataset in `HISTORY_DIR`, partitioned by the study month of the
+    destination case (or the month of the chaining, when the case is
+    not identified) and by the variable. The
+    operations are queued by the requests and written in batches by a
+    background thread, every `HISTORY_FLUSH_INTERVAL` seconds or
+    `HISTORY_BATCH_SIZE` rows. An empty `HISTORY_DIR` disables it.
+    """
+
+    def __init__(self):
+        # None only wakes the writer up for stopping
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(
+            maxsize=MAX_PENDING
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return len(Settings.history_dir) > 0
+
+    @property
+    def root(self) -> str:
+        return os.path.join(Settings.basedir, Settings.history_dir)
+
+    def __ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self.__run, name="chain-history", daemon=True
+                )
+                self._thread.start()
+
+    def record(
+        self,
+        variable: str,
+        destination: str,
+        destination_program: str,
+        sources: List[str],
+        results: List[ChainingResult],
+        elapsed: float,
+        request_id: Optional[str] = None,
+    ):
+        """
+        Queues a chaining operation to be written, without waiting.
+
+        :param variable: The chained variable
+        :param destination: The destination case directory
+        :param destination_program: The program of the destination
+        :param sources: The source case directories
+        :param results: The chained values
+        :param elapsed: The duration of the chaining, in seconds
+        :param request_id: The id of the request, if any
+        """
+        if not self.enabled:
+            return
+        self.__ensure_writer()
+        # The fingerprints are those of the files as they were chained,
+        # not as they are when the batch is written
+        catalog = CaseCatalog()
+        try:
+            self._queue.put_nowait(
+                {
+                    "timestamp": datetime.now(timezone.utc),
+                    "request_id": request_id,
+                    "variable": variable,
+                    "destination": destination,
+                    "destination_program": destination_program,
+                    "sources": sources,
+                    "destination_fingerprint": catalog.cache_key(destination),
+                    "source_fingerprints": [
+                        catalog.cache_key(s) for s in sources
+                    ],
+                    "plants": [r.id for r in results],
+                    "values": [r.value for r in results],
+                    "elapsed_ms": 1000 * elapsed,
+                }
+            )
+        except queue.Full:
+            self.dropped += 1
+            Log.log().warning("Histórico de encadeamentos cheio")
+
+    @staticmethod
+    def __month(op: Dict[str, Any]) -> str:
+        try:
+            study = CaseIndex().study(op["destination"])
+        except Exception as e:
+            Log.log().warning(f"Caso {op['destination']} sem estudo: {e}")
+            study = None
+        if study is None:
+            return op["timestamp"].strftime("%Y-%m")
+        _, year, month, _ = study
+        return f"{year:04d}-{month:02d}"
+
+    def __rows(self, pending: List[Dict[str, Any]]) -> "pa.Table":
+        import pyarrow as pa  # type: ignore
+
+        columns: Dict[str, List[Any]] = {n: [] for n in _schema().names}
+        # The study months are looked up here, in the writer thread,
+        # and not when the operations are recorded
+        months: Dict[str, str] = {}
+        for op in pending:
+            if op["destination"] not in months:
+                months[op["destination"]] = self.__month(op)
+            n = len(op["plants"])
+            for name in [
+                "timestamp",
+                "request_id",
+                "destination",
+                "destination_program",
+                "destination_fingerprint",
+                "sources",
+                "source_fingerprints",
+                "elapsed_ms",
+                "variable",
+            ]:
+                columns[name] += [op[name]] * n
+            columns["month"] += [months[op["destination"]]] * n
+            columns["plant"] += op["plants"]
+            columns["value"] += op["values"]
+        return pa.table(columns, schema=_schema())
+
+    def flush(self, pending: List[Dict[str, Any]]):
+        import pyarrow.parquet as pq  # type: ignore
+
+        if len(pending) == 0:
+            return
+        try:
+            table = self.__rows(pending)
+            # Each batch only adds new files to the partitions
+            pq.write_to_dataset(
+                table,
+                self.root,
+                partition_cols=PARTITIONS,
+                basename_template=f"part-{uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            self.written += table.num_rows
+        except Exception as e:
+            self.failed += len(pending)
+            Log.log().error(f"Erro na escrita do histórico: {e}")
+
+    def __run(self):
+        pending: List[Dict[str, Any]] = []
+        rows = 0
+        last = time.monotonic()
+        while True:
+            interval = Settings.history_flush_interval
+            timeout = max(0.0, interval - (time.monotonic() - last))
+            try:
+                op = self._queue.get(timeout=timeout)
+                if op is not None:
+                    pending.append(op)
+                    rows += len(op["plants"])
+            except queue.Empty:
+                pass
+            stopping = self._stop.is_set() and self._queue.empty()
+            due = time.monotonic() - last >= interval
+            if stopping or due or rows >= Settings.history_batch_size:
+                self.flush(pending)
+                pending, rows, last = [], 0, time.monotonic()
+            if stopping:
+                return
+
+    def shutdown(self):
+        """
+        Writes the queued operations and stops the writer.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=Settings.history_flush_interval + 5)
+        self._thread = None
+        # The wake up is left behind if the writer stopped before
+        # taking it
+        try:
+            op = self._queue.get_nowait()
+            if op is not None:
+                self._queue.put_nowait(op)
+        except queue.Empty:
+            pass
+
+    def query(
+        self,
+        variable: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        destination: Optional[str] = None,
+    ) -> "pa.Table":
+        """
+        Reads the history, only touching the partitions of the given
+        variable and study months.
+
+        :param variable: The chained variable
+        :param start: The first study month (`AAAA-MM`)
+        :param end: The last study month (`AAAA-MM`)
+        :param destination: The destination case directory
+        :return: The chained values
+        :rtype: pa.Table
+        """
+        import pyarrow as pa  # type: ignore
+        import pyarrow.dataset as ds  # type: ignore
+
+        if not os.path.isdir(self.root):
+            return _schema().empty_table()
+        dataset = ds.dataset(
+            self.root,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([_schema().field(p) for p in PARTITIONS]),
+                flavor="hive",
+            ),
+        )
+        conditions = []
+        if variable is not None:
+            conditions.append(ds.field("variable") == variable)
+        if start is not None:
+            conditions.append(ds.field("month") >= start)
+        if end is not None:
+            conditions.append(ds.field("month") <= end)
+        if destination is not None:
+            conditions.append(ds.field("destination") == destination)
+        expression = None
+        for c in conditions:
+            expression = c if expression is None else expression & c
+        return dataset.to_table(filter=expression)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
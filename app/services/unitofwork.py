@@ -1,11 +1,13 @@
+import asyncio
 from abc import ABC, abstractmethod
-from os import chdir, curdir
 from typing import Dict, Union, Type
-from pathlib import Path
 
 
+from app.internal.httpresponse import HTTPResponse
 from app.models.program import Program
 from app.internal.settings import Settings
+from app.internal.snapshot import FileSnapshot
+from app.utils.tracing import span
 from app.adapters.newaverepository import (
     AbstractNewaveRepository,
     factory as newave_factory,
@@ -17,15 +19,47 @@ from app.adapters.decomprepository import (
 
 
 class AbstractUnitOfWork(ABC):
+    """
+    Access to the files of a case. The files written by the repository
+    are copied before their first write, and are restored by
+    `rollback` unless `commit` is called before.
+    """
+
+    def __init__(self):
+        self._snapshot = FileSnapshot()
+
     def __enter__(self) -> "AbstractUnitOfWork":
         return self
 
-    def __exit__(self, *args):
-        self.rollback()
+    def __exit__(self, exc_type, *args):
+        if exc_type is not None:
+            self.rollback()
+
+    async def __aenter__(self) -> "AbstractUnitOfWork":
+        # Creating a repository may fetch files (i.e. from an object
+        # store), so it is done in a worker thread
+        return await asyncio.to_thread(self.__enter__)
+
+    async def __aexit__(self, exc_type, *args):
+        self.__exit__(exc_type, *args)
+
+    def publish(self) -> HTTPResponse:
+        """
+        Sends the written files where the repository keeps them, if
+        it needs to, before they are kept by `commit`.
+        """
+        try:
+            files = self.files
+        except RuntimeError:
+            return HTTPResponse(code=200, detail="")
+        return files.publish()
+
+    def commit(self):
+        self._snapshot.commit()
 
-    @abstractmethod
     def rollback(self):
-        raise NotImplementedError
+        with span("uow.rollback", files=len(self._snapshot.files)):
+            self._snapshot.restore()
 
     @property
     @abstractmethod
@@ -42,7 +76,7 @@ class AbstractUnitOfWork(ABC):
 
 class NewaveUnitOfWork(AbstractUnitOfWork):
     def __init__(self, directory: str):
-        self._current_path = Path(curdir).resolve()
+        super().__init__()
         self._case_directory = directory
         self._newave = None
 
@@ -51,18 +85,19 @@ class NewaveUnitOfWork(AbstractUnitOfWork):
             self._newave = newave_factory(
                 Settings.newave_source, str(self._case_directory)
             )
+            self._newave.snapshot = self._snapshot
 
     def __enter__(self) -> "NewaveUnitOfWork":
-        chdir(self._case_directory)
-        self.__create_repository()
+        with span(
+            "uow.enter",
+            program=self.program.value,
+            case=str(self._case_directory),
+        ):
+            self.__create_repository()
         uow = super().__enter__()
         assert isinstance(uow, NewaveUnitOfWork)
         return uow
 
-    def __exit__(self, *args):
-        chdir(self._current_path)
-        super().__exit__(*args)
-
     @property
     def program(self) -> Program:
         return Program.NEWAVE
@@ -73,13 +108,10 @@ class NewaveUnitOfWork(AbstractUnitOfWork):
             raise RuntimeError("Newave repository not created")
         return self._newave
 
-    def rollback(self):
-        pass
-
 
 class DecompUnitOfWork(AbstractUnitOfWork):
     def __init__(self, directory: str):
-        self._current_path = Path(curdir).resolve()
+        super().__init__()
         self._case_directory = directory
         self._decomp = None
 
@@ -88,18 +120,19 @@ class DecompUnitOfWork(AbstractUnitOfWork):
             self._decomp = decomp_factory(
                 Settings.decomp_source, str(self._case_directory)
             )
+            self._decomp.snapshot = self._snapshot
 
     def __enter__(self) -> "DecompUnitOfWork":
-        chdir(self._case_directory)
-        self.__create_repository()
+        with span(
+            "uow.enter",
+            program=self.program.value,
+            case=str(self._case_directory),
+        ):
+            self.__create_repository()
         uow = super().__enter__()
         assert isinstance(uow, DecompUnitOfWork)
         return uow
 
-    def __exit__(self, *args):
-        chdir(self._current_path)
-        super().__exit__(*args)
-
     @property
     def program(self) -> Program:
         return Program.DECOMP
@@ -110,9 +143,6 @@ class DecompUnitOfWork(AbstractUnitOfWork):
             raise RuntimeError("Decomp repository not created")
         return self._decomp
 
-    def rollback(self):
-        pass
-
 
 def factory(kind: Program, *args, **kwargs) -> AbstractUnitOfWork:
     mappings: Dict[Program, Type[AbstractUnitOfWork]] = {
@@ -0,0 +1,454 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.adapters.chainingrepository import TVIAGEM_PLANTS
+from app.internal.plantmapping import PlantMapping, month_ordinal
+from app.internal.parsecache import parse, parse_lock
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.bulk import init_worker
+from app.services.caseindex import CaseIndex
+from app.utils.encoding import le_registros
+from app.utils.log import Log
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd  # type: ignore
+
+# Only these registers of the dadger and dadgnl are parsed
+DADGER_REGISTERS = ("DT", "UH", "VI")
+DADGNL_REGISTERS = ("NL", "GL")
+
+MISMATCH_COLUMNS = [
+    "case",
+    "previous",
+    "variable",
+    "plant",
+    "field",
+    "expected",
+    "found",
+]
+
+GERACOES = [f"geracao_{i}" for i in [1, 2, 3]]
+
+
+@dataclass
+class CaseSummary:
+    """
+    The tables of a DECOMP case that are compared with the previous
+    and the next cases of a backtest.
+    """
+
+    path: str
+    month: Optional[int] = None
+    uh: Optional["pd.DataFrame"] = None
+    vi: Optional["pd.DataFrame"] = None
+    gl: Optional["pd.DataFrame"] = None
+    volumes: Optional["pd.DataFrame"] = None
+    qdef: Optional["pd.DataFrame"] = None
+    operacao_termica: Optional["pd.DataFrame"] = None
+    usinas_termicas: Optional["pd.DataFrame"] = None
+    errors: List[str] = field(default_factory=list)
+
+
+def _read_dadger(s: CaseSummary, path: str):
+    import pandas as pd  # type: ignore
+    from idecomp.decomp.dadger import Dadger
+
+    d = parse(Dadger, le_registros(path, DADGER_REGISTERS))
+    dt = d.dt
+    if dt is not None and dt.ano is not None and dt.mes is not None:
+        s.month = month_ordinal(dt.ano, dt.mes)
+    uhs = d.uh()
+    uhs = [] if uhs is None else uhs if isinstance(uhs, list) else [uhs]
+    s.uh = pd.DataFrame(
+        {
+            "codigo_usina": [u.codigo_usina for u in uhs],
+            "volume_inicial": [u.volume_inicial for u in uhs],
+        }
+    )
+    vis = d.vi()
+    vis = [] if vis is None else vis if isinstance(vis, list) else [vis]
+    s.vi = pd.DataFrame(
+        [
+            (v.codigo_usina, i, q)
+            for v in vis
+            for i, q in enumerate(v.vazao or [])
+        ],
+        columns=["codigo_usina", "posicao", "vazao"],
+    )
+
+
+def _read_dadgnl(s: CaseSummary, path: str):
+    import pandas as pd  # type: ignore
+    from idecomp.decomp.dadgnl import Dadgnl
+
+    d = parse(Dadgnl, le_registros(path, DADGNL_REGISTERS))
+    gls = d.gl()
+    gls = [] if gls is None else gls if isinstance(gls, list) else [gls]
+    s.gl = pd.DataFrame(
+        [(r.codigo_usina, r.data_inicio, *r.geracao) for r in gls],
+        columns=["codigo_usina", "data_inicio"] + GERACOES,
+    )
+
+
+def _read_relato(s: CaseSummary, path: str):
+    from idecomp.decomp.modelos.relato import (
+        BlocoRelatorioOperacaoRelato,
+        BlocoVolumeUtilReservatorioRelato,
+    )
+    from idecomp.decomp.relato import Relato
+
+    class RelatoValidacao(Relato):
+        BLOCKS = [
+            BlocoVolumeUtilReservatorioRelato,
+            BlocoRelatorioOperacaoRelato,
+        ]
+
+    # The subclass reads the blocks of the relato, so it takes its lock
+    with parse_lock(Relato):
+        r = RelatoValidacao.read(path)
+    volumes = r.volume_util_reservatorios
+    if volumes is not None:
+        s.volumes = volumes[["codigo_usina", "estagio_1"]]
+    operacao = r.relatorio_operacao_uhe
+    if operacao is not None:
+        filtro = (operacao["estagio"] == 1) & operacao["codigo_usina"].isin(
+            TVIAGEM_PLANTS
+        )
+        s.qdef = operacao.loc[
+            filtro, ["codigo_usina", "vazao_defluente_m3s"]
+        ].drop_duplicates("codigo_usina")
+
+
+def _read_relgnl(s: CaseSummary, path: str):
+    from idecomp.decomp.modelos.relgnl import (
+        BlocoDadosUsinasRelgnl,
+        BlocoRelatorioOperacaoRelgnl,
+    )
+    from idecomp.decomp.relgnl import Relgnl
+
+    class RelgnlValidacao(Relgnl):
+        BLOCKS = [BlocoDadosUsinasRelgnl, BlocoRelatorioOperacaoRelgnl]
+
+    with parse_lock(Relgnl):
+        r = RelgnlValidacao.read(path)
+    if r.usinas_termicas is not None:
+        s.usinas_termicas = r.usinas_termicas[
+            ["codigo_usina", "nome_usina"]
+        ].drop_duplicates("codigo_usina")
+    operacao = r.relatorio_operacao_termica
+    if operacao is not None:
+        s.operacao_termica = operacao[
+            ["nome_usina", "data_inicio_semana"]
+            + [f"geracao_patamar_{i}" for i in [1, 2, 3]]
+        ]
+
+
+def summarize_case(path: str) -> CaseSummary:
+    """
+    Reads the tables of a DECOMP case that are compared in the sweep,
+    parsing only the needed registers and blocks of each file. Files
+    that could not be read are listed in `errors`.
+
+    :param path: The case directory
+    :return: The tables of the case
+    :rtype: CaseSummary
+    """
+    from idecomp.decomp.arquivos import Arquivos
+
+    s = CaseSummary(path=path)
+    try:
+        with open(os.path.join(path, "caso.dat"), "r") as f:
+            caso = f.readline().strip()
+        arquivos = parse(Arquivos, os.path.join(path, caso))
+    except Exception as e:
+        s.errors.append(f"caso: {e}")
+        return s
+    readers: List[Tuple[str, Optional[str], Callable]] = [
+        ("dadger", arquivos.dadger, _read_dadger),
+        ("dadgnl", arquivos.dadgnl, _read_dadgnl),
+        ("relato", f"relato.{caso}", _read_relato),
+        ("relgnl", f"relgnl.{caso}", _read_relgnl),
+    ]
+    for name, filename, reader in readers:
+        if not filename:
+            continue
+        file = os.path.join(path, filename)
+        if not os.path.isfile(file):
+            continue
+        try:
+            reader(s, file)
+        except Exception as e:
+            s.errors.append(f"{name}: {e}")
+    return s
+
+
+def _mismatches(
+    previous: CaseSummary,
+    current: CaseSummary,
+    variable: ChainingVariable,
+    df: "pd.DataFrame",
+    tolerance: float,
+) -> "pd.DataFrame":
+    import pandas as pd  # type: ignore
+
+    if len(df) == 0:
+        return pd.DataFrame(columns=MISMATCH_COLUMNS)
+    expected = df["expected"].to_numpy(dtype=np.float64)
+    found = df["found"].to_numpy(dtype=np.float64)
+    differ = ~np.isclose(found, expected, rtol=0.0, atol=tolerance)
+    out = df.loc[differ, ["plant", "field", "expected", "found"]].copy()
+    out.insert(0, "variable", variable.value)
+    out.insert(0, "previous", previous.path)
+    out.insert(0, "case", current.path)
+    return out[MISMATCH_COLUMNS]
+
+
+def compare_varm(
+    previous: CaseSummary, current: CaseSummary
+) -> Optional["pd.DataFrame"]:
+    """
+    The initial storages of the case, from the UH registers, and the
+    storages at the end of the first stage of the previous case, from
+    the relato, matched by the plant mapping rules.
+    """
+    import pandas as pd  # type: ignore
+
+    if current.uh is None or previous.volumes is None:
+        return None
+    codes, _, values = PlantMapping().resolve(
+        Program.DECOMP,
+        current.uh["codigo_usina"].to_numpy(),
+        previous.volumes["codigo_usina"].to_numpy(),
+        previous.volumes["estagio_1"].to_numpy(),
+        current.month,
+    )
+    expected = pd.DataFrame({"codigo_usina": codes, "expected": values})
+    df = expected.merge(
+        current.uh.rename(columns={"volume_inicial": "found"}),
+        on="codigo_usina",
+    )
+    return df.assign(plant=df["codigo_usina"], field="volume_inicial")
+
+
+def compare_tviagem(
+    previous: CaseSummary, current: CaseSummary
+) -> Optional["pd.DataFrame"]:
+    """
+    The VI flows of the case and those of the previous case shifted by
+    one week, with the outflow in the first stage of the previous case
+    as the first flow.
+    """
+    import pandas as pd  # type: ignore
+
+    if current.vi is None or previous.vi is None or previous.qdef is None:
+        return None
+    vi = previous.vi.loc[previous.vi["codigo_usina"].isin(TVIAGEM_PLANTS)]
+    last = vi.groupby("codigo_usina")["posicao"].transform("max")
+    shifted = vi.loc[vi["posicao"] < last].assign(
+        posicao=lambda d: d["posicao"] + 1
+    )
+    first = pd.DataFrame(
+        {
+            "codigo_usina": previous.qdef["codigo_usina"].to_numpy(),
+            "posicao": 0,
+            "vazao": previous.qdef["vazao_defluente_m3s"].to_numpy(),
+        }
+    )
+    expected = pd.concat([first, shifted], ignore_index=True)
+    df = expected.rename(columns={"vazao": "expected"}).merge(
+        current.vi.rename(columns={"vazao": "found"}),
+        on=["codigo_usina", "posicao"],
+    )
+    return df.assign(
+        plant=df["codigo_usina"],
+        field="vazao_" + (df["posicao"] + 1).astype(str),
+    )
+
+
+def compare_gnl(
+    previous: CaseSummary, current: CaseSummary
+) -> Optional["pd.DataFrame"]:
+    """
+    The GL dispatch of each week of the case and that of the same week
+    in the previous case or, for the last week, in the relgnl of the
+    previous case. Plants that are not in the previous case are not
+    compared.
+    """
+    import pandas as pd  # type: ignore
+
+    if current.gl is None or previous.gl is None:
+        return None
+    gl = current.gl.loc[
+        current.gl["codigo_usina"].isin(previous.gl["codigo_usina"])
+    ]
+    last = gl.groupby("codigo_usina").cumcount(ascending=False) == 0
+    keys = ["codigo_usina", "data_inicio"]
+    found = gl.melt(
+        id_vars=keys, value_vars=GERACOES, var_name="field", value_name="found"
+    )
+    weeks = previous.gl.melt(
+        id_vars=keys,
+        value_vars=GERACOES,
+        var_name="field",
+        value_name="expected",
+    )
+    middle = gl.loc[~last, keys].merge(weeks, on=keys)
+    parts = [middle]
+    if (
+        previous.operacao_termica is not None
+        and previous.usinas_termicas is not None
+    ):
+        final = gl.loc[last, keys].merge(
+            previous.usinas_termicas, on="codigo_usina"
+        )
+        data = final["data_inicio"].astype(str)
+        final = final.assign(
+            data_inicio_semana=data.str[:2]
+            + "/"
+            + data.str[2:4]
+            + "/"
+            + data.str[4:]
+        ).merge(
+            previous.operacao_termica,
+            on=["nome_usina", "data_inicio_semana"],
+        )
+        final = final.rename(
+            columns={
+                f"geracao_patamar_{i}": f"geracao_{i}" for i in [1, 2, 3]
+            }
+        ).melt(
+            id_vars=keys,
+            value_vars=GERACOES,
+            var_name="field",
+            value_name="expected",
+        )
+        parts.append(final)
+    expected = pd.concat(parts, ignore_index=True)
+    df = expected.merge(found, on=keys + ["field"])
+    return df.assign(
+        plant=df["codigo_usina"],
+        field=df["field"] + "_" + df["data_inicio"].astype(str),
+    )
+
+
+COMPARISONS: Dict[
+    ChainingVariable,
+    Callable[[CaseSummary, CaseSummary], Optional["pd.DataFrame"]],
+] = {
+    ChainingVariable.VARM: compare_varm,
+    ChainingVariable.TVIAGEM: compare_tviagem,
+    ChainingVariable.GNL: compare_gnl,
+}
+
+
+def ordered_cases(roots: List[str]) -> List[str]:
+    """
+    The DECOMP cases under some directories, ordered by study month
+    and revision, as indexed by the case index.
+    """
+    found = []
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            if "caso.dat" not in filenames:
+                continue
+            study = CaseIndex().study(dirpath)
+            if study is not None and study[0] == Program.DECOMP:
+                found.append((study[1:], dirpath))
+    return [p for _, p in sorted(found)]
+
+
+class ValidationSweep:
+    """
+    Checks that each case of a backtest was chained from the previous
+    one, comparing the initial storages (UH), the travel time flows
+    (VI) and the GNL dispatch (GL) of each case with the results of
+    the previous case. The cases are read by a pool of processes, one
+    per core by default, and each pair of adjacent cases is compared
+    with vectorized table operations.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        tolerance: float = 0.01,
+        variables: Optional[List[ChainingVariable]] = None,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.tolerance = tolerance
+        self.variables = (
+            list(COMPARISONS) if variables is None else variables
+        )
+
+    def summarize(self, paths: List[str]) -> List[CaseSummary]:
+        if self.processes <= 1 or len(paths) <= 1:
+            return [summarize_case(p) for p in paths]
+        with ProcessPoolExecutor(
+            max_workers=min(self.processes, len(paths)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        ) as executor:
+            return list(executor.map(summarize_case, paths))
+
+    def compare(
+        self, previous: CaseSummary, current: CaseSummary
+    ) -> List["pd.DataFrame"]:
+        tables = []
+        for v in self.variables:
+            df = COMPARISONS[v](previous, current)
+            if df is not None:
+                tables.append(
+                    _mismatches(previous, current, v, df, self.tolerance)
+                )
+        return tables
+
+    def run(self, paths: List[str]) -> Tuple["pd.DataFrame", Dict]:
+        """
+        Validates a chain of cases.
+
+        :param paths: The case directories, in chaining order
+        :return: The mismatches, one row per plant and field, and the
+            summary of the sweep
+        :rtype: Tuple[pd.DataFrame, Dict]
+        """
+        import pandas as pd  # type: ignore
+
+        t0 = time.perf_counter()
+        summaries = self.summarize(paths)
+        tables = [pd.DataFrame(columns=MISMATCH_COLUMNS)]
+        for previous, current in zip(summaries[:-1], summaries[1:]):
+            tables += self.compare(previous, current)
+        errors = [e for s in summaries for e in s.errors]
+        for s in summaries:
+            for e in s.errors:
+                Log.log().warning(f"Erro na leitura de {s.path}: {e}")
+        mismatches = pd.concat(
+            [t for t in tables if len(t) > 0] or tables, ignore_index=True
+        )
+        elapsed = time.perf_counter() - t0
+        stats = {
+            "casos": len(paths),
+            "pares": max(len(paths) - 1, 0),
+            "divergencias": len(mismatches),
+            "erros": len(errors),
+            "tempo_s": round(elapsed, 3),
+            "casos_por_s": round(len(paths) / elapsed, 3) if elapsed else 0.0,
+        }
+        return mismatches, stats
+
+
+def write_mismatches(df: "pd.DataFrame", path: str):
+    """
+    Writes the mismatches, as Parquet if the file name ends with
+    `.parquet` and as CSV otherwise.
+    """
+    if path.lower().endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
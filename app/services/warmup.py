@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from app.adapters.decomprepository import factory as decomp_factory
+from app.internal.httpresponse import HTTPResponse
+from app.internal.settings import Settings
+from app.models.cachewarmstatus import CacheWarmStatus
+from app.models.chainingvariable import ChainingVariable
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+
+# Files that each chaining rule reads from its DECOMP sources
+# and that are kept in the parse cache
+SOURCE_FILES: Dict[ChainingVariable, List[str]] = {
+    ChainingVariable.VARM: ["relato"],
+    ChainingVariable.TVIAGEM: ["relato"],
+    ChainingVariable.GNL: ["relgnl"],
+    ChainingVariable.ENA: [],
+}
+
+WORKER_NICENESS = 10
+MAX_FINISHED_JOBS = 100
+
+
+def _lower_thread_priority():
+    # On Linux the niceness applies to the calling thread only, so the
+    # warm-up workers yield the CPU to the request handling threads.
+    try:
+        os.setpriority(
+            os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICENESS
+        )
+    except (AttributeError, OSError):
+        pass
+
+
+class WarmupJob:
+    def __init__(self, paths: List[str], files: List[str]):
+        self.id = uuid4().hex
+        self.paths = paths
+        self.files = files
+        self.done = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return len(self.paths)
+
+    @property
+    def finished(self) -> bool:
+        return self.done + self.failed == self.total
+
+    def advance(self, success: bool):
+        with self._lock:
+            if success:
+                self.done += 1
+            else:
+                self.failed += 1
+
+    def status(self) -> CacheWarmStatus:
+        with self._lock:
+            return CacheWarmStatus(
+                id=self.id,
+                total=self.total,
+                done=self.done,
+                failed=self.failed,
+                finished=self.finished,
+            )
+
+
+class WarmupService(metaclass=Singleton):
+    """
+    Parses the source files of DECOMP cases ahead of the chaining
+    requests, in low priority background threads.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, WarmupJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, Settings.warmup_workers),
+                thread_name_prefix="warmup",
+                initializer=_lower_thread_priority,
+            )
+        return self._executor
+
+    def submit(
+        self, paths: List[str], variables: List[ChainingVariable]
+    ) -> WarmupJob:
+        files = sorted({f for v in variables for f in SOURCE_FILES[v]})
+        job = WarmupJob(paths, files)
+        with self._lock:
+            self._jobs[job.id] = job
+            self.__forget_finished_jobs()
+        for path in paths:
+            self.executor.submit(self.__warm, job, path)
+        return job
+
+    def get(self, job_id: str) -> Optional[WarmupJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    def __forget_finished_jobs(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        for j in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._jobs.pop(j.id)
+
+    def __warm(self, job: WarmupJob, path: str):
+        success = True
+        try:
+            repo = decomp_factory(Settings.decomp_source, path)
+            for f in job.files:
+                res = getattr(repo, f"get_{f}")()
+                if isinstance(res, HTTPResponse):
+                    Log.log().warning(
+                        f"Erro no pré-processamento de {f} em {path}:"
+                        + f" {res.detail}"
+                    )
+                    success = False
+        except Exception as e:
+            Log.log().warning(f"Erro no pré-processamento de {path}: {e}")
+            success = False
+        job.advance(success)
@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.adapters.decomprepository import factory as decomp_factory
+from app.internal.parsecache import ParseCache
+from app.internal.settings import Settings
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+
+# DECOMP outputs that are parsed as soon as a run finishes
+OUTPUT_PATTERN = re.compile(r"^(relato|relgnl)\.rv\d+$", re.IGNORECASE)
+
+
+class CaseWatcher(metaclass=Singleton):
+    """
+    Watches the case root directories for changes in the DECOMP
+    output files, invalidating (and optionally parsing again) their
+    entries in the parse cache. While it is running, lookups in the
+    parse cache for files under the roots skip the `stat()` calls.
+
+    The `INOTIFY` mode depends on the optional `watchfiles` package,
+    falling back to the `POLL` mode when it is not available.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self.mode = "OFF"
+        self.roots: List[str] = []
+
+    @staticmethod
+    def configured_roots() -> List[str]:
+        return [
+            os.path.join(Settings.basedir, r.strip())
+            for r in Settings.watch_roots.split(",")
+            if r.strip()
+        ]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        mode = Settings.watch_mode.upper()
+        roots = [r for r in self.configured_roots() if os.path.isdir(r)]
+        if mode == "OFF" or len(roots) == 0 or self.running:
+            return
+        if mode == "INOTIFY":
+            try:
+                import watchfiles  # type: ignore # noqa: F401
+            except ImportError:
+                Log.log().warning(
+                    "watchfiles não instalado, monitorando por polling"
+                )
+                mode = "POLL"
+        self.mode = mode
+        self.roots = roots
+        self._stop.clear()
+        target = self.__run_inotify if mode == "INOTIFY" else self.__run_poll
+        self._snapshot = dict(self.__scan())
+        self._thread = threading.Thread(
+            target=target, name="case-watcher", daemon=True
+        )
+        self._thread.start()
+        ParseCache().trust(self.roots)
+        Log.log().info(f"Monitorando casos em {roots} ({mode})")
+
+    def stop(self):
+        ParseCache().trust([])
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=Settings.watch_interval + 1)
+        self._thread = None
+        self.mode = "OFF"
+
+    def on_change(self, path: str):
+        ParseCache().invalidate(path)
+        name = os.path.basename(path)
+        if not OUTPUT_PATTERN.match(name) or not Settings.watch_preparse:
+            return
+        if not os.path.isfile(path):
+            return
+        kind = name.split(".")[0].lower()
+        try:
+            repo = decomp_factory(
+                Settings.decomp_source, os.path.dirname(path)
+            )
+            getattr(repo, f"get_{kind}")()
+        except Exception as e:
+            Log.log().warning(f"Erro no pré-processamento de {path}: {e}")
+
+    def __scan(self) -> Iterable[Tuple[str, Tuple[int, int]]]:
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for f in filenames:
+                    if not OUTPUT_PATTERN.match(f):
+                        continue
+                    path = os.path.abspath(os.path.join(dirpath, f))
+                    try:
+                        yield path, ParseCache.key(path)
+                    except FileNotFoundError:
+                        continue
+
+    def __run_poll(self):
+        while not self._stop.wait(Settings.watch_interval):
+            try:
+                current = dict(self.__scan())
+                changed = [
+                    p
+                    for p in set(current) | set(self._snapshot)
+                    if current.get(p) != self._snapshot.get(p)
+                ]
+                self._snapshot = current
+                # Other cached files (hidr, pmo, ...) are not tracked
+                # by the scan, so their entries are checked directly
+                ParseCache().revalidate(self.roots)
+                for p in changed:
+                    self.on_change(p)
+            except Exception as e:
+                Log.log().warning(f"Erro no monitoramento dos casos: {e}")
+
+    def __run_inotify(self):
+        from watchfiles import watch  # type: ignore
+
+        try:
+            for changes in watch(
+                *self.roots, stop_event=self._stop, yield_on_timeout=False
+            ):
+                for _, path in changes:
+                    self.on_change(os.path.abspath(path))
+        except Exception as e:
+            Log.log().warning(f"Erro no monitoramento dos casos: {e}")
+            ParseCache().trust([])
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Dict, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd  # type: ignore
+
+HEADER_LINES = 2
+# Columns of the fields in the confhd.dat lines (as in inewave)
+CODE_FIELD = (1, 5)
+VOLUME_FIELD = (35, 41)
+VOLUME_DECIMALS = 2
+
+
+def _read_text(path: str) -> Tuple[str, str]:
+    with open(path, "rb") as f:
+        content = f.read()
+    for encoding in ["utf-8", "ISO-8859-1"]:
+        try:
+            return content.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Codificação desconhecida: {path}")
+
+
+def _format_volume(value: float) -> str:
+    size = VOLUME_FIELD[1] - VOLUME_FIELD[0]
+    text = f"{value:{size}.{VOLUME_DECIMALS}f}"
+    if len(text) > size:
+        raise ValueError(f"Volume inicial fora do campo: {value}")
+    return text
+
+
+def patch_confhd(path: str, usinas: "pd.DataFrame") -> int:
+    """
+    Updates the initial storage (`volume_inicial_percentual`) of the
+    plants in a `confhd.dat` file, rewriting only that field in the
+    lines that changed and keeping the rest of the file as it is.
+    The file is replaced atomically.
+
+    :param path: The path to the confhd.dat file
+    :param usinas: The plants table, as in `Confhd.usinas`
+    :return: The number of changed lines
+    :rtype: int
+    """
+    volumes: Dict[int, str] = {
+        int(c): _format_volume(float(v))
+        for c, v in zip(
+            usinas["codigo_usina"], usinas["volume_inicial_percentual"]
+        )
+    }
+    text, encoding = _read_text(path)
+    lines = text.splitlines(keepends=True)
+    code_start, code_end = CODE_FIELD
+    volume_start, volume_end = VOLUME_FIELD
+    changed = 0
+    seen = 0
+    for i in range(HEADER_LINES, len(lines)):
+        line = lines[i]
+        # The plants block ends at the first blank line
+        if len(line) < 3:
+            break
+        code = int(line[code_start:code_end])
+        if code not in volumes:
+            raise ValueError(f"Usina {code} não está na tabela do confhd")
+        seen += 1
+        field = line[volume_start:volume_end]
+        if field != volumes[code]:
+            lines[i] = (
+                line[:volume_start] + volumes[code] + line[volume_end:]
+            )
+            changed += 1
+    if seen != len(volumes):
+        raise ValueError("A tabela do confhd tem usinas fora do arquivo")
+    if changed == 0:
+        return 0
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".confhd")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.writelines(lines)
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return changed
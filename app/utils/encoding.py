@@ -1,19 +1,40 @@
 from os.path import isfile
+from typing import Tuple
+
 from app.utils.terminal import run_terminal_retry
+from app.utils.tracing import current_span, traced
 
 
 TIMEOUT_DEFAULT = 10.0
 
 
+def le_registros(path: str, prefixes: Tuple[str, ...]) -> str:
+    """
+    Returns only the lines of a register file that start with some
+    prefixes, read as ISO-8859-1 without converting the file, which
+    is enough for the registers that have only numbers and codes.
+
+    :param path: The path to the file
+    :param prefixes: The names of the registers
+    :return: The lines of the registers
+    :rtype: str
+    """
+    with open(path, "r", encoding="iso-8859-1") as f:
+        return "".join(line for line in f if line.startswith(prefixes))
+
+
+@traced("encoding.convert")
 async def converte_codificacao(path: str, script: str):
     if not isfile(path):
         raise FileNotFoundError
     if not isfile(script):
         raise FileNotFoundError
-    _, out = await run_terminal_retry([f"file -i {path}"])
+    current_span().set_file(path)
+    _, out = await run_terminal_retry(["file", "-i", path])
     cod = out.split("charset=")[1].strip()
     if "unknown" in cod:
         cod = "ISO-8859-1"
     if all([cod != "utf-8", cod != "us-ascii", cod != "binary"]):
         cod = cod.upper()
-        c, _ = await run_terminal_retry([f"{script}" + f" {path} {cod}"])
+        current_span().set(encoding=cod)
+        c, _ = await run_terminal_retry([script, path, cod])
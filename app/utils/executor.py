@@ -0,0 +1,149 @@
+import asyncio
+import random
+import shlex
+import threading
+from typing import Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from app.internal.settings import Settings
+from app.utils.singleton import Singleton
+
+
+RETRY_DEFAULT = 3
+TIMEOUT_DEFAULT = 10.0
+BACKOFF_BASE_DEFAULT = 0.1
+BACKOFF_MAX_DEFAULT = 2.0
+
+
+class SubprocessExecutor(metaclass=Singleton):
+    """
+    Launches commands as child processes, bounding the number of
+    processes that run at the same time in the whole application.
+    """
+
+    def __init__(self):
+        # One semaphore per event loop, since they are bound to a loop
+        self._semaphores: WeakKeyDictionary = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.spawns = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.running = 0
+
+    @staticmethod
+    def argv(cmds: List[str]) -> List[str]:
+        # Commands given as a single command line are split the way
+        # a shell would, but never interpreted by one
+        if len(cmds) == 1:
+            return shlex.split(cmds[0])
+        return list(cmds)
+
+    def __semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(
+                    max(1, Settings.subprocess_concurrency)
+                )
+            return self._semaphores[loop]
+
+    def __count(self, counter: str, increment: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + increment)
+
+    @staticmethod
+    async def __kill(proc: asyncio.subprocess.Process):
+        if proc.returncode is not None:
+            return
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await asyncio.shield(proc.wait())
+
+    async def run(
+        self, cmds: List[str], timeout: float = TIMEOUT_DEFAULT
+    ) -> Tuple[Optional[int], str]:
+        """
+        Runs a command and returns its code and outputs. The child
+        process is always killed and reaped if it does not finish
+        in time.
+
+        :param cmds: Command and args to be executed
+        :param timeout: Timeout for giving up on the command
+        :return: Return code and outputs
+        :rtype: Tuple[Optional[int], str]
+        """
+        argv = self.argv(cmds)
+        async with self.__semaphore():
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except FileNotFoundError as e:
+                return 127, str(e)
+            except PermissionError as e:
+                return 126, str(e)
+            self.__count("spawns")
+            self.__count("running")
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    proc.communicate(), timeout=timeout
+                )
+            except BaseException as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.__count("timeouts")
+                await self.__kill(proc)
+                raise
+            finally:
+                self.__count("running", -1)
+        if stdout:
+            return proc.returncode, stdout.decode("utf-8")
+        if stderr:
+            return proc.returncode, stderr.decode("utf-8")
+        return -1, ""
+
+    async def run_retry(
+        self,
+        cmds: List[str],
+        num_retry: int = RETRY_DEFAULT,
+        timeout: float = TIMEOUT_DEFAULT,
+        backoff_base: float = BACKOFF_BASE_DEFAULT,
+        backoff_max: float = BACKOFF_MAX_DEFAULT,
+    ) -> Tuple[int, str]:
+        """
+        Runs a command (with retries) and returns its code and
+        outputs. Failed attempts are retried after a jittered
+        exponential backoff.
+
+        :param cmds: Command and args to be executed
+        :param num_retry: Max number of attempts
+        :param timeout: Timeout for giving up on each attempt
+        :param backoff_base: Backoff upper bound for the first retry
+        :param backoff_max: Max backoff upper bound
+        :return: Return code and outputs
+        :rtype: Tuple[int, str]
+        """
+        for attempt in range(num_retry):
+            if attempt > 0:
+                self.__count("retries")
+                delay = min(backoff_max, backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                cod, outputs = await self.run(cmds, timeout)
+            except asyncio.TimeoutError:
+                continue
+            if cod == 0:
+                return cod, outputs
+        return -1, ""
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "spawns": self.spawns,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "running": self.running,
+            }
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+
+DECOMP_WEEK_DAYS = 7
+
+
+def decomp_stage_dates(start: date, stages: int) -> List[date]:
+    """
+    Returns the dates of the storages reported by the DECOMP, i.e. the
+    start of the study and the end of each stage. All the stages are
+    weekly, except for the last one, which goes until the end of the
+    month after the last week.
+
+    :param start: The start date of the study (DT register)
+    :param stages: The number of stages
+    :return: The `stages + 1` dates
+    :rtype: List[date]
+    """
+    dates = [
+        start + timedelta(days=DECOMP_WEEK_DAYS * k) for k in range(stages)
+    ]
+    last = dates[-1]
+    if last.month == 12:
+        dates.append(date(last.year + 1, 1, 1))
+    else:
+        dates.append(date(last.year, last.month + 1, 1))
+    return dates
+
+
+def interpolate_storage(
+    volumes: np.ndarray,
+    dates: List[date],
+    target: date,
+) -> np.ndarray:
+    """
+    Interpolates the storages of all plants to a date, linearly in time
+    between the two reported storages around it.
+
+    The storages are given as percentages of the useful volume, which
+    are an affine function of the absolute volumes, so interpolating
+    them is the same as interpolating the volumes. The result is kept
+    within [0, 100].
+
+    :param volumes: The storages (%), with one row by plant and one
+        column by date
+    :param dates: The dates of the columns, in increasing order
+    :param target: The date to interpolate to
+    :return: The storage (%) of each plant in the date
+    :rtype: np.ndarray
+    """
+    if not dates[0] <= target <= dates[-1]:
+        raise ValueError(f"Data {target} fora do horizonte do caso")
+    days = np.array([(d - dates[0]).days for d in dates], dtype=np.float64)
+    t = float((target - dates[0]).days)
+    # Index of the column just before the date and weight of the next
+    j = min(int(np.searchsorted(days, t, side="right")) - 1, len(days) - 2)
+    w = (t - days[j]) / (days[j + 1] - days[j])
+    before = volumes[:, j].astype(np.float64)
+    after = volumes[:, j + 1].astype(np.float64)
+    return np.clip(before + w * (after - before), 0.0, 100.0)
@@ -0,0 +1,81 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd  # type: ignore
+
+# Text columns with at most this fraction of distinct values become
+# categorical
+CATEGORY_RATIO = 0.5
+
+
+def downcast(
+    df: "pd.DataFrame", columns: Optional[List[str]] = None
+) -> "pd.DataFrame":
+    """
+    Returns a compact copy of a table, with only the given columns,
+    the integer columns in the smallest integer type, the float
+    columns in float32 when no value changes and the repeated text
+    columns as categorical.
+
+    :param df: The table
+    :param columns: The columns to be kept, or None for all
+    :return: The compact table
+    :rtype: pd.DataFrame
+    """
+    import numpy as np
+    import pandas as pd  # type: ignore
+
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    data: Dict[str, Any] = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_bool_dtype(col):
+            data[name] = col
+        elif pd.api.types.is_integer_dtype(col) and isinstance(
+            col.dtype, np.dtype
+        ):
+            data[name] = pd.to_numeric(col, downcast="integer")
+        elif pd.api.types.is_float_dtype(col) and col.dtype != np.float32:
+            values = col.to_numpy()
+            small = values.astype(np.float32)
+            lossless = np.array_equal(
+                small.astype(values.dtype), values, equal_nan=True
+            )
+            data[name] = col.astype(np.float32) if lossless else col
+        elif pd.api.types.is_string_dtype(col) or col.dtype == object:
+            distinct = col.nunique(dropna=False)
+            if len(col) > 0 and distinct <= CATEGORY_RATIO * len(col):
+                data[name] = col.astype("category")
+            else:
+                data[name] = col
+        else:
+            data[name] = col
+    return pd.DataFrame(data, index=df.index)
+
+
+class CompactFile:
+    """
+    Stands for a parsed file in the low memory mode, keeping only
+    some of its tables, as attributes with the same names.
+    """
+
+    def __init__(self, tables: Dict[str, Optional["pd.DataFrame"]]):
+        self.__dict__.update(tables)
+
+
+def compact(obj: Any, tables: Dict[str, List[str]]) -> CompactFile:
+    """
+    Extracts some tables of a parsed file, with only the used columns,
+    so the file itself can be freed.
+
+    :param obj: The parsed file
+    :param tables: The columns to be kept, by table
+    :return: The compacted tables
+    :rtype: CompactFile
+    """
+    extracted: Dict[str, Optional["pd.DataFrame"]] = {}
+    for table, columns in tables.items():
+        df = getattr(obj, table)
+        extracted[table] = None if df is None else downcast(df, columns)
+    return CompactFile(extracted)
@@ -0,0 +1,28 @@
+import threading
+from importlib import import_module
+from typing import Any, Dict
+
+
+_LOADED: Dict[str, Any] = {}
+# The repositories are created in worker threads, and the parsers
+# imported by different plugins share modules with circular imports,
+# which fail when they are imported by two threads at once
+_LOCK = threading.Lock()
+
+
+def load_plugin(spec: str) -> Any:
+    """
+    Imports an object given by a `module.path:Attribute` spec,
+    only when it is first requested.
+
+    :param spec: The import spec of the object
+    :return: The imported object
+    :rtype: Any
+    """
+    with _LOCK:
+        if spec not in _LOADED:
+            module_name, _, attribute = spec.partition(":")
+            if not attribute:
+                raise ValueError(f"Invalid plugin spec: {spec}")
+            _LOADED[spec] = getattr(import_module(module_name), attribute)
+        return _LOADED[spec]
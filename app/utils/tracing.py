@@ -0,0 +1,337 @@
+import asyncio
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from app.internal.settings import Settings
+from app.utils.log import Log
+from app.utils.singleton import Singleton
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class Span:
+    """
+    A timed stage of a request, with its attributes (file path,
+    size, ...) and a reference to the stage that contains it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        request_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.__t0 = time.perf_counter_ns()
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def set_file(self, path: str):
+        self.attributes["file.path"] = path
+        try:
+            self.attributes["file.size"] = os.path.getsize(path)
+        except OSError:
+            pass
+
+    def finish(self):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self.__t0
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        attributes = dict(self.attributes, request_id=self.request_id)
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)}
+                for k, v in attributes.items()
+            ],
+            "status": {"code": 1 if self.status == "OK" else 2},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes: Any):
+        pass
+
+    def set_file(self, path: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class JSONLinesExporter:
+    """
+    Appends each finished span as a JSON line to a local file, outside
+    of the request handling.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # A single writer keeps the lines of each request together
+        self.__pool = ThreadPoolExecutor(1, thread_name_prefix="trace")
+
+    def __write(self, spans: List[Span]):
+        lines = "".join(json.dumps(s.to_dict()) + "\n" for s in spans)
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError as e:
+            Log.log().warning(f"Erro na escrita dos traces: {e}")
+
+    def export(self, spans: List[Span]):
+        self.__pool.submit(self.__write, spans)
+
+    def shutdown(self):
+        self.__pool.shutdown(wait=True)
+
+
+class OTLPExporter:
+    """
+    Sends the spans of each finished request to a collector that
+    accepts OTLP/HTTP in JSON, outside of the request handling.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.__pool = ThreadPoolExecutor(1, thread_name_prefix="trace")
+
+    def __post(self, spans: List[Span]):
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": "encadeador"},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.utils.tracing"},
+                            "spans": [s.to_otlp() for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        req = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=5) as r:
+                r.read()
+        except Exception as e:
+            Log.log().warning(f"Erro no envio dos traces: {e}")
+
+    def export(self, spans: List[Span]):
+        self.__pool.submit(self.__post, spans)
+
+    def shutdown(self):
+        self.__pool.shutdown(wait=True)
+
+
+_CURRENT: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+# Spans of the current request, exported together when it finishes
+_PENDING: ContextVar[Optional[List[Span]]] = ContextVar(
+    "pending_spans", default=None
+)
+
+
+class Tracer(metaclass=Singleton):
+    """
+    Creates the spans and hands them to the exporter chosen by
+    `TRACE_EXPORTER` (`OFF`, `JSONL` or `OTLP`).
+    """
+
+    def __init__(self):
+        self.__exporter: Any = None
+        self.__config: tuple = ()
+        self.__lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return Settings.trace_exporter.upper() in ["JSONL", "OTLP"]
+
+    @property
+    def exporter(self) -> Any:
+        kind = Settings.trace_exporter.upper()
+        config = (kind, Settings.trace_file, Settings.trace_endpoint)
+        with self.__lock:
+            if config != self.__config:
+                if self.__exporter is not None:
+                    self.__exporter.shutdown()
+                if kind == "OTLP":
+                    self.__exporter = OTLPExporter(Settings.trace_endpoint)
+                else:
+                    self.__exporter = JSONLinesExporter(Settings.trace_file)
+                self.__config = config
+            return self.__exporter
+
+    def shutdown(self):
+        with self.__lock:
+            if self.__exporter is not None:
+                self.__exporter.shutdown()
+            self.__exporter = None
+            self.__config = ()
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        request_id: Optional[str] = None,
+        **attributes: Any,
+    ) -> Iterator[Any]:
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        parent = _CURRENT.get()
+        if parent is None:
+            trace_id = secrets.token_hex(16)
+            s = Span(name, trace_id, request_id or trace_id, None, attributes)
+        else:
+            s = Span(
+                name,
+                parent.trace_id,
+                parent.request_id,
+                parent.span_id,
+                attributes,
+            )
+        pending = _PENDING.get()
+        root = pending is None
+        pending_token = _PENDING.set([]) if root else None
+        token = _CURRENT.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.status = "ERROR"
+            s.set(error=repr(e))
+            raise
+        finally:
+            s.finish()
+            _CURRENT.reset(token)
+            spans = _PENDING.get()
+            assert spans is not None
+            spans.append(s)
+            if root and pending_token is not None:
+                _PENDING.reset(pending_token)
+                self.exporter.export(spans)
+
+
+def span(name: str, **attributes: Any):
+    """
+    Opens a span as a child of the current one, or a new trace if
+    there is none.
+
+    :param name: The stage name
+    :return: A context manager that gives the span
+    """
+    return Tracer().span(name, **attributes)
+
+
+def request_span(name: str, request_id: Optional[str] = None, **attributes):
+    """
+    Opens the root span of a request, taking the request id that came
+    in the request headers, if any.
+    """
+    return Tracer().span(name, request_id=request_id, **attributes)
+
+
+def current_span() -> Any:
+    s = _CURRENT.get()
+    return NOOP_SPAN if s is None else s
+
+
+def current_request_id() -> Optional[str]:
+    s = _CURRENT.get()
+    return None if s is None else s.request_id
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorator that runs a function, or coroutine function, inside
+    a span.
+
+    :param name: The stage name
+    """
+
+    def decorator(f: F) -> F:
+        if asyncio.iscoroutinefunction(f):
+
+            @functools.wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await f(*args, **kwargs)
+
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
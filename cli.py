@@ -0,0 +1,121 @@
+import argparse
+import os
+import pathlib
+import time
+
+from dotenv import load_dotenv
+
+from app.internal.settings import Settings
+from app.utils.log import Log
+
+BASEDIR = pathlib.Path().resolve()
+
+
+def encadear(args: argparse.Namespace):
+    from app.services.bulk import (
+        BulkChaining,
+        read_manifest,
+        summary,
+        write_results,
+    )
+
+    steps = read_manifest(args.manifesto)
+    bulk = BulkChaining(args.processos, args.raiz)
+    Log.log().info(
+        f"Encadeando {len(steps)} passos com {bulk.processes} processos"
+    )
+    t0 = time.perf_counter()
+    rows = bulk.run(steps)
+    elapsed = time.perf_counter() - t0
+    write_results(rows, args.saida)
+    for name, value in summary(rows, elapsed).items():
+        print(f"{name}: {value}")
+
+
+def validar(args: argparse.Namespace):
+    from app.services.validation import (
+        ValidationSweep,
+        ordered_cases,
+        write_mismatches,
+    )
+
+    casos = list(args.casos) + ordered_cases(args.raiz)
+    sweep = ValidationSweep(args.processos, args.tolerancia)
+    Log.log().info(
+        f"Validando {len(casos)} casos com {sweep.processes} processos"
+    )
+    mismatches, stats = sweep.run(casos)
+    write_mismatches(mismatches, args.saida)
+    if len(mismatches) > 0:
+        counts = mismatches.groupby(["case", "variable"]).size()
+        for (case, variable), n in counts.items():
+            print(f"{case} {variable}: {n} divergências")
+    for name, value in stats.items():
+        print(f"{name}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Encadeamento e validação de casos sem o serviço HTTP"
+    )
+    commands = parser.add_subparsers(dest="comando", required=True)
+    parser_encadear = commands.add_parser(
+        "encadear", help="encadeia os passos de um manifesto"
+    )
+    parser_encadear.add_argument("manifesto", help="arquivo CSV ou JSON")
+    parser_encadear.add_argument(
+        "-o",
+        "--saida",
+        default="resultados.csv",
+        help="tabela de resultados (CSV ou .parquet)",
+    )
+    parser_encadear.add_argument(
+        "--raiz",
+        action="append",
+        default=[],
+        help="diretório com os casos onde buscar as origens não informadas"
+        + " (padrão: INDEX_ROOTS)",
+    )
+    parser_validar = commands.add_parser(
+        "validar", help="valida o encadeamento de uma sequência de casos"
+    )
+    parser_validar.add_argument(
+        "casos", nargs="*", help="diretórios dos casos, em ordem"
+    )
+    parser_validar.add_argument(
+        "--raiz",
+        action="append",
+        default=[],
+        help="diretório com casos DECOMP, ordenados pelo mês e revisão",
+    )
+    parser_validar.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.01,
+        help="diferença absoluta máxima",
+    )
+    parser_validar.add_argument(
+        "-o",
+        "--saida",
+        default="divergencias.csv",
+        help="tabela de divergências (CSV ou .parquet)",
+    )
+    for p in [parser_encadear, parser_validar]:
+        p.add_argument(
+            "-p",
+            "--processos",
+            type=int,
+            default=None,
+            help="processos simultâneos (padrão: número de núcleos)",
+        )
+    args = parser.parse_args()
+    {"encadear": encadear, "validar": validar}[args.comando](args)
+
+
+if __name__ == "__main__":
+    installdir = os.path.dirname(os.path.abspath(__file__))
+    os.environ["APP_INSTALLDIR"] = installdir
+    load_dotenv(pathlib.Path(installdir).joinpath(".env"), override=True)
+    Settings.read_environments()
+    Log.configure_logging(str(BASEDIR))
+    main()
@@ -0,0 +1,143 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+from idecomp.decomp.dadger import Dadger
+from idecomp.decomp.hidr import Hidr
+from idecomp.decomp.relato import Relato
+from inewave.newave.confhd import Confhd
+from inewave.newave.hidr import Hidr as HidrNewave
+from app.adapters.decomprepository import factory as decomp_factory
+from app.adapters.newaverepository import factory as newave_factory
+from app.internal.httpresponse import HTTPResponse
+from app.internal.parsecache import ParseCache
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.newave.arquivos import (
+    MockArquivos as MockArquivosNewave,
+)
+from tests.mocks.arquivos.newave.confhd import MockConfhd
+
+DIR_DECOMP = "./tests/mocks/arquivos/decomp/"
+DIR_NEWAVE = "./tests/mocks/arquivos/newave/"
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _members(prefix: str):
+    return {
+        f"{prefix}decomp/caso.dat": b"rv0",
+        f"{prefix}decomp/rv0": "".join(MockArquivos).encode(),
+        f"{prefix}decomp/dadger.py": "".join(MockDadger).encode(),
+        f"{prefix}decomp/hidr.dat": _read(DIR_DECOMP + "hidr.dat"),
+        f"{prefix}decomp/relato.rv0": _read(DIR_DECOMP + "relato.rv0"),
+        f"{prefix}newave/caso.dat": b"arquivos.py\n",
+        f"{prefix}newave/arquivos.py": "".join(MockArquivosNewave).encode(),
+        f"{prefix}newave/confhd.py": "".join(MockConfhd).encode(),
+        f"{prefix}newave/hidr.dat": _read(DIR_NEWAVE + "hidr.dat"),
+    }
+
+
+def _zip(path: str, prefix: str = "") -> str:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in _members(prefix).items():
+            z.writestr(name, data)
+    return path
+
+
+def _tar(path: str, prefix: str = "") -> str:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as t:
+        for name, data in _members(prefix).items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    data = buffer.getvalue()
+    if path.endswith(".zst"):
+        zstandard = pytest.importorskip("zstandard")
+        data = zstandard.ZstdCompressor().compress(data)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.fixture(params=["zip", "tar", "tar.zst"])
+def archive(request, tmp_path):
+    ParseCache().clear()
+    path = str(tmp_path.joinpath(f"casos.{request.param}"))
+    if request.param == "zip":
+        return _zip(path)
+    return _tar(path)
+
+
+@pytest.mark.asyncio
+async def test_archive_decomp_reads(archive, tmp_path):
+    repo = decomp_factory("ARCHIVE", os.path.join(archive, "decomp"))
+    assert isinstance(repo.get_relato(), Relato)
+    assert isinstance(repo.get_hidr(), Hidr)
+    assert isinstance(await repo.get_dadger(), Dadger)
+    assert repo.get_relgnl().code == 404
+    # Nothing is extracted next to the archive
+    assert os.listdir(tmp_path) == [os.path.basename(archive)]
+
+
+@pytest.mark.asyncio
+async def test_archive_deck_read_off_loop(tmp_path, monkeypatch):
+    import threading
+    from app.internal.archive import ArchiveCase
+
+    ParseCache().clear()
+    archive = _zip(str(tmp_path.joinpath("casos.zip")))
+    repo = decomp_factory("ARCHIVE", os.path.join(archive, "decomp"))
+    threads = []
+    read = ArchiveCase.read
+
+    def spy(self, name, parser, cached=False):
+        threads.append(threading.current_thread())
+        return read(self, name, parser, cached)
+
+    monkeypatch.setattr(ArchiveCase, "read", spy)
+    assert isinstance(await repo.get_dadger(), Dadger)
+    assert threading.main_thread() not in threads
+
+
+def test_archive_newave_reads(archive):
+    repo = newave_factory("ARCHIVE", os.path.join(archive, "newave"))
+    assert isinstance(repo.get_confhd(), Confhd)
+    assert isinstance(repo.get_hidr(), HidrNewave)
+    assert repo.get_term().code == 404
+
+
+def test_archive_inner_prefix(tmp_path):
+    ParseCache().clear()
+    archive = _zip(str(tmp_path.joinpath("backtest.zip")), "2023_01/")
+    repo = decomp_factory("ARCHIVE", f"{archive}/2023_01/decomp")
+    assert isinstance(repo.get_relato(), Relato)
+    # A second repository reuses the parsed relato
+    misses = ParseCache().stats()["misses"]
+    other = decomp_factory("ARCHIVE", f"{archive}/2023_01/decomp")
+    assert isinstance(other.get_relato(), Relato)
+    assert ParseCache().stats()["misses"] == misses
+
+
+@pytest.mark.asyncio
+async def test_archive_is_read_only(tmp_path):
+    archive = _zip(str(tmp_path.joinpath("casos.zip")))
+    repo = decomp_factory("ARCHIVE", os.path.join(archive, "decomp"))
+    dadger = await repo.get_dadger()
+    res = repo.set_dadger(dadger)
+    assert isinstance(res, HTTPResponse)
+    assert res.code == 405
+    repo = newave_factory("ARCHIVE", os.path.join(archive, "newave"))
+    res = repo.set_confhd(repo.get_confhd())
+    assert res.code == 405
+
+
+def test_archive_not_found(tmp_path):
+    repo = decomp_factory("ARCHIVE", str(tmp_path.joinpath("x.zip/decomp")))
+    assert repo.get_relato().code == 404
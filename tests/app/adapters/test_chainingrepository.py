@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+
+import pytest
+from idecomp.decomp.dadger import Dadger
+from idecomp.decomp.modelos.dadger import DT
+from idecomp.decomp.relato import Relato
+from app.adapters.chainingrepository import (
+    DECOMPChainingRepository,
+    NEWAVEChainingRepository,
+)
+from app.adapters import testdecomprepository
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.unitofwork import (
+    AbstractUnitOfWork,
+    DecompUnitOfWork,
+    NewaveUnitOfWork,
+)
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.decomp.relato import MockRelato
+
+DELAY = 0.2
+
+
+class SlowFiles:
+    def __init__(self, name: str):
+        self.name = name
+
+    def get_relato(self):
+        time.sleep(DELAY)
+        return f"{self.name}.relato"
+
+    def get_hidr(self):
+        time.sleep(DELAY)
+        return f"{self.name}.hidr"
+
+    async def get_dadger(self):
+        await asyncio.sleep(DELAY)
+        return f"{self.name}.dadger"
+
+
+class SlowUnitOfWork(AbstractUnitOfWork):
+    def __init__(self, name: str):
+        self._files = SlowFiles(name)
+
+    def rollback(self):
+        pass
+
+    @property
+    def program(self) -> Program:
+        return Program.DECOMP
+
+    @property
+    def files(self):
+        return self._files
+
+
+@pytest.mark.asyncio
+async def test_read_files_concurrently():
+    repo = DECOMPChainingRepository()
+    t0 = time.perf_counter()
+    source, destination = await repo.read_files(
+        ChainingVariable.TVIAGEM,
+        SlowUnitOfWork("origem"),
+        SlowUnitOfWork("destino"),
+    )
+    elapsed = time.perf_counter() - t0
+    assert source == {"dadger": "origem.dadger", "relato": "origem.relato"}
+    assert destination == {
+        "dadger": "destino.dadger",
+        "hidr": "destino.hidr",
+    }
+    # Four reads take about as long as one
+    assert elapsed < 2 * DELAY
+
+
+@pytest.mark.asyncio
+async def test_newave_varm_interpolates_to_start_date(monkeypatch):
+    async def get_dadger(self):
+        d = Dadger.read("".join(MockDadger))
+        # Study starting on 25/11/2023, so 01/12/2023 is in the first week
+        d.data.append(DT(data=[25, 11, 2023]))
+        return d
+
+    monkeypatch.setattr(
+        testdecomprepository.TestDecompRepository, "get_dadger", get_dadger
+    )
+    results = await NEWAVEChainingRepository().chain_varm(
+        [DecompUnitOfWork("k")], NewaveUnitOfWork("k")
+    )
+    assert isinstance(results, list)
+    volumes = Relato.read("".join(MockRelato)).volume_util_reservatorios
+    furnas = volumes.loc[volumes["codigo_usina"] == 6].iloc[0]
+    expected = furnas["inicial"] + 6 / 7 * (
+        furnas["estagio_1"] - furnas["inicial"]
+    )
+    value = [r.value for r in results if r.id.strip() == "FURNAS"][0]
+    assert value == pytest.approx(expected, abs=0.01)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", ["exception", "response"])
+async def test_chain_rollback(monkeypatch, tmp_path, failure):
+    from app.internal.httpresponse import HTTPResponse
+
+    dadger = tmp_path / "dadger.rv1"
+    dadger.write_text("original")
+
+    async def chain_varm(self, sources_uow, destination_uow):
+        with destination_uow:
+            destination_uow.files.protect(str(dadger))
+            dadger.write_text("encadeado")
+        # A later step of the rule fails
+        if failure == "exception":
+            raise RuntimeError("falha")
+        return HTTPResponse(code=500, detail="falha")
+
+    monkeypatch.setattr(DECOMPChainingRepository, "chain_varm", chain_varm)
+    repo = DECOMPChainingRepository()
+    args = (ChainingVariable.VARM, [DecompUnitOfWork("k")])
+    if failure == "exception":
+        with pytest.raises(RuntimeError):
+            await repo.chain(*args, DecompUnitOfWork("k"))
+    else:
+        result = await repo.chain(*args, DecompUnitOfWork("k"))
+        assert isinstance(result, HTTPResponse)
+    assert dadger.read_text() == "original"
+    assert os.listdir(tmp_path) == ["dadger.rv1"]
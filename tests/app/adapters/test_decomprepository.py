@@ -67,3 +67,60 @@ async def test_arquivos_decomp(mocker):
     arq = repo.get_relgnl()
     assert isinstance(arq, Relgnl)
     assert isinstance(arq.relatorio_operacao_termica, pd.DataFrame)
+
+
+@pytest.mark.asyncio
+async def test_deck_reads_overlap(tmp_path, mocker):
+    import asyncio
+    import threading
+
+    async def no_conversion(path: str, script: str):
+        pass
+
+    mocker.patch(
+        "app.adapters.decomprepository.converte_codificacao", no_conversion
+    )
+    # Each read waits for the other, so it only ends if both are parsed
+    # at the same time, outside of the event loop. Files of the same type
+    # are parsed one at a time, so the dadger waits for the dadgnl.
+    barrier = threading.Barrier(2, timeout=10)
+    read_dadger, read_dadgnl = Dadger.read, Dadgnl.read
+
+    def waiting_dadger(path: str) -> Dadger:
+        barrier.wait()
+        return read_dadger(path)
+
+    def waiting_dadgnl(path: str) -> Dadgnl:
+        barrier.wait()
+        return read_dadgnl(path)
+
+    mocker.patch.object(Dadger, "read", waiting_dadger)
+    mocker.patch.object(Dadgnl, "read", waiting_dadgnl)
+    tmp_path.joinpath("caso.dat").write_text("rv0")
+    tmp_path.joinpath("rv0").write_text("".join(MockArquivos))
+    tmp_path.joinpath("dadger.py").write_text("".join(MockDadger))
+    tmp_path.joinpath("dadgnl.py").write_text("".join(MockDadgnl))
+    repo = factory("FS", str(tmp_path))
+    dadger, dadgnl = await asyncio.gather(
+        repo.get_dadger(), repo.get_dadgnl()
+    )
+    assert isinstance(dadger, Dadger)
+    assert isinstance(dadgnl, Dadgnl)
+
+
+@pytest.mark.asyncio
+async def test_dt_read_keeps_source(tmp_path, mocker):
+    conversion = mocker.patch(
+        "app.adapters.decomprepository.converte_codificacao"
+    )
+    tmp_path.joinpath("caso.dat").write_text("rv0")
+    tmp_path.joinpath("rv0").write_text("".join(MockArquivos))
+    content = (
+        "& Usinas não convertidas\n" + "".join(MockDadger)
+    ).encode("iso-8859-1") + b"DT  25   11   2023\n"
+    tmp_path.joinpath("dadger.py").write_bytes(content)
+    dadger = await factory("FS", str(tmp_path)).get_dt()
+    assert isinstance(dadger, Dadger)
+    assert (dadger.dt.dia, dadger.dt.mes, dadger.dt.ano) == (25, 11, 2023)
+    conversion.assert_not_called()
+    assert tmp_path.joinpath("dadger.py").read_bytes() == content
@@ -0,0 +1,147 @@
+import pytest
+from idecomp.decomp.dadger import Dadger
+from idecomp.decomp.hidr import Hidr
+from idecomp.decomp.relato import Relato
+from inewave.newave.confhd import Confhd
+from app.adapters.decomprepository import factory as decomp_factory
+from app.adapters.newaverepository import factory as newave_factory
+from app.internal.objectstore import ObjectStoreClient
+from app.internal.settings import Settings
+from tests.mocks.objectstore import MockObjectStore
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.newave.arquivos import (
+    MockArquivos as MockArquivosNewave,
+)
+from tests.mocks.arquivos.newave.confhd import MockConfhd
+
+DIR_DECOMP = "./tests/mocks/arquivos/decomp/"
+DIR_NEWAVE = "./tests/mocks/arquivos/newave/"
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    server = MockObjectStore()
+    monkeypatch.setattr(Settings, "object_store_url", server.start())
+    monkeypatch.setattr(Settings, "object_cache_dir", str(tmp_path))
+    monkeypatch.setattr(Settings, "object_store_chunk_size", 64 * 1024)
+    server.put("casos", "decomp/caso.dat", b"rv0")
+    server.put("casos", "decomp/rv0", "".join(MockArquivos).encode())
+    server.put("casos", "decomp/dadger.py", "".join(MockDadger).encode())
+    server.put("casos", "decomp/hidr.dat", _read(DIR_DECOMP + "hidr.dat"))
+    server.put(
+        "casos", "decomp/relato.rv0", _read(DIR_DECOMP + "relato.rv0")
+    )
+    server.put("casos", "newave/caso.dat", b"arquivos.py\n")
+    server.put(
+        "casos",
+        "newave/arquivos.py",
+        "".join(MockArquivosNewave).encode(),
+    )
+    server.put("casos", "newave/confhd.py", "".join(MockConfhd).encode())
+    yield server
+    ObjectStoreClient().close()
+    server.stop()
+
+
+@pytest.mark.asyncio
+async def test_s3_decomp_reads(store):
+    repo = decomp_factory("S3", "s3://casos/decomp")
+    assert isinstance(repo.get_relato(), Relato)
+    assert isinstance(repo.get_hidr(), Hidr)
+    # hidr.dat is larger than a chunk and is read by ranged requests
+    assert store.count("GET", ranged=True) >= 4
+    assert isinstance(await repo.get_dadger(), Dadger)
+
+
+@pytest.mark.asyncio
+async def test_s3_decomp_local_cache(store):
+    decomp_factory("S3", "decomp").get_relato()
+    gets = store.count("GET")
+    repo = decomp_factory("S3", "decomp")
+    assert isinstance(repo.get_relato(), Relato)
+    assert store.count("GET") == gets
+
+
+@pytest.mark.asyncio
+async def test_s3_decomp_conditional_write(store):
+    repo = decomp_factory("S3", "s3://casos/decomp")
+    dadger = await repo.get_dadger()
+    res = repo.set_dadger(dadger)
+    assert res.code == 200
+    assert store.count("PUT") == 0
+    assert repo.publish().code == 200
+    assert store.count("PUT") == 1
+
+    # Someone else changes the object before the next write
+    alterado = store.objects["casos/decomp/dadger.py"] + b"\n"
+    store.put("casos", "decomp/dadger.py", alterado)
+    res = repo.set_dadger(dadger)
+    assert res.code == 200
+    assert repo.publish().code == 409
+
+
+def test_s3_newave_confhd(store):
+    repo = newave_factory("S3", "s3://casos/newave")
+    confhd = repo.get_confhd()
+    assert isinstance(confhd, Confhd)
+    assert repo.set_confhd(confhd).code == 200
+    assert repo.publish().code == 200
+    assert store.count("PUT") == 1
+
+
+def test_s3_decomp_write_without_deck_file(store, monkeypatch):
+    from app.adapters.decomprepository import RawDecompRepository
+    from app.internal.httpresponse import HTTPResponse
+
+    store.put("casos", "decomp/rv0", b"dadger.py\n")
+    monkeypatch.setattr(
+        RawDecompRepository,
+        "set_dadgnl",
+        lambda self, d: HTTPResponse(code=200, detail=""),
+    )
+    repo = decomp_factory("S3", "s3://casos/decomp")
+    assert repo.set_dadgnl(None).code == 404
+    assert store.count("PUT") == 0
+
+
+
+@pytest.mark.asyncio
+async def test_s3_decomp_rollback(store, monkeypatch):
+    from app.internal.objectstore import ObjectStoreMirror
+    from app.services.unitofwork import DecompUnitOfWork
+
+    monkeypatch.setattr(Settings, "decomp_source", "S3")
+    original = store.objects["casos/decomp/dadger.py"]
+    uow = DecompUnitOfWork("s3://casos/decomp")
+    async with uow:
+        dadger = await uow.files.get_dadger()
+        dadger.write = lambda path: open(path, "w").write("alterado")
+        assert uow.files.set_dadger(dadger).code == 200
+        uow.rollback()
+    local = ObjectStoreMirror("s3://casos/decomp").local_path("dadger.py")
+    with open(local, "rb") as f:
+        assert f.read() == original
+    assert store.count("PUT") == 0
+
+
+@pytest.mark.asyncio
+async def test_s3_decomp_failed_publish(store):
+    repo = decomp_factory("S3", "s3://casos/decomp")
+    dadger = await repo.get_dadger()
+    assert repo.set_dadger(dadger).code == 200
+    alterado = store.objects["casos/decomp/dadger.py"] + b"\n"
+    store.put("casos", "decomp/dadger.py", alterado)
+    assert repo.publish().code == 409
+    # The local copy is not trusted anymore and is downloaded again
+    gets = store.count("GET")
+    assert isinstance(
+        await decomp_factory("S3", "s3://casos/decomp").get_dadger(),
+        Dadger,
+    )
+    assert store.count("GET") > gets
@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import pytest
+from idecomp.decomp.arquivos import Arquivos
+from idecomp.decomp.hidr import Hidr
+from app.adapters.decomprepository import factory
+from app.internal import catalog
+from app.internal.catalog import CaseCatalog
+from app.internal.settings import Settings
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+
+DIR_TESTE = "./tests/mocks/arquivos/decomp/"
+
+
+@pytest.fixture
+def case_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(tmp_path.joinpath("catalog.db"))
+    )
+    case = tmp_path.joinpath("caso")
+    case.mkdir()
+    case.joinpath("caso.dat").write_text("rv0")
+    case.joinpath("rv0").write_text("".join(MockArquivos))
+    shutil.copy(os.path.join(DIR_TESTE, "hidr.dat"), case)
+    yield case
+    CaseCatalog().close()
+
+
+def test_catalog_deck_lookup(case_dir):
+    c = CaseCatalog()
+    assert c.deck(str(case_dir)) is None
+    c.record_case(str(case_dir), "DECOMP", "rv0", {"hidr": "hidr.dat"}, "rv0")
+    assert c.deck(str(case_dir)) == {"hidr": "hidr.dat"}
+    # Changing the arquivos file invalidates the resolved names
+    case_dir.joinpath("rv0").write_text("".join(MockArquivos) + "\n")
+    assert c.deck(str(case_dir)) is None
+
+
+def test_catalog_file_fingerprints(case_dir, monkeypatch):
+    c = CaseCatalog()
+    hashes = []
+    file_hash = catalog.file_hash
+
+    def counting_hash(path: str) -> str:
+        hashes.append(path)
+        return file_hash(path)
+
+    monkeypatch.setattr(catalog, "file_hash", counting_hash)
+    case_dir.joinpath("dadger.rv0").write_text("a")
+    digest = c.record_file(str(case_dir), "dadger", "dadger.rv0")
+    assert c.record_file(str(case_dir), "dadger", "dadger.rv0") == digest
+    assert len(hashes) == 1
+    assert c.fingerprint(str(case_dir), "dadger") == digest
+    key = c.cache_key(str(case_dir))
+
+    case_dir.joinpath("dadger.rv0").write_text("bb")
+    assert c.fingerprint(str(case_dir), "dadger") is None
+    assert c.record_file(str(case_dir), "dadger", "dadger.rv0") != digest
+    assert c.cache_key(str(case_dir)) != key
+
+
+def test_repository_fills_catalog(case_dir, monkeypatch):
+    repo = factory("FS", str(case_dir))
+    assert isinstance(repo.get_hidr(), Hidr)
+    entry = CaseCatalog().case(str(case_dir))
+    assert entry is not None
+    assert entry["program"] == "DECOMP"
+    assert entry["revision"] == "rv0"
+    assert entry["deck"]["dadger"] == "dadger.py"
+    assert entry["files"]["hidr"]["parsed_at"] is not None
+    CaseCatalog().mark_chained(str(case_dir), "VARM")
+    assert CaseCatalog().case(str(case_dir))["chained_variable"] == "VARM"
+
+    # A new repository takes the deck names from the catalog
+    def fail(*args, **kwargs):
+        raise AssertionError("arquivos parsed again")
+
+    monkeypatch.setattr(Arquivos, "read", fail)
+    repo = factory("FS", str(case_dir))
+    assert isinstance(repo.get_hidr(), Hidr)
+
+
+def test_catalog_uses_wal(case_dir):
+    CaseCatalog().deck(str(case_dir))
+    (mode,) = CaseCatalog()._conn.execute("PRAGMA journal_mode").fetchone()
+    assert mode == "wal"
+
+
+def test_repository_reads_without_catalog(case_dir, monkeypatch):
+    # A damaged catalog must not make the reads fail
+    broken = case_dir.parent.joinpath("broken.db")
+    broken.write_bytes(b"not a database" * 100)
+    monkeypatch.setattr(Settings, "catalog_path", str(broken))
+    repo = factory("FS", str(case_dir))
+    assert isinstance(repo.get_hidr(), Hidr)
+    assert CaseCatalog().case(str(case_dir)) is None
+
+
+def test_catalog_study_of_removed_case(case_dir):
+    os.remove(case_dir.joinpath("caso.dat"))
+    CaseCatalog().record_study(str(case_dir), "DECOMP", 2023, 11, 0)
+    assert CaseCatalog().study(str(case_dir)) is None
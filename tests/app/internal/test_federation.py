@@ -0,0 +1,134 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import base62  # type: ignore
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.internal.federation import Federation
+from app.internal.settings import Settings
+from app.models.chainingcase import ChainingCase
+from app.models.chainingrequest import ChainingRequest
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.routers import chain
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _encode(path) -> str:
+    return base62.encodebytes(str(path).encode("utf-8"))
+
+
+@pytest.fixture
+def federation():
+    yield Federation()
+    Federation().configure({}, {})
+    Federation().close()
+
+
+def test_federation_owner(federation, monkeypatch):
+    monkeypatch.setattr(Settings, "clusterId", "1")
+    federation.configure(
+        {"1": "http://a", "2": "http://b"},
+        {"/casos": "1", "/casos/pmo": "2"},
+    )
+    assert federation.owner("/casos/cenario/rv0") == "1"
+    assert federation.owner("/casos/pmo/rv0") == "2"
+    assert federation.owner("/casos/pmo") == "2"
+    assert federation.owner("/casos/pmo2") == "1"
+    assert federation.owner("/outros") is None
+    assert federation.remote("/casos/cenario") is None
+    assert federation.remote("/casos/pmo/rv1") == "http://b"
+    assert federation.remote("/outros") is None
+    with pytest.raises(ValueError):
+        federation.configure({"1": "http://a"}, {"/casos": "3"})
+
+
+@pytest.fixture
+def remote_instance():
+    port = _free_port()
+    env = {
+        **os.environ,
+        "CLUSTER_ID": "2",
+        "NEWAVE_SOURCE": "TEST",
+        "DECOMP_SOURCE": "TEST",
+        "CATALOG_PATH": ":memory:",
+        "FEDERATION_FILE": "",
+        "ROOT_PATH": "",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    else:
+        process.kill()
+        pytest.skip("remote instance did not start")
+    yield url
+    process.terminate()
+    process.wait(timeout=10)
+
+
+def test_chain_federation(federation, remote_instance, monkeypatch, tmp_path):
+    monkeypatch.setattr(Settings, "clusterId", "1")
+    local = tmp_path.joinpath("cluster1", "caso")
+    remote = tmp_path.joinpath("cluster2", "caso")
+    local.mkdir(parents=True)
+    remote.mkdir(parents=True)
+    federation.configure(
+        {"1": "http://127.0.0.1:1", "2": remote_instance},
+        {
+            str(tmp_path.joinpath("cluster1")): "1",
+            str(tmp_path.joinpath("cluster2")): "2",
+        },
+    )
+    app = FastAPI()
+    app.include_router(chain.router)
+    client = TestClient(app)
+    forwarded = federation.forwarded
+    for path, served_by in [(remote, "2"), (local, "1")]:
+        req = ChainingRequest(
+            sources=[ChainingCase(id="k", program=Program.DECOMP)],
+            destination=ChainingCase(
+                id=_encode(path), program=Program.NEWAVE
+            ),
+            variable=ChainingVariable.VARM,
+        )
+        response = client.post(
+            "/chain/",
+            content=req.model_dump_json(),
+            headers={"X-Request-ID": "federado"},
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["X-Served-By"] == served_by
+        assert response.headers["X-Request-ID"] == "federado"
+        assert len(response.json()["result"]) > 0
+    assert federation.forwarded == forwarded + 1
+    assert federation.stats()["routing_seconds"] > 0
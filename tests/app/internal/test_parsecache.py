@@ -0,0 +1,129 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.internal.parsecache import ParseCache, parse
+from app.internal.settings import Settings
+from app.models.chainingvariable import ChainingVariable
+from app.services.warmup import WarmupService
+
+DIR_TESTE = "./tests/mocks/arquivos/decomp/"
+
+
+def test_parse_cache_hit_and_invalidation(tmp_path):
+    cache = ParseCache()
+    arq = tmp_path / "arquivo.txt"
+    arq.write_text("a")
+    reads = []
+
+    def reader(p: str) -> str:
+        reads.append(p)
+        with open(p) as f:
+            return f.read()
+
+    assert cache.get_or_read(str(arq), reader) == "a"
+    assert cache.get_or_read(str(arq), reader) == "a"
+    assert len(reads) == 1
+
+    arq.write_text("bb")
+    assert cache.get_or_read(str(arq), reader) == "bb"
+    assert len(reads) == 2
+
+    os.remove(arq)
+    assert cache.get(str(arq)) is None
+
+
+def test_parse_cache_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "parse_cache_size", 1)
+    cache = ParseCache()
+    for n in ["a", "b"]:
+        (tmp_path / n).write_text(n)
+        cache.get_or_read(str(tmp_path / n), lambda p: n)
+    assert cache.get(str(tmp_path / "a")) is None
+    assert cache.get(str(tmp_path / "b")) == "b"
+
+
+def test_parse_cache_change_while_parsing(tmp_path):
+    cache = ParseCache()
+    arq = tmp_path / "relato.rv0"
+    arq.write_text("a")
+
+    def changing_reader(p: str) -> str:
+        with open(p) as f:
+            content = f.read()
+        # The watcher sees the change before the parse is stored
+        arq.write_text("bb")
+        cache.invalidate(p)
+        return content
+
+    cache.trust([str(tmp_path)])
+    try:
+        assert cache.get_or_read(str(arq), changing_reader) == "a"
+        assert cache.get(str(arq)) is None
+    finally:
+        cache.trust([])
+
+
+def test_warmup_fills_parse_cache(monkeypatch):
+    monkeypatch.setattr(Settings, "decomp_source", "FS")
+    job = WarmupService().submit([DIR_TESTE], [ChainingVariable.VARM])
+    WarmupService().shutdown(wait=True)
+    assert job.status().done == 1
+    cached = ParseCache().get(os.path.join(DIR_TESTE, "relato.rv0"))
+    assert cached is not None
+
+
+def test_parse_cache_write_through(tmp_path):
+    cache = ParseCache()
+    arq = tmp_path / "dadger.rv1"
+    arq.write_text("escrito")
+    escrito = {"valores": [1, 2]}
+    cache.write_through(str(arq), escrito)
+    lido = cache.get_written(str(arq))
+    assert lido == escrito
+    assert lido is not escrito
+    lido["valores"].append(3)
+    assert cache.get_written(str(arq)) == escrito
+
+    # Written files are checked even in trusted directories
+    cache.trust([str(tmp_path)])
+    try:
+        arq.write_text("alterado")
+        assert cache.get_written(str(arq)) is None
+    finally:
+        cache.trust([])
+
+    cache.write_through(str(tmp_path / "inexistente"), escrito)
+    assert cache.get_written(str(tmp_path / "inexistente")) is None
+
+
+def _concurrent_reads(read, n: int = 16) -> list:
+    barrier = threading.Barrier(n)
+
+    def one(_):
+        barrier.wait()
+        return read()
+
+    with ThreadPoolExecutor(n) as executor:
+        return list(executor.map(one, range(n)))
+
+
+def test_parse_serializes_register_files(tmp_path):
+    from idecomp.decomp.hidr import Hidr
+
+    with open(os.path.join(DIR_TESTE, "hidr.dat"), "rb") as f:
+        content = f.read()
+    expected = Hidr.read(content).cadastro
+    # The parsers share the fields being read between threads
+    unlocked = _concurrent_reads(lambda: Hidr.read(content).cadastro)
+    assert not all(c.equals(expected) for c in unlocked)
+    locked = _concurrent_reads(lambda: parse(Hidr, content).cadastro)
+    assert all(c.equals(expected) for c in locked)
+    # The cache readers that are parsers are serialized the same way
+    arq = tmp_path / "hidr.dat"
+    arq.write_bytes(content)
+    cache = ParseCache()
+    cached = _concurrent_reads(
+        lambda: cache.get_or_read(str(arq), Hidr.read).cadastro
+    )
+    assert all(c.equals(expected) for c in cached)
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+from app.internal.plantmapping import PlantMapping, month_ordinal
+from app.models.program import Program
+
+
+@pytest.fixture
+def mapping():
+    m = PlantMapping()
+    m.load()
+    yield m
+    m.load()
+
+
+def test_default_rules_newave(mapping):
+    destination = np.array([318, 291, 251, 34, 43, 6, 999])
+    source = np.array([6, 122, 251, 44])
+    values = np.array([10.0, 20.0, 80.0, 30.0])
+    codes, origin, result = mapping.resolve(
+        Program.NEWAVE, destination, source, values
+    )
+    assert codes.tolist() == [318, 291, 251, 34, 43, 6]
+    assert origin.tolist() == [122, 251, 251, 44, 44, 6]
+    # Serra da Mesa fictícia is scaled and clipped to 100 %
+    assert result.tolist() == pytest.approx(
+        [20.0, 100.0, 80.0, 30.0, 30.0, 10.0]
+    )
+
+
+def test_split_only_when_separated(mapping):
+    # The destination still has the equivalent plant
+    codes, _, _ = mapping.resolve(
+        Program.DECOMP,
+        np.array([34, 43, 44]),
+        np.array([44]),
+        np.array([50.0]),
+    )
+    assert codes.tolist() == [44]
+
+
+def test_rules_by_month(tmp_path, mapping):
+    rules = {
+        "versao": "teste",
+        "regras": [
+            {
+                "tipo": "remapeamento",
+                "programas": ["DECOMP"],
+                "destino": 1,
+                "origem": 2,
+                "fim": "2023-12",
+            },
+            {
+                "tipo": "remapeamento",
+                "programas": ["DECOMP"],
+                "destino": 1,
+                "origem": 3,
+                "inicio": "2024-01",
+            },
+        ],
+    }
+    path = tmp_path.joinpath("regras.json")
+    path.write_text(json.dumps(rules))
+    mapping.load(str(path))
+    assert mapping.version == "teste"
+    args = (Program.DECOMP, np.array([1]), np.array([2, 3]), [5.0, 7.0])
+    _, _, before = mapping.resolve(*args, month_ordinal(2023, 11))
+    _, _, after = mapping.resolve(*args, month_ordinal(2024, 2))
+    assert before.tolist() == [5.0]
+    assert after.tolist() == [7.0]
+
+
+def test_invalid_rule(tmp_path, mapping):
+    path = tmp_path.joinpath("regras.json")
+    path.write_text(json.dumps({"regras": [{"tipo": "outro"}]}))
+    with pytest.raises(ValueError):
+        mapping.load(str(path))
@@ -0,0 +1,70 @@
+import pytest
+from app.internal.catalog import CaseCatalog
+from app.internal.httpresponse import HTTPResponse
+from app.internal.resultcache import ResultCache
+from app.internal.settings import Settings
+from app.models.chainingresult import ChainingResult
+
+READS = (["relato"], ["dadger"])
+
+
+@pytest.fixture
+def cases(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(tmp_path.joinpath("catalog.db"))
+    )
+    source = tmp_path.joinpath("origem")
+    destination = tmp_path.joinpath("destino")
+    for case, kind, name in [
+        (source, "relato", "relato.rv0"),
+        (destination, "dadger", "dadger.rv1"),
+    ]:
+        case.mkdir()
+        case.joinpath(name).write_text(kind)
+        CaseCatalog().record_file(str(case), kind, name)
+    ResultCache().clear()
+    yield str(source), str(destination)
+    ResultCache().clear()
+    CaseCatalog().close()
+
+
+def test_result_cache_fingerprint(cases, tmp_path):
+    source, destination = cases
+    fingerprint = ResultCache.fingerprint("VARM", [source], destination, READS)
+    assert fingerprint is not None
+    assert (
+        ResultCache.fingerprint("VARM", [source], destination, READS)
+        == fingerprint
+    )
+    assert (
+        ResultCache.fingerprint("TVIAGEM", [source], destination, READS)
+        != fingerprint
+    )
+    result = [ChainingResult(id="FURNAS", value=50.0)]
+    ResultCache().put(fingerprint, result)
+    assert ResultCache().get(fingerprint) == result
+    # A changed destination file is not trusted until recorded again
+    tmp_path.joinpath("destino", "dadger.rv1").write_text("alterado")
+    assert (
+        ResultCache.fingerprint("VARM", [source], destination, READS) is None
+    )
+    CaseCatalog().record_file(destination, "dadger", "dadger.rv1")
+    assert (
+        ResultCache.fingerprint("VARM", [source], destination, READS)
+        != fingerprint
+    )
+
+
+def test_result_cache_unknown_files(cases):
+    source, destination = cases
+    reads = (["relato", "dadger"], ["dadger"])
+    fingerprint = ResultCache.fingerprint("VARM", [source], destination, reads)
+    assert fingerprint is None
+
+
+def test_result_cache_idempotency_key(cases):
+    result = [ChainingResult(id="FURNAS", value=50.0)]
+    assert ResultCache().replay("chave", "a") is None
+    ResultCache().remember("chave", "a", result)
+    assert ResultCache().replay("chave", "a") == result
+    assert isinstance(ResultCache().replay("chave", "b"), HTTPResponse)
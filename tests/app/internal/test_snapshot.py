@@ -0,0 +1,45 @@
+import os
+
+from app.internal.fs import clone_file
+from app.internal.snapshot import FileSnapshot
+
+
+def test_clone_file(tmp_path):
+    source = tmp_path / "dadger.rv0"
+    source.write_text("UH  1")
+    os.utime(source, ns=(1_000_000_000, 1_000_000_000))
+    clone_file(str(source), str(tmp_path / "copia"))
+    assert (tmp_path / "copia").read_text() == "UH  1"
+    assert os.stat(tmp_path / "copia").st_mtime_ns == 1_000_000_000
+
+
+def test_snapshot_restore(tmp_path):
+    dadger = tmp_path / "dadger.rv0"
+    dadger.write_text("original")
+    mtime = os.stat(dadger).st_mtime_ns
+    novo = tmp_path / "novo.rv0"
+    snapshot = FileSnapshot()
+    snapshot.protect(str(dadger))
+    dadger.write_text("alterado")
+    # Only the first write of a file is copied
+    snapshot.protect(str(dadger))
+    dadger.write_text("alterado de novo")
+    snapshot.protect(str(novo))
+    novo.write_text("criado")
+    snapshot.restore()
+    assert dadger.read_text() == "original"
+    assert os.stat(dadger).st_mtime_ns == mtime
+    assert not novo.exists()
+    assert sorted(os.listdir(tmp_path)) == ["dadger.rv0"]
+
+
+def test_snapshot_commit(tmp_path):
+    dadger = tmp_path / "dadger.rv0"
+    dadger.write_text("original")
+    snapshot = FileSnapshot()
+    snapshot.protect(str(dadger))
+    dadger.write_text("alterado")
+    snapshot.commit()
+    snapshot.restore()
+    assert dadger.read_text() == "alterado"
+    assert os.listdir(tmp_path) == ["dadger.rv0"]
@@ -0,0 +1,48 @@
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import cache
+from app.models.chainingvariable import ChainingVariable
+from app.models.cachewarmrequest import CacheWarmRequest
+
+app = FastAPI()
+app.include_router(cache.router)
+client = TestClient(app)
+
+
+def _wait_job(job_id: str, timeout: float = 10.0) -> dict:
+    t0 = time.time()
+    while True:
+        response = client.get(f"/cache/warm/{job_id}")
+        assert response.status_code == 200
+        status = response.json()
+        if status["finished"] or time.time() - t0 > timeout:
+            return status
+        time.sleep(0.05)
+
+
+def test_cache_warm_progress():
+    # . encoded
+    req = CacheWarmRequest(
+        ids=["k", "k"], variables=[ChainingVariable.VARM]
+    )
+    response = client.post("/cache/warm", content=req.model_dump_json())
+    assert response.status_code == 202
+    status = _wait_job(response.json()["id"])
+    assert status["finished"]
+    assert status["total"] == 2
+    assert status["done"] == 2
+    assert status["failed"] == 0
+
+
+def test_cache_warm_invalid_id():
+    req = CacheWarmRequest(
+        ids=["/home/teste??+="], variables=[ChainingVariable.VARM]
+    )
+    response = client.post("/cache/warm", content=req.model_dump_json())
+    assert response.status_code == 400
+
+
+def test_cache_warm_unknown_job():
+    response = client.get("/cache/warm/unknown")
+    assert response.status_code == 404
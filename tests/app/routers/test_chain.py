@@ -1,12 +1,31 @@
+import os
+import shutil
+
+import base62  # type: ignore
+import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from app.internal.resultcache import ResultCache
+from app.internal.settings import Settings
 from app.routers import chain
 from app.models.program import Program
 from app.models.chainingcase import ChainingCase
 from app.models.chainingvariable import ChainingVariable
 from app.models.chainingrequest import ChainingRequest
+from app.models.clonerequest import CloneRequest
+from app.models.fanoutrequest import FanOutRequest
+from app.adapters.chainingrepository import AbstractChainingRepository
 from inewave.newave import Confhd
 from idecomp.decomp import Relato
+from tests.mocks.arquivos.decomp.arquivos import (
+    MockArquivos as MockArquivosDecomp,
+)
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.newave.arquivos import (
+    MockArquivos as MockArquivosNewave,
+)
 from tests.mocks.arquivos.newave.confhd import MockConfhd
+from tests.mocks.arquivos.newave.dger import MockDger
 from tests.mocks.arquivos.decomp.relato import MockRelato
 
 client = TestClient(chain.router)
@@ -90,3 +109,197 @@ def test_chain_decomp_decomp_tviagem():
             ].iloc[0]
             == chain_res["value"]
         )
+
+
+@pytest.mark.parametrize(
+    "destination_program,variable",
+    [
+        (Program.NEWAVE, ChainingVariable.VARM),
+        (Program.DECOMP, ChainingVariable.VARM),
+        (Program.DECOMP, ChainingVariable.TVIAGEM),
+    ],
+)
+def test_chain_low_memory(monkeypatch, destination_program, variable):
+    req = ChainingRequest(
+        sources=[ChainingCase(id="k", program=Program.DECOMP)],
+        destination=ChainingCase(id="k", program=destination_program),
+        variable=variable,
+    )
+    response = client.post("/chain/", content=req.model_dump_json())
+    assert response.status_code == 200
+    monkeypatch.setattr(Settings, "low_memory", True)
+    low_memory = client.post("/chain/", content=req.model_dump_json())
+    assert low_memory.status_code == 200
+    assert low_memory.json()["result"] == response.json()["result"]
+
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_chain_fanout(monkeypatch, low_memory):
+    monkeypatch.setattr(Settings, "low_memory", low_memory)
+    monkeypatch.setattr(Settings, "fanout_concurrency", 2)
+    reads = []
+    read_file = AbstractChainingRepository.read_file
+
+    async def counted(uow, name, tables=None):
+        reads.append(name)
+        return await read_file(uow, name, tables)
+
+    monkeypatch.setattr(
+        AbstractChainingRepository, "read_file", staticmethod(counted)
+    )
+    destinations = [
+        ChainingCase(id="k", program=Program.DECOMP),
+        ChainingCase(id="!", program=Program.DECOMP),
+        ChainingCase(id="k", program=Program.DECOMP),
+    ]
+    req = FanOutRequest(
+        sources=[ChainingCase(id="k", program=Program.DECOMP)],
+        destinations=destinations,
+        variable=ChainingVariable.VARM,
+    )
+    response = client.post("/chain/fanout", content=req.model_dump_json())
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["code"] for r in results] == [200, 400, 200]
+    assert results[0]["result"] == results[2]["result"]
+    assert len(results[0]["result"]) > 0
+    # The source relato is read once, the destination files once each
+    assert reads.count("relato") == 1
+    assert reads.count("dadger") == 2
+
+
+def test_chain_fanout_mixed_programs():
+    req = FanOutRequest(
+        sources=[ChainingCase(id="k", program=Program.DECOMP)],
+        destinations=[
+            ChainingCase(id="k", program=Program.DECOMP),
+            ChainingCase(id="k", program=Program.NEWAVE),
+        ],
+        variable=ChainingVariable.VARM,
+    )
+    app = FastAPI()
+    app.include_router(chain.router)
+    response = TestClient(app).post(
+        "/chain/fanout", content=req.model_dump_json()
+    )
+    assert response.status_code == 422
+
+
+def test_chain_idempotency_key(monkeypatch):
+    ResultCache().clear()
+    calls = []
+    original = AbstractChainingRepository.chain
+
+    async def counted(self, *args, **kwargs):
+        calls.append(args[0])
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(AbstractChainingRepository, "chain", counted)
+    req = ChainingRequest(
+        sources=[ChainingCase(id="k", program=Program.DECOMP)],
+        destination=ChainingCase(id="k", program=Program.DECOMP),
+        variable=ChainingVariable.VARM,
+    )
+    headers = {"Idempotency-Key": "tentativa-1"}
+    first = client.post(
+        "/chain/", content=req.model_dump_json(), headers=headers
+    )
+    assert first.headers[chain.CACHE_HEADER] == "MISS"
+    again = client.post(
+        "/chain/", content=req.model_dump_json(), headers=headers
+    )
+    assert again.status_code == 200
+    assert again.headers[chain.CACHE_HEADER] == "HIT"
+    assert again.json() == first.json()
+    assert len(calls) == 1
+    # The same key with another request is refused
+    req.variable = ChainingVariable.TVIAGEM
+    app = FastAPI()
+    app.include_router(chain.router)
+    other = TestClient(app).post(
+        "/chain/", content=req.model_dump_json(), headers=headers
+    )
+    assert other.status_code == 422
+    ResultCache().clear()
+
+
+def test_chain_clone(tmp_path):
+    case = tmp_path.joinpath("original")
+    case.mkdir()
+    case.joinpath("caso.dat").write_text("rv0\n")
+    case.joinpath("rv0").write_text("dadger.rv0\nhidr.dat\n")
+    case.joinpath("dadger.rv0").write_text("dadger")
+    case.joinpath("hidr.dat").write_bytes(b"\x00" * 1024)
+    clone = tmp_path.joinpath("copia")
+    req = CloneRequest(
+        sources=[ChainingCase(id="k", program=Program.DECOMP)],
+        case=ChainingCase(
+            id=base62.encodebytes(str(case).encode("utf-8")),
+            program=Program.DECOMP,
+        ),
+        destination=base62.encodebytes(str(clone).encode("utf-8")),
+        variable=ChainingVariable.VARM,
+    )
+    app = FastAPI()
+    app.include_router(chain.router)
+    client = TestClient(app)
+    response = client.post("/chain/clone", content=req.model_dump_json())
+    assert response.status_code == 200
+    res_json = response.json()
+    assert res_json["copied"] == 1
+    assert res_json["linked"] == 3
+    assert len(res_json["result"]) > 0
+    assert os.path.samefile(case / "hidr.dat", clone / "hidr.dat")
+    assert not os.path.samefile(case / "dadger.rv0", clone / "dadger.rv0")
+    again = client.post("/chain/clone", content=req.model_dump_json())
+    assert again.status_code == 409
+
+
+def test_chain_newave_varm_cache(monkeypatch, tmp_path):
+    async def no_conversion(path: str, script: str):
+        pass
+
+    monkeypatch.setattr(
+        "app.adapters.newaverepository.converte_codificacao", no_conversion
+    )
+    monkeypatch.setattr(Settings, "decomp_source", "FS")
+    monkeypatch.setattr(Settings, "newave_source", "FS")
+    ResultCache().clear()
+    decomp_dir = os.path.join("tests", "mocks", "arquivos", "decomp")
+    newave_dir = os.path.join("tests", "mocks", "arquivos", "newave")
+    source = tmp_path.joinpath("dc")
+    source.mkdir()
+    source.joinpath("caso.dat").write_text("rv0")
+    source.joinpath("rv0").write_text("".join(MockArquivosDecomp))
+    source.joinpath("dadger.py").write_text("".join(MockDadger))
+    shutil.copy(os.path.join(decomp_dir, "relato.rv0"), source)
+    destination = tmp_path.joinpath("nw")
+    destination.mkdir()
+    destination.joinpath("caso.dat").write_text("arquivos.dat")
+    destination.joinpath("arquivos.dat").write_text(
+        "".join(MockArquivosNewave)
+    )
+    destination.joinpath("dger.py").write_text("".join(MockDger))
+    destination.joinpath("confhd.py").write_text("".join(MockConfhd))
+    shutil.copy(os.path.join(newave_dir, "hidr.dat"), destination)
+    req = ChainingRequest(
+        sources=[
+            ChainingCase(
+                id=base62.encodebytes(str(source).encode("utf-8")),
+                program=Program.DECOMP,
+            )
+        ],
+        destination=ChainingCase(
+            id=base62.encodebytes(str(destination).encode("utf-8")),
+            program=Program.NEWAVE,
+        ),
+        variable=ChainingVariable.VARM,
+    )
+    first = client.post("/chain/", content=req.model_dump_json())
+    assert first.status_code == 200, first.text
+    assert first.headers[chain.CACHE_HEADER] == "MISS"
+    again = client.post("/chain/", content=req.model_dump_json())
+    assert again.status_code == 200
+    assert again.headers[chain.CACHE_HEADER] == "HIT"
+    assert again.json() == first.json()
+    ResultCache().clear()
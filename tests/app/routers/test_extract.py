@@ -0,0 +1,84 @@
+import asyncio
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from idecomp.decomp.relgnl import Relgnl
+from app.adapters.chainingrepository import (
+    DECOMPChainingRepository,
+    gnl_dispatch,
+)
+from app.internal.settings import Settings
+from app.models.chainingvariable import ChainingVariable
+from app.routers import extract
+from app.services.extraction import ExtractionService
+from app.services.unitofwork import DecompUnitOfWork
+
+app = FastAPI()
+app.include_router(extract.router)
+client = TestClient(app)
+
+DIR_TESTE = "./tests/mocks/arquivos/decomp/"
+
+
+def test_extract_arrow():
+    req = {"ids": ["k"], "variables": ["VARM", "TVIAGEM", "GNL"]}
+    response = client.post("/extract/", json=req)
+    assert response.status_code == 200
+    # The test repository has no relgnl
+    assert response.headers[extract.ERRORS_HEADER] == "1"
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.column_names == [
+        "case",
+        "plant",
+        "variable",
+        "value",
+        "block",
+    ]
+    df = table.to_pandas()
+    # The same storages that the rule writes into the next revision
+    chained = asyncio.run(
+        DECOMPChainingRepository().chain_varm(
+            [DecompUnitOfWork("k")], DecompUnitOfWork("k")
+        )
+    )
+    assert isinstance(chained, list)
+    varm = df.loc[df["variable"] == "VARM"]
+    values = dict(zip(varm["plant"], varm["value"]))
+    # The test dadger has only some of the plants of the relato
+    for r in chained:
+        assert values[r.id.strip()] == pytest.approx(r.value)
+    assert set(df["variable"]) == {"VARM", "TVIAGEM"}
+    assert set(df["case"]) == {"k"}
+
+
+def test_extract_parquet():
+    req = {"ids": ["k"], "variables": ["VARM"], "format": "PARQUET"}
+    response = client.post("/extract/", json=req)
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows > 0
+
+
+def test_extract_unsupported_variable():
+    req = {"ids": ["k"], "variables": ["ENA"]}
+    response = client.post("/extract/", json=req)
+    assert response.status_code == 422
+
+
+def test_extract_gnl_from_relgnl(monkeypatch):
+    monkeypatch.setattr(Settings, "decomp_source", "FS")
+    tables, errors = ExtractionService.extract_case(
+        "caso", DIR_TESTE, [ChainingVariable.GNL]
+    )
+    assert errors == 0
+    df = tables[0].to_pandas()
+    op = Relgnl.read(DIR_TESTE + "relgnl.rv0").relatorio_operacao_termica
+    for plant, rows in df.groupby("plant"):
+        assert rows["block"].tolist() == [1, 2, 3]
+        # The dispatches of the last week, as the rule writes them
+        expected = gnl_dispatch(op, plant, "02/03/2024")[0]
+        assert rows["value"].tolist() == expected.tolist()
@@ -0,0 +1,35 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.internal.settings import Settings
+from app.models.chainingcase import ChainingCase
+from app.models.chainingrequest import ChainingRequest
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.routers import chain, metrics
+
+app = FastAPI()
+app.include_router(chain.router)
+app.include_router(metrics.router)
+client = TestClient(app)
+
+
+def test_chain_shed_when_over_memory(monkeypatch):
+    monkeypatch.setattr(Settings, "chain_rss_watermark", 1)
+    # . encoded
+    case = ChainingCase(id="k", program=Program.DECOMP)
+    req = ChainingRequest(
+        sources=[case], destination=case, variable=ChainingVariable.VARM
+    )
+    response = client.post("/chain/", content=req.model_dump_json())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(Settings.chain_retry_after)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    values = dict(
+        line.split(" ") for line in response.text.strip().split("\n")
+    )
+    assert int(values["encadeador_admission_rejected_memory"]) >= 1
+    assert "encadeador_admission_queued" in values
+    assert "encadeador_subprocess_spawns" in values
+    assert "encadeador_parse_cache_hits" in values
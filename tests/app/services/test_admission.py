@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from app.internal.settings import Settings
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(Settings, "chain_concurrency", 1)
+    monkeypatch.setattr(Settings, "chain_queue_size", 1)
+    monkeypatch.setattr(Settings, "chain_queue_timeout", 0.2)
+    monkeypatch.setattr(Settings, "chain_rss_watermark", 0)
+
+
+async def _hold(controller: AdmissionController, delay: float):
+    async with controller.admit():
+        await asyncio.sleep(delay)
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_full(limits):
+    controller = AdmissionController()
+    rejected = controller.stats()["rejected_queue"]
+    running = asyncio.create_task(_hold(controller, 0.1))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(_hold(controller, 0))
+    await asyncio.sleep(0.01)
+    assert controller.stats()["queued"] == 1
+    with pytest.raises(AdmissionRejected) as e:
+        await _hold(controller, 0)
+    assert e.value.reason == "queue"
+    await asyncio.gather(running, queued)
+    assert controller.stats()["rejected_queue"] == rejected + 1
+    assert controller.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_timeout(limits):
+    controller = AdmissionController()
+    running = asyncio.create_task(_hold(controller, 0.5))
+    await asyncio.sleep(0.01)
+    with pytest.raises(AdmissionRejected) as e:
+        await _hold(controller, 0)
+    assert e.value.reason == "timeout"
+    await running
+    assert controller.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_memory_watermark(limits, monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setattr(Settings, "chain_rss_watermark", 1)
+    with pytest.raises(AdmissionRejected) as e:
+        await _hold(controller, 0)
+    assert e.value.reason == "memory"
+    monkeypatch.setattr(Settings, "chain_rss_watermark", 1024 * 1024)
+    await _hold(controller, 0)
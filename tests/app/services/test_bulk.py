@@ -0,0 +1,143 @@
+import json
+import os
+
+import pandas as pd
+from app.internal.catalog import CaseCatalog
+from app.internal.settings import Settings
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.bulk import (
+    BulkChaining,
+    ManifestStep,
+    read_manifest,
+    schedule,
+    summary,
+    write_results,
+)
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+
+
+def _step(i: int, sources, destination) -> ManifestStep:
+    return ManifestStep(
+        step=i,
+        sources=sources,
+        destination=destination,
+        program=Program.DECOMP,
+        variable=ChainingVariable.VARM,
+        source_cases=[(Program.DECOMP, p) for p in sources],
+        destination_path=destination,
+    )
+
+
+def test_bulk_schedule():
+    steps = [
+        _step(0, ["/a"], "/b"),
+        _step(1, ["/b"], "/c"),
+        _step(2, ["/x"], "/y"),
+        _step(3, ["/x"], "/a"),
+        _step(4, ["/c"], "/d"),
+    ]
+    waves = [[s.step for s in w] for w in schedule(steps)]
+    # Writing /a waits for the step that reads it
+    assert waves == [[0, 2], [1, 3], [4]]
+
+
+def test_bulk_manifest(tmp_path):
+    manifest = tmp_path.joinpath("manifesto.csv")
+    manifest.write_text(
+        "sources,destination,program,variable,source_program\n"
+        + "k,k,DECOMP,VARM,\n"
+        + "k;k,k,decomp,tviagem,decomp\n"
+        + "k,k,NEWAVE,VARM,newave\n"
+        + ",k,NEWAVE,VARM,\n"
+    )
+    steps = read_manifest(str(manifest))
+    assert [s.sources for s in steps] == [["k"], ["k", "k"], ["k"], []]
+    assert [s.source_program for s in steps] == [
+        Program.DECOMP,
+        Program.DECOMP,
+        Program.NEWAVE,
+        Program.DECOMP,
+    ]
+    assert steps[1].variable == ChainingVariable.TVIAGEM
+    assert steps[2].program == Program.NEWAVE
+    other = tmp_path.joinpath("manifesto.json")
+    other.write_text(
+        json.dumps(
+            [
+                {
+                    "sources": ["k"],
+                    "destination": "k",
+                    "program": "DECOMP",
+                    "variable": "VARM",
+                }
+            ]
+        )
+    )
+    assert read_manifest(str(other))[0].sources == ["k"]
+
+
+def test_bulk_run(tmp_path):
+    for name in ["a", "b", "c"]:
+        tmp_path.joinpath(name).mkdir()
+    a, b, c = [str(tmp_path.joinpath(n)) for n in ["a", "b", "c"]]
+    steps = [
+        _step(0, [a], b),
+        _step(1, ["!"], c),
+        _step(2, [a], b),
+        _step(3, [c], a),
+    ]
+    for s in steps:
+        s.source_cases, s.destination_path = [], ""
+    steps[2].variable = ChainingVariable.TVIAGEM
+    rows = BulkChaining(processes=1).run(steps)
+    codes = {r["step"]: r["code"] for r in rows}
+    # The last step reads a case that was not chained
+    assert codes == {0: 200, 1: 404, 2: 200, 3: 424}
+    assert steps[0].source_cases == [(Program.DECOMP, a)]
+    stats = summary(rows, 1.0)
+    assert stats["encadeados"] == 2 and stats["falhas"] == 2
+    assert stats["valores"] == len(rows) - 2
+    output = tmp_path.joinpath("resultados.parquet")
+    write_results(rows, str(output))
+    df = pd.read_parquet(output)
+    assert len(df) == len(rows)
+    assert set(df.loc[df["step"] == 2, "plant"]) == {
+        r["plant"] for r in rows if r["step"] == 2
+    }
+
+
+def test_bulk_process_pool():
+    steps = [_step(i, ["k"], "k") for i in range(2)]
+    for s in steps:
+        s.source_cases, s.destination_path = [], ""
+    rows = BulkChaining(processes=2).run(steps)
+    assert {r["code"] for r in rows} == {200}
+    assert BulkChaining().processes == (os.cpu_count() or 1)
+
+
+def test_bulk_indexed_sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(tmp_path.joinpath("catalog.db"))
+    )
+    root = tmp_path.joinpath("casos")
+    cases = []
+    for revision, day, month in [(0, 28, 10), (1, 4, 11)]:
+        case = root.joinpath(f"rv{revision}")
+        case.mkdir(parents=True)
+        case.joinpath("caso.dat").write_text(f"rv{revision}")
+        case.joinpath(f"rv{revision}").write_text("".join(MockArquivos))
+        case.joinpath("dadger.py").write_text(
+            f"TE  TESTE\nDT  {day:2d}   {month:2d}   2023\n"
+        )
+        cases.append(str(case))
+    manifest = tmp_path.joinpath("manifesto.csv")
+    manifest.write_text(
+        "sources,destination,program,variable\n"
+        + f",{cases[1]},DECOMP,VARM\n"
+    )
+    steps = read_manifest(str(manifest))
+    rows = BulkChaining(processes=1, roots=[str(root)]).run(steps)
+    assert {r["code"] for r in rows} == {200}
+    assert {r["sources"] for r in rows} == {cases[0]}
+    CaseCatalog().close()
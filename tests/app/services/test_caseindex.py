@@ -0,0 +1,100 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.internal.catalog import CaseCatalog
+from app.internal.settings import Settings
+from app.models.program import Program
+from app.routers import chain
+from app.services.caseindex import CaseIndex
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos as MockArqDC
+from tests.mocks.arquivos.newave.arquivos import MockArquivos as MockArqNW
+from tests.mocks.arquivos.newave.dger import MockDger
+
+
+def _decomp(root, name, revision, day, month, year):
+    case = root.joinpath(name)
+    case.mkdir(parents=True)
+    case.joinpath("caso.dat").write_text(f"rv{revision}")
+    case.joinpath(f"rv{revision}").write_text("".join(MockArqDC))
+    case.joinpath("dadger.py").write_text(
+        f"TE  TESTE\nDT  {day:2d}   {month:2d}   {year:4d}\n"
+    )
+    return str(case)
+
+
+def _newave(root, name):
+    case = root.joinpath(name)
+    case.mkdir(parents=True)
+    case.joinpath("caso.dat").write_text("arquivos.dat")
+    case.joinpath("arquivos.dat").write_text("".join(MockArqNW))
+    case.joinpath("dger.py").write_text("".join(MockDger))
+    return str(case)
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(tmp_path.joinpath("catalog.db"))
+    )
+    root = tmp_path.joinpath("casos")
+    cases = {
+        "nov_rv0": _decomp(root, "2023_11/DC/rv0", 0, 28, 10, 2023),
+        "nov_rv1": _decomp(root, "2023_11/DC/rv1", 1, 4, 11, 2023),
+        "dec_rv0": _decomp(root, "2023_12/DC/rv0", 0, 25, 11, 2023),
+        "dec_nw": _newave(root, "2023_12/NW"),
+    }
+    assert CaseIndex().build([str(root)]) == 4
+    yield cases
+    CaseCatalog().close()
+
+
+def test_index_studies(tree):
+    index = CaseIndex()
+    assert index.study(tree["nov_rv0"]) == (Program.DECOMP, 2023, 11, 0)
+    assert index.study(tree["dec_rv0"]) == (Program.DECOMP, 2023, 12, 0)
+    assert index.study(tree["dec_nw"]) == (Program.NEWAVE, 2023, 12, 0)
+
+
+def test_resolve_sources(tree):
+    index = CaseIndex()
+    last_nov = [(Program.DECOMP, tree["nov_rv1"])]
+    assert index.resolve_sources(Program.NEWAVE, tree["dec_nw"]) == last_nov
+    assert index.resolve_sources(Program.DECOMP, tree["dec_rv0"]) == last_nov
+    assert index.resolve_sources(Program.DECOMP, tree["nov_rv1"]) == [
+        (Program.DECOMP, tree["nov_rv0"])
+    ]
+    # No cases in the month before
+    assert index.resolve_sources(Program.DECOMP, tree["nov_rv0"]) == []
+
+
+def test_chain_without_sources_not_indexed(tree):
+    app = FastAPI()
+    app.include_router(chain.router)
+    client = TestClient(app)
+    req = {
+        "destination": {"id": "k", "program": "DECOMP"},
+        "variable": "VARM",
+    }
+    response = client.post("/chain/", json=req)
+    assert response.status_code == 404
+
+
+def test_resolve_sources_revision_gap(tree, tmp_path):
+    # An rv1 without the rv0 of its month is not chained from the
+    # previous month
+    rv1 = _decomp(tmp_path.joinpath("casos"), "2024_01/DC/rv1", 1, 6, 1, 2024)
+    assert CaseIndex().resolve_sources(Program.DECOMP, rv1) == []
+
+
+def test_chain_without_sources_while_indexing(tree, monkeypatch):
+    monkeypatch.setattr(CaseIndex, "building", property(lambda self: True))
+    app = FastAPI()
+    app.include_router(chain.router)
+    client = TestClient(app)
+    req = {
+        "destination": {"id": "k", "program": "DECOMP"},
+        "variable": "VARM",
+    }
+    response = client.post("/chain/", json=req)
+    assert response.status_code == 404
+    assert "still being built" in response.json()["detail"]
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from app.internal.httpresponse import HTTPResponse
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.services.clone import clone_and_chain, clone_case, modified_files
+
+ARQUIVOS = [
+    "dadger.rv0",
+    "vazoes.rv0",
+    "hidr.dat",
+    "mlt.dat",
+    "perdas.dat",
+    "dadgnl.rv0",
+]
+
+
+@pytest.fixture
+def case(tmp_path):
+    path = tmp_path.joinpath("original")
+    path.mkdir()
+    path.joinpath("caso.dat").write_text("rv0\n")
+    path.joinpath("rv0").write_text("\n".join(ARQUIVOS) + "\n")
+    for name in ARQUIVOS:
+        path.joinpath(name).write_text(name)
+    path.joinpath("saidas").mkdir()
+    path.joinpath("saidas", "relato.rv0").write_text("relato")
+    return path
+
+
+def test_modified_files(case):
+    assert modified_files(
+        Program.DECOMP, str(case), [ChainingVariable.VARM]
+    ) == {"dadger.rv0"}
+    assert modified_files(
+        Program.DECOMP,
+        str(case),
+        [ChainingVariable.TVIAGEM, ChainingVariable.GNL],
+    ) == {"dadger.rv0", "dadgnl.rv0"}
+
+
+def test_clone_case(case, tmp_path):
+    clone = tmp_path.joinpath("copia")
+    files = clone_case(
+        Program.DECOMP, str(case), str(clone), [ChainingVariable.VARM]
+    )
+    assert files == {"linked": 8, "copied": 1}
+    assert clone.joinpath("dadger.rv0").read_text() == "dadger.rv0"
+    assert not os.path.samefile(
+        case.joinpath("dadger.rv0"), clone.joinpath("dadger.rv0")
+    )
+    relato = os.path.join("saidas", "relato.rv0")
+    for name in ["hidr.dat", "vazoes.rv0", relato]:
+        assert os.path.samefile(case.joinpath(name), clone.joinpath(name))
+    with pytest.raises(FileExistsError):
+        clone_case(
+            Program.DECOMP, str(case), str(clone), [ChainingVariable.VARM]
+        )
+
+
+@pytest.mark.asyncio
+async def test_clone_without_file_names(case, tmp_path):
+    case.joinpath("caso.dat").write_text("\n")
+    clone = tmp_path.joinpath("copia")
+    result = await clone_and_chain(
+        Program.DECOMP,
+        str(case),
+        str(clone),
+        ChainingVariable.VARM,
+        [(Program.DECOMP, str(case))],
+    )
+    assert isinstance(result, HTTPResponse) and result.code == 404
+    assert "caso.dat" in result.detail
+    assert not clone.exists()
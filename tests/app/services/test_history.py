@@ -0,0 +1,126 @@
+import io
+import os
+
+import pyarrow.parquet as pq
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.internal.settings import Settings
+from app.models.chainingresult import ChainingResult
+from app.routers import history
+from app.services.history import ChainHistory
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "history_dir", str(tmp_path))
+    monkeypatch.setattr(Settings, "history_flush_interval", 60.0)
+    h = ChainHistory()
+    yield h
+    h.shutdown()
+
+
+def _record(h: ChainHistory, variable: str, n: int):
+    h.record(
+        variable,
+        "/casos/destino",
+        "NEWAVE",
+        ["/casos/origem"],
+        [ChainingResult(id=str(i), value=float(i)) for i in range(n)],
+        0.5,
+        "req",
+    )
+
+
+def test_history_partitions(store, tmp_path):
+    _record(store, "VARM", 3)
+    _record(store, "GNL", 2)
+    store.shutdown()
+    months = os.listdir(tmp_path)
+    assert len(months) == 1 and months[0].startswith("month=")
+    variables = os.listdir(tmp_path.joinpath(months[0]))
+    assert set(variables) == {"variable=VARM", "variable=GNL"}
+    table = store.query(variable="VARM")
+    assert table.num_rows == 3
+    assert set(table.column("variable").to_pylist()) == {"VARM"}
+    assert table.column("elapsed_ms").to_pylist() == [500.0] * 3
+    assert store.query(variable="GNL").num_rows == 2
+    assert store.query(end="2000-01").num_rows == 0
+
+
+def test_history_route(store):
+    _record(store, "VARM", 4)
+    store.shutdown()
+    app = FastAPI()
+    app.include_router(history.router)
+    response = TestClient(app).get("/history/?variable=VARM")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("plant").to_pylist() == ["0", "1", "2", "3"]
+
+
+def test_history_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "history_dir", "")
+    _record(ChainHistory(), "VARM", 1)
+    assert ChainHistory().stats()["pending"] == 0
+
+
+def test_history_fingerprints_at_record(store, tmp_path_factory, monkeypatch):
+    from app.internal.catalog import CaseCatalog
+
+    cases = tmp_path_factory.mktemp("casos")
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(cases.joinpath("catalog.db"))
+    )
+    case = cases.joinpath("destino")
+    case.mkdir()
+    case.joinpath("confhd.dat").write_text("a")
+    catalog = CaseCatalog()
+    catalog.record_file(str(case), "confhd", "confhd.dat")
+    before = catalog.cache_key(str(case))
+    store.record("VARM", str(case), "NEWAVE", [], [], 0.1)
+    store.record(
+        "VARM",
+        str(case),
+        "NEWAVE",
+        [],
+        [ChainingResult(id="FURNAS", value=1.0)],
+        0.1,
+    )
+    # The case changes before the batch is written
+    case.joinpath("confhd.dat").write_text("bb")
+    catalog.record_file(str(case), "confhd", "confhd.dat")
+    assert catalog.cache_key(str(case)) != before
+    store.shutdown()
+    table = store.query(variable="VARM")
+    assert table.column("destination_fingerprint").to_pylist() == [before]
+    CaseCatalog().close()
+
+
+def test_history_study_month(store, tmp_path_factory, monkeypatch):
+    from app.internal.catalog import CaseCatalog
+    from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+
+    cases = tmp_path_factory.mktemp("casos")
+    monkeypatch.setattr(
+        Settings, "catalog_path", str(cases.joinpath("catalog.db"))
+    )
+    case = cases.joinpath("destino")
+    case.mkdir()
+    case.joinpath("caso.dat").write_text("rv0")
+    case.joinpath("rv0").write_text("".join(MockArquivos))
+    case.joinpath("dadger.py").write_text("TE  TESTE\nDT  25   11   2023\n")
+    store.record(
+        "VARM",
+        str(case),
+        "DECOMP",
+        [],
+        [ChainingResult(id="FURNAS", value=1.0)],
+        0.1,
+    )
+    _record(store, "VARM", 1)
+    store.shutdown()
+    # The study of the case starts in December, whenever it is chained
+    assert store.query(start="2023-12", end="2023-12").num_rows == 1
+    assert "month=2023-12" in os.listdir(store.root)
+    CaseCatalog().close()
@@ -0,0 +1,160 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from app.models.chainingvariable import ChainingVariable
+from app.services.validation import (
+    CaseSummary,
+    ValidationSweep,
+    compare_gnl,
+    compare_tviagem,
+    compare_varm,
+    summarize_case,
+)
+from tests.mocks.arquivos.decomp.arquivos import MockArquivos
+from tests.mocks.arquivos.decomp.dadger import MockDadger
+from tests.mocks.arquivos.decomp.dadgnl import MockDadgnl
+
+DIR_TESTE = "./tests/mocks/arquivos/decomp/"
+
+
+@pytest.fixture
+def cases(tmp_path):
+    paths = []
+    for name in ["rv0", "rv1"]:
+        case = tmp_path.joinpath(name)
+        case.mkdir()
+        case.joinpath("caso.dat").write_text("rv0")
+        case.joinpath("rv0").write_text("".join(MockArquivos))
+        case.joinpath("dadger.py").write_text("".join(MockDadger))
+        case.joinpath("dadgnl.py").write_text("".join(MockDadgnl))
+        for f in ["relato.rv0", "relgnl.rv0"]:
+            shutil.copy(os.path.join(DIR_TESTE, f), case)
+        paths.append(str(case))
+    return paths
+
+
+def test_validation_summary(cases):
+    s = summarize_case(cases[0])
+    assert s.errors == []
+    assert len(s.uh) == 165
+    assert set(s.vi["codigo_usina"]) == {156, 162}
+    assert len(s.gl) == 27
+    assert set(s.qdef["codigo_usina"]) == {156, 162}
+    assert len(s.volumes) > 0
+
+
+def _summary(path: str, **kwargs) -> CaseSummary:
+    return CaseSummary(path=path, **kwargs)
+
+
+def test_validation_compare_varm():
+    previous = _summary(
+        "rv0",
+        volumes=pd.DataFrame(
+            {"codigo_usina": [1, 2, 6], "estagio_1": [50.0, 60.0, 70.0]}
+        ),
+    )
+    current = _summary(
+        "rv1",
+        uh=pd.DataFrame(
+            {"codigo_usina": [1, 2, 6], "volume_inicial": [50.0, 61.0, 70.0]}
+        ),
+    )
+    sweep = ValidationSweep(processes=1)
+    tables = sweep.compare(previous, current)
+    mismatches = pd.concat(tables)
+    assert mismatches["plant"].tolist() == [2]
+    assert mismatches["variable"].tolist() == ["VARM"]
+    assert compare_varm(current, previous) is None
+
+
+def test_validation_compare_tviagem():
+    previous = _summary(
+        "rv0",
+        vi=pd.DataFrame(
+            {
+                "codigo_usina": [156] * 3,
+                "posicao": [0, 1, 2],
+                "vazao": [10.0, 20.0, 30.0],
+            }
+        ),
+        qdef=pd.DataFrame(
+            {"codigo_usina": [156], "vazao_defluente_m3s": [5.0]}
+        ),
+    )
+    current = _summary(
+        "rv1",
+        vi=pd.DataFrame(
+            {
+                "codigo_usina": [156] * 3,
+                "posicao": [0, 1, 2],
+                "vazao": [5.0, 10.0, 25.0],
+            }
+        ),
+    )
+    df = compare_tviagem(previous, current)
+    assert df["expected"].tolist() == [5.0, 10.0, 20.0]
+    sweep = ValidationSweep(
+        processes=1, variables=[ChainingVariable.TVIAGEM]
+    )
+    mismatches = pd.concat(sweep.compare(previous, current))
+    assert mismatches["field"].tolist() == ["vazao_3"]
+
+
+def test_validation_compare_gnl():
+    def gl(rows):
+        return pd.DataFrame(
+            rows,
+            columns=["codigo_usina", "data_inicio"]
+            + [f"geracao_{i}" for i in [1, 2, 3]],
+        )
+
+    previous = _summary(
+        "rv0",
+        gl=gl(
+            [
+                (86, "25112023", 1.0, 1.0, 1.0),
+                (86, "02122023", 2.0, 2.0, 2.0),
+            ]
+        ),
+        usinas_termicas=pd.DataFrame(
+            {"codigo_usina": [86], "nome_usina": ["SANTA CRUZ"]}
+        ),
+        operacao_termica=pd.DataFrame(
+            {
+                "nome_usina": ["SANTA CRUZ"],
+                "data_inicio_semana": ["09/12/2023"],
+                "geracao_patamar_1": [3.0],
+                "geracao_patamar_2": [3.0],
+                "geracao_patamar_3": [3.0],
+            }
+        ),
+    )
+    current = _summary(
+        "rv1",
+        gl=gl(
+            [
+                (86, "02122023", 2.0, 2.0, 2.0),
+                (86, "09122023", 3.0, 3.0, 4.0),
+                (15, "09122023", 9.0, 9.0, 9.0),
+            ]
+        ),
+    )
+    df = compare_gnl(previous, current)
+    assert len(df) == 6
+    assert set(df["plant"]) == {86}
+    sweep = ValidationSweep(processes=1, variables=[ChainingVariable.GNL])
+    mismatches = pd.concat(sweep.compare(previous, current))
+    assert mismatches["field"].tolist() == ["geracao_3_09122023"]
+    assert mismatches["expected"].tolist() == [3.0]
+
+
+def test_validation_sweep(cases):
+    mismatches, stats = ValidationSweep(processes=1).run(cases)
+    assert stats["casos"] == 2 and stats["pares"] == 1
+    assert stats["erros"] == 0
+    assert stats["divergencias"] == len(mismatches)
+    assert set(mismatches["case"]) == {cases[1]}
+    assert ((mismatches["expected"] - mismatches["found"]).abs() > 0.01).all()
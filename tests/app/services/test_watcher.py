@@ -0,0 +1,64 @@
+import os
+import shutil
+import time
+import pytest
+from app.internal.parsecache import ParseCache
+from app.internal.settings import Settings
+from app.services.watcher import CaseWatcher
+
+DIR_TESTE = "./tests/mocks/arquivos/decomp/"
+
+
+@pytest.fixture
+def caso(tmp_path, monkeypatch):
+    diretorio = tmp_path / "caso"
+    diretorio.mkdir()
+    for arq in ["caso.dat", "relato.rv0"]:
+        shutil.copy(os.path.join(DIR_TESTE, arq), diretorio / arq)
+    monkeypatch.setattr(Settings, "basedir", str(tmp_path))
+    monkeypatch.setattr(Settings, "watch_roots", "caso")
+    monkeypatch.setattr(Settings, "watch_mode", "POLL")
+    monkeypatch.setattr(Settings, "watch_interval", 0.05)
+    monkeypatch.setattr(Settings, "watch_preparse", True)
+    monkeypatch.setattr(Settings, "decomp_source", "FS")
+    yield diretorio
+    CaseWatcher().stop()
+
+
+def _wait(condition, timeout: float = 5.0) -> bool:
+    t0 = time.time()
+    while not condition():
+        if time.time() - t0 > timeout:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.mark.parametrize("mode", ["POLL", "INOTIFY"])
+def test_watcher_trusts_and_invalidates(caso, mode, monkeypatch):
+    monkeypatch.setattr(Settings, "watch_mode", mode)
+    relato = str(caso / "relato.rv0")
+    cache = ParseCache()
+    cache.put(relato, "antigo")
+    CaseWatcher().start()
+    assert CaseWatcher().running
+    assert cache.is_trusted(os.path.abspath(relato))
+
+    # Changes are seen by the watcher, not by the lookups
+    with open(relato, "a") as f:
+        f.write("\n")
+    assert _wait(lambda: cache.get(relato) != "antigo")
+
+
+def test_watcher_preparses_new_outputs(caso):
+    CaseWatcher().start()
+    relgnl = caso / "relgnl.rv0"
+    shutil.copy(os.path.join(DIR_TESTE, "relgnl.rv0"), relgnl)
+    assert _wait(lambda: ParseCache().get(str(relgnl)) is not None)
+
+
+def test_watcher_stop_restores_validation(caso):
+    CaseWatcher().start()
+    CaseWatcher().stop()
+    assert not CaseWatcher().running
+    assert not ParseCache().is_trusted(str((caso / "relato.rv0").resolve()))
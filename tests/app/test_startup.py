@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+
+# Generous budgets, since CI machines vary a lot. A regression that
+# brings the parsers back into the startup path goes way beyond them.
+IMPORT_BUDGET_SECONDS = 2.0
+STARTUP_BUDGET_SECONDS = 3.0
+
+HEAVY_PACKAGES = ["inewave", "idecomp", "pandas", "numpy", "tests"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from app.app import make_app
+t1 = time.perf_counter()
+make_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "startup": t2 - t0,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def _probe(**env) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **env},
+        check=True,
+    )
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def test_startup_does_not_import_parsers_or_mocks():
+    res = _probe(NEWAVE_SOURCE="TEST", DECOMP_SOURCE="TEST")
+    loaded = {m.split(".")[0] for m in res["modules"]}
+    for package in HEAVY_PACKAGES:
+        assert package not in loaded
+
+
+def test_startup_time_budget():
+    res = _probe()
+    assert res["import"] < IMPORT_BUDGET_SECONDS
+    assert res["startup"] < STARTUP_BUDGET_SECONDS
+
+
+def test_backend_is_imported_only_when_selected():
+    from app.adapters.newaverepository import factory, BACKENDS
+    from app.utils.plugin import load_plugin
+
+    repo = factory("TEST", ".")
+    assert type(repo) is load_plugin(BACKENDS["TEST"])
+    assert "tests.mocks.arquivos.newave.confhd" in sys.modules
@@ -0,0 +1,44 @@
+import pytest
+from inewave.newave.confhd import Confhd
+from app.utils.confhd import patch_confhd
+from tests.mocks.arquivos.newave.confhd import MockConfhd
+
+
+@pytest.fixture
+def confhd(tmp_path):
+    path = tmp_path.joinpath("confhd.dat")
+    path.write_text("".join(MockConfhd))
+    return path
+
+
+def test_patch_confhd_changes_only_volumes(confhd):
+    usinas = Confhd.read(str(confhd)).usinas
+    col = "volume_inicial_percentual"
+    usinas.loc[usinas["codigo_usina"] == 20, col] = 55.5
+    usinas.loc[usinas["codigo_usina"] == 4, col] = 100
+    assert patch_confhd(str(confhd), usinas) == 2
+
+    before = "".join(MockConfhd).splitlines(keepends=True)
+    after = confhd.read_text().splitlines(keepends=True)
+    assert len(before) == len(after)
+    diff = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+    assert diff == [2, 3]
+    assert after[2][35:41] == "100.00"
+    assert after[3] == before[3][:35] + " 55.50" + before[3][41:]
+
+    patched = Confhd.read(str(confhd)).usinas
+    assert patched.equals(usinas)
+
+
+def test_patch_confhd_unchanged_keeps_file(confhd):
+    mtime = confhd.stat().st_mtime_ns
+    usinas = Confhd.read(str(confhd)).usinas
+    assert patch_confhd(str(confhd), usinas) == 0
+    assert confhd.stat().st_mtime_ns == mtime
+
+
+def test_patch_confhd_rejects_other_plants(confhd):
+    usinas = Confhd.read(str(confhd)).usinas
+    with pytest.raises(ValueError):
+        patch_confhd(str(confhd), usinas.iloc[1:])
+    assert confhd.read_text() == "".join(MockConfhd)
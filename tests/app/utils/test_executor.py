@@ -0,0 +1,67 @@
+import asyncio
+import time
+import pytest
+from app.internal.settings import Settings
+from app.utils.executor import SubprocessExecutor
+from app.utils.terminal import run_terminal, run_terminal_retry
+
+
+@pytest.mark.asyncio
+async def test_run_terminal_argv():
+    cod, out = await run_terminal(["echo", "a b; echo c"])
+    assert cod == 0
+    assert out == "a b; echo c\n"
+
+
+@pytest.mark.asyncio
+async def test_run_terminal_single_command_line():
+    cod, out = await run_terminal(["echo 'a b'"])
+    assert cod == 0
+    assert out == "a b\n"
+
+
+@pytest.mark.asyncio
+async def test_run_terminal_timeout_kills_child():
+    executor = SubprocessExecutor()
+    timeouts = executor.timeouts
+    t0 = time.time()
+    with pytest.raises(asyncio.TimeoutError):
+        await run_terminal(["sleep", "5"], timeout=0.1)
+    assert time.time() - t0 < 2
+    assert executor.timeouts == timeouts + 1
+    assert executor.running == 0
+
+
+@pytest.mark.asyncio
+async def test_run_terminal_retry_backoff():
+    executor = SubprocessExecutor()
+    retries = executor.retries
+    cod, _ = await executor.run_retry(
+        ["false"], num_retry=3, backoff_base=0.01
+    )
+    assert cod == -1
+    assert executor.retries == retries + 2
+
+
+@pytest.mark.asyncio
+async def test_run_terminal_retry_missing_command():
+    cod, _ = await run_terminal_retry(["comando-inexistente"], num_retry=1)
+    assert cod == -1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setattr(Settings, "subprocess_concurrency", 2)
+    executor = SubprocessExecutor()
+    peak = 0
+
+    async def monitor():
+        nonlocal peak
+        while True:
+            peak = max(peak, executor.running)
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(monitor())
+    await asyncio.gather(*[run_terminal(["sleep", "0.2"]) for _ in range(6)])
+    task.cancel()
+    assert 0 < peak <= 2
@@ -0,0 +1,33 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from app.utils.interpolation import decomp_stage_dates, interpolate_storage
+
+
+def test_decomp_stage_dates():
+    dates = decomp_stage_dates(date(2023, 11, 25), 6)
+    assert dates[:2] == [date(2023, 11, 25), date(2023, 12, 2)]
+    assert dates[5] == date(2023, 12, 30)
+    # The monthly stage goes until the end of the next month
+    assert dates[6] == date(2024, 1, 1)
+
+
+def test_interpolate_storage():
+    dates = [date(2023, 11, 25), date(2023, 12, 2), date(2023, 12, 9)]
+    volumes = np.array([[10.0, 17.0, 30.0], [50.0, 43.0, 40.0]])
+    v = interpolate_storage(volumes, dates, date(2023, 12, 1))
+    assert v == pytest.approx([16.0, 44.0])
+    # Dates on the stage boundaries take the reported storages
+    v = interpolate_storage(volumes, dates, date(2023, 12, 9))
+    assert v == pytest.approx([30.0, 40.0])
+    with pytest.raises(ValueError):
+        interpolate_storage(volumes, dates, date(2024, 1, 1))
+
+
+def test_interpolate_storage_limits():
+    dates = [date(2023, 11, 25), date(2023, 12, 2)]
+    # Rounded reports may be slightly out of the useful volume
+    volumes = np.array([[-0.5, -0.5], [100.5, 100.2]])
+    v = interpolate_storage(volumes, dates, date(2023, 12, 1))
+    assert v == pytest.approx([0.0, 100.0])
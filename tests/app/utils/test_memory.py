@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from app.utils.memory import compact, downcast
+
+
+def test_downcast():
+    df = pd.DataFrame(
+        {
+            "codigo_usina": [1, 2, 3, 4],
+            "nome_usina": ["A", "A", "B", "B"],
+            "inteiro": [1.0, 2.0, 0.5, 100.0],
+            "volume": [76.2, 10.1, 0.0, 100.0],
+            "extra": [0, 0, 0, 0],
+        }
+    )
+    small = downcast(df, ["codigo_usina", "nome_usina", "inteiro", "volume"])
+    assert list(small.columns) == [
+        "codigo_usina",
+        "nome_usina",
+        "inteiro",
+        "volume",
+    ]
+    assert small["codigo_usina"].dtype == np.int8
+    assert isinstance(small["nome_usina"].dtype, pd.CategoricalDtype)
+    # Only the floats that are not changed become float32
+    assert small["inteiro"].dtype == np.float32
+    assert small["volume"].dtype == np.float64
+    assert (small["volume"] == df["volume"]).all()
+    assert small.memory_usage(deep=True).sum() < df.memory_usage(
+        deep=True
+    ).sum()
+
+
+def test_compact():
+    class Parsed:
+        tabela = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+        vazia = None
+
+    c = compact(Parsed(), {"tabela": ["a"], "vazia": ["a"]})
+    assert list(c.tabela.columns) == ["a"]
+    assert c.vazia is None
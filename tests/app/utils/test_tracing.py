@@ -0,0 +1,123 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+from app.internal.settings import Settings
+from app.models.chainingcase import ChainingCase
+from app.models.chainingrequest import ChainingRequest
+from app.models.chainingvariable import ChainingVariable
+from app.models.program import Program
+from app.routers import chain
+from app.utils.tracing import Tracer, span, traced
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("traces.jsonl")
+    monkeypatch.setattr(Settings, "trace_exporter", "JSONL")
+    monkeypatch.setattr(Settings, "trace_file", str(path))
+    yield path
+    Tracer().shutdown()
+
+
+def _spans(path) -> list:
+    # Waits for the pending spans to be written
+    Tracer().shutdown()
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.asyncio
+async def test_nested_spans(trace_file):
+    @traced("inner")
+    async def inner():
+        with span("leaf", size=3):
+            pass
+
+    with span("root"):
+        await inner()
+    spans = {s["name"]: s for s in _spans(trace_file)}
+    assert set(spans) == {"root", "inner", "leaf"}
+    assert spans["root"]["parent_id"] is None
+    assert spans["inner"]["parent_id"] == spans["root"]["span_id"]
+    assert spans["leaf"]["parent_id"] == spans["inner"]["span_id"]
+    assert len({s["trace_id"] for s in spans.values()}) == 1
+    assert spans["leaf"]["attributes"]["size"] == 3
+    assert spans["root"]["duration_ms"] >= spans["leaf"]["duration_ms"]
+
+
+def test_span_records_errors(trace_file):
+    with pytest.raises(ValueError):
+        with span("root"):
+            raise ValueError("x")
+    (s,) = _spans(trace_file)
+    assert s["status"] == "ERROR"
+
+
+def test_tracing_off_writes_nothing(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("traces.jsonl")
+    monkeypatch.setattr(Settings, "trace_exporter", "OFF")
+    monkeypatch.setattr(Settings, "trace_file", str(path))
+    with span("root") as s:
+        s.set(a=1)
+    assert not path.exists()
+
+
+def test_chain_request_spans(trace_file):
+    client = TestClient(chain.router)
+    # . encoded
+    case = ChainingCase(id="k", program=Program.DECOMP)
+    req = ChainingRequest(
+        sources=[case], destination=case, variable=ChainingVariable.VARM
+    )
+    response = client.post(
+        "/chain/",
+        content=req.model_dump_json(),
+        headers={"X-Request-ID": "abc-123"},
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "abc-123"
+    spans = _spans(trace_file)
+    names = [s["name"] for s in spans]
+    assert names[-1] == "chain"
+    for name in ["uri.parse", "uow.enter", "chain.VARM"]:
+        assert name in names
+    assert all(s["request_id"] == "abc-123" for s in spans)
+
+
+def test_otlp_exporter(monkeypatch):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            received.append(json.loads(self.rfile.read(length)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(Settings, "trace_exporter", "OTLP")
+    monkeypatch.setattr(
+        Settings,
+        "trace_endpoint",
+        f"http://127.0.0.1:{server.server_port}/v1/traces",
+    )
+    try:
+        with span("root"):
+            with span("child", path="/a"):
+                pass
+        Tracer().shutdown()
+    finally:
+        server.shutdown()
+    (body,) = received
+    spans = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["child", "root"]
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert len(spans[0]["traceId"]) == 32
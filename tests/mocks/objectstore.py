@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+
+
+class MockObjectStore:
+    """
+    Minimal S3-style object server for tests, supporting HEAD, ranged
+    GET and conditional PUT of objects in path-style URLs.
+    """
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self.requests: List[Tuple[str, str, Optional[str]]] = []
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, daemon=True
+        )
+        self.url = ""
+
+    @staticmethod
+    def etag(data: bytes) -> str:
+        return '"' + hashlib.md5(data).hexdigest() + '"'
+
+    def put(self, bucket: str, key: str, data: bytes):
+        self.objects[f"{bucket}/{key}"] = data
+
+    def count(self, method: str, ranged: Optional[bool] = None) -> int:
+        return len(
+            [
+                r
+                for r in self.requests
+                if r[0] == method
+                and (ranged is None or (r[2] is not None) == ranged)
+            ]
+        )
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        key = request.match_info["key"]
+        rng = request.headers.get("Range")
+        self.requests.append((request.method, key, rng))
+        data = self.objects.get(key)
+        if request.method == "PUT":
+            body = await request.read()
+            if_match = request.headers.get("If-Match")
+            if_none = request.headers.get("If-None-Match")
+            if if_match is not None and (
+                data is None or self.etag(data) != if_match
+            ):
+                return web.Response(status=412)
+            if if_none == "*" and data is not None:
+                return web.Response(status=412)
+            self.objects[key] = body
+            return web.Response(status=200, headers={"ETag": self.etag(body)})
+        if data is None:
+            return web.Response(status=404)
+        headers = {"ETag": self.etag(data)}
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(data))
+            return web.Response(status=200, headers=headers)
+        if rng is not None:
+            start, end = rng.split("=")[1].split("-")
+            part = data[int(start) : int(end) + 1]
+            return web.Response(status=206, body=part, headers=headers)
+        return web.Response(status=200, body=data, headers=headers)
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{key:.+}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self) -> str:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self.url
+
+    def stop(self):
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._runner.cleanup(), self._loop
+            ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()